@@ -0,0 +1,99 @@
+#
+#  File: aflsancov/__init__.py
+#
+#  Purpose: Library interface of afl-sancov
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+"""afl-sancov as a library
+
+Submodules are imported on first use of one of their names, so that short
+command line runs and programs embedding afl-sancov only pay for what they
+use:
+
+    from aflsancov import Session
+    with Session('./target', 'cat AFL_FILE | ./target', sanitizer='ubsan') as s:
+        print s.dice(s.coverage('crash'), s.coverage('queue/id:000003'))
+"""
+
+import sys
+import types
+import importlib
+
+Exports = {
+    'AFLSancovReporter': 'reporter',
+    'BitsetStore': 'bitsets',
+    'Budget': 'budget',
+    'BudgetState': 'budget',
+    'prioritize': 'budget',
+    'CoverageCollector': 'collect',
+    'Coverage': 'api',
+    'Session': 'api',
+    'CorpusIndex': 'corpus',
+    'LineageScheduler': 'corpus',
+    'CoverageStore': 'covstore',
+    'FunctionTable': 'covstore',
+    'DwarfSymbolizer': 'dwarf',
+    'coarsen': 'diff',
+    'dice': 'diff',
+    'dd_stats': 'diff',
+    'hit_stats': 'diff',
+    'HitMap': 'hitcounts',
+    'HotspotAggregator': 'hotspots',
+    'LeaseDir': 'distributed',
+    'Metrics': 'metrics',
+    'MetricsExporter': 'metrics',
+    'ShowmapPrefilter': 'prefilter',
+    'QueueCoverage': 'queuecov',
+    'repro_verdict': 'repro',
+    'VerdictCache': 'repro',
+    'StagedPipeline': 'pipeline',
+    'CrashJob': 'pipeline',
+    'ResultsStore': 'results',
+    'SancovStash': 'results',
+    'elf_build_id': 'symbolize',
+    'PCTable': 'symbolize',
+}
+
+### Star imports take the entry points only, the other names resolve on
+### first use
+__all__ = ['AFLSancovReporter', 'Coverage', 'Session']
+
+
+class LazyModule(types.ModuleType):
+    """Package module resolving exported names by importing their submodule"""
+
+    def __getattr__(self, name):
+        if name not in Exports:
+            raise AttributeError("module {} has no attribute {}".format(self.__name__, name))
+        value = getattr(importlib.import_module('.' + Exports[name], self.__name__), name)
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(self.__dict__) | set(Exports))
+
+
+### Module level __getattr__ does not exist in Python 2, swap in a module
+### object that has it. The original module stays referenced, as Python 2
+### clears the globals of collected modules.
+lazy = LazyModule(__name__, __doc__)
+lazy.__dict__.update(sys.modules[__name__].__dict__)
+lazy.module = sys.modules[__name__]
+sys.modules[__name__] = lazy
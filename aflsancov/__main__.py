@@ -0,0 +1,30 @@
+#
+#  File: aflsancov/__main__.py
+#
+#  Purpose: python -m aflsancov, same as afl-sancov.py
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import sys
+
+from aflsancov.reporter import AFLSancovReporter
+
+if __name__ == "__main__":
+    reporter = AFLSancovReporter(sys.argv[1:])
+    sys.exit(reporter.run())
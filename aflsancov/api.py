@@ -0,0 +1,145 @@
+#
+#  File: aflsancov/api.py
+#
+#  Purpose: In-process coverage collection and delta diffing
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import tempfile
+from shutil import rmtree
+
+from aflsancov.diff import coarsen, dice, dd_stats
+from aflsancov.reporter import AFLSancovReporter
+
+
+class Coverage(object):
+    """Source lines covered (pos) and not covered (zero) by one input
+
+    Lines are (filepath, function, line, column) string tuples, the same as
+    in the diff-node-spec of the per-crash JSON.
+    """
+
+    def __init__(self, input_fname, pos, zero=None):
+        self.input_fname = input_fname
+        self.pos = pos
+        self.zero = zero if zero is not None else set()
+
+    def __len__(self):
+        return len(self.pos)
+
+    def __repr__(self):
+        return "Coverage({!r}, {} lines)".format(self.input_fname, len(self.pos))
+
+
+class Session(object):
+    """Collect coverage and dice crashes without a subprocess per call
+
+    Options are the long command line options with underscores, e.g.
+    Session('./target', 'cat AFL_FILE | ./target', sanitizer='ubsan').
+    Coverage is cached by input content for the lifetime of the session.
+    Inputs named like AFL crashes (sig:NN) run with coverage_direct, as on
+    the command line.
+    """
+
+    def __init__(self, bin_path, coverage_cmd, **options):
+        if 'AFL_FILE' not in coverage_cmd and options.get('input_mode') != 'stdin':
+            raise ValueError("coverage_cmd must contain AFL_FILE")
+
+        options.setdefault('quiet', True)
+        args = ['--bin-path', bin_path, '--coverage-cmd', coverage_cmd]
+        for name, value in sorted(options.items()):
+            if value is True:
+                args.append('--' + name.replace('_', '-'))
+            elif value is not None and value is not False:
+                args.extend(['--' + name.replace('_', '-'), str(value)])
+
+        self.reporter = AFLSancovReporter(args)
+        reporter = self.reporter
+        reporter.set_defaults()
+
+        self.scratch = tempfile.mkdtemp(prefix='afl-sancov-', dir=reporter.args.scratch_dir)
+        reporter.cov_paths['scratch_dir'] = self.scratch
+        reporter.cov_paths['tmp_out'] = self.scratch + '/cmd-out.tmp'
+        reporter.cov_paths['log_file'] = os.devnull
+        reporter.setup_parsing()
+        self.collector = reporter.collector
+        self.cov_cache = {}
+
+        if reporter.args.pc_table:
+            if not reporter.args.cache_dir:
+                self.close()
+                raise ValueError("pc_table requires cache_dir")
+            if not reporter.init_pc_table():
+                self.close()
+                raise RuntimeError("Could not index coverage PCs of {}".format(bin_path))
+
+    def coverage(self, input_fname):
+        """Run the target on one input, returns its Coverage or None if no
+        sancov file was produced"""
+
+        digest = self.collector.corpus.digest(input_fname)
+        if digest not in self.cov_cache:
+            scratch = tempfile.mkdtemp(prefix='exec-', dir=self.scratch)
+            try:
+                coverage = self.collector.coverage(input_fname, scratch)
+            finally:
+                rmtree(scratch)
+            if coverage is None:
+                return None
+            self.cov_cache[digest] = coverage
+
+        pos, zero = self.cov_cache[digest]
+        return Coverage(input_fname, pos, zero)
+
+    def dice(self, crash, parents, granularity='line'):
+        """Delta diff a crash against one or more non-crashing Coverage
+        objects at line, function or file granularity, returns the same
+        dict as the per-crash JSON"""
+
+        if isinstance(parents, Coverage):
+            parents = [parents]
+        if crash is None:
+            raise ValueError("No coverage for the crash, coverage() produced no sancov file")
+        if parents is None or any(parent is None for parent in parents):
+            raise ValueError("No coverage for a parent, coverage() produced no sancov file")
+
+        crashdd_pos_list = []
+        for parent in parents:
+            crashdd_pos_list.extend(dice(crash.pos, parent.pos, granularity))
+
+        cbasename = os.path.basename(crash.input_fname)
+        if len(parents) == 1:
+            # Single parent results report the parent's slice, as in the
+            # default delta-diff mode
+            return dd_stats(cbasename, crashdd_pos_list, len(coarsen(parents[0].pos, granularity)),
+                            os.path.basename(parents[0].input_fname), granularity)
+        return dd_stats(cbasename, crashdd_pos_list, len(coarsen(crash.pos, granularity)),
+                        granularity=granularity)
+
+    def close(self):
+        if self.scratch and os.path.isdir(self.scratch):
+            rmtree(self.scratch)
+        self.scratch = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
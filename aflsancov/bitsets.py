@@ -0,0 +1,234 @@
+#
+#  File: aflsancov/bitsets.py
+#
+#  Purpose: Memory-mapped per-input coverage bitsets
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import json
+import mmap
+import bisect
+import binascii
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class BitsetStore:
+    """Fixed-width coverage bitsets of many inputs in one file
+
+    Row r of the bits file is the bitset of the r-th key: bit i (byte i / 8,
+    most significant bit first) is set if the input covered the i-th
+    coverage point. Points are usually the PCs of the PC table in ascending
+    order and are kept in the store's meta file, together with the build id
+    of the binary they belong to. Rows are only appended.
+
+    Queries walk the rows in chunks of at most Chunk_Bytes, each mapped on
+    its own and unmapped before the next, so memory stays bounded by the
+    chunk size however large the store grows. Chunks are numpy arrays when
+    numpy is available, long integers otherwise. Results are bytearrays of
+    one row.
+    """
+
+    Chunk_Bytes = 16 << 20
+
+    def __init__(self, path, points=None, build_id=None):
+        self.path = path
+        self.bits_path = os.path.join(path, 'bits')
+        self.keys_path = os.path.join(path, 'keys')
+        meta_path = os.path.join(path, 'meta.json')
+
+        if not os.path.isfile(meta_path):
+            if points is None:
+                raise ValueError("No bitset store in {}".format(path))
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            with open(meta_path + '.tmp', 'w') as f:
+                json.dump({'points': list(points), 'build-id': build_id}, f, separators=(',', ':'))
+            os.rename(meta_path + '.tmp', meta_path)
+            open(self.bits_path, 'wb').close()
+            open(self.keys_path, 'w').close()
+
+        with open(meta_path) as f:
+            meta = json.load(f)
+        ### Points of another build would silently drop this build's PCs
+        if build_id is not None and meta.get('build-id') != build_id:
+            raise ValueError("Bitset store in {} belongs to build {}, not {}"
+                             .format(path, meta.get('build-id'), build_id))
+        self.build_id = meta.get('build-id')
+        self.points = meta['points']
+        self.width = len(self.points)
+        self.row_bytes = ((self.width + 63) // 64) * 8
+        self.point_idx = dict((point, idx) for idx, point in enumerate(self.points))
+
+        with open(self.keys_path) as f:
+            self.keys = [line.rstrip('\n') for line in f]
+        ### Rows and keys written by an interrupted run may disagree
+        rows = min(len(self.keys), os.path.getsize(self.bits_path) // self.row_bytes)
+        del self.keys[rows:]
+        self.rows = dict((key, row) for row, key in enumerate(self.keys))
+        with open(self.bits_path, 'r+b') as f:
+            f.truncate(rows * self.row_bytes)
+        with open(self.keys_path, 'w') as f:
+            f.write(''.join(key + '\n' for key in self.keys))
+
+        self.bits = open(self.bits_path, 'ab')
+        self.keys_file = open(self.keys_path, 'a')
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def add(self, key, points):
+        """Append the bitset of the given coverage points, unknown points are
+        ignored. Returns the row of key."""
+
+        if key in self.rows:
+            return self.rows[key]
+        bits = bytearray(self.row_bytes)
+        for point in points:
+            idx = self.point_idx.get(point)
+            if idx is not None:
+                bits[idx >> 3] |= 0x80 >> (idx & 7)
+        self.bits.write(bits)
+        self.keys_file.write(key + '\n')
+        self.rows[key] = len(self.keys)
+        self.keys.append(key)
+        return self.rows[key]
+
+    def flush(self):
+        self.bits.flush()
+        self.keys_file.flush()
+
+    def close(self):
+        self.bits.close()
+        self.keys_file.close()
+
+    ### Chunked access
+
+    def scan(self, keys, visit):
+        """Call visit(chunk) over the rows of keys (all if None) in row order,
+        a chunk being a rows x row_bytes uint8 numpy array or a list of long
+        integers. Numpy chunks are views of a mapping that is gone once
+        visit returns."""
+
+        self.flush()
+        wanted = None if keys is None else sorted(self.rows[key] for key in keys)
+        chunk_rows = max(1, self.Chunk_Bytes // self.row_bytes)
+        granularity = mmap.ALLOCATIONGRANULARITY
+
+        with open(self.bits_path, 'rb') as f:
+            for first in range(0, len(self.keys), chunk_rows):
+                last = min(first + chunk_rows, len(self.keys))
+                if wanted is not None:
+                    rows = wanted[bisect.bisect_left(wanted, first):bisect.bisect_left(wanted, last)]
+                    if not rows:
+                        continue
+                start = first * self.row_bytes
+                offset = start - start % granularity
+                length = last * self.row_bytes - offset
+                window = mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ, offset=offset)
+                try:
+                    if numpy is not None:
+                        chunk = numpy.frombuffer(window, dtype=numpy.uint8, count=length - (start - offset),
+                                                 offset=start - offset).reshape(-1, self.row_bytes)
+                        if wanted is not None:
+                            chunk = chunk[numpy.array(rows) - first]
+                        visit(chunk)
+                    else:
+                        visit([long(binascii.hexlify(window[row * self.row_bytes - offset:
+                                                            (row + 1) * self.row_bytes - offset]), 16)
+                               for row in (rows if wanted is not None else range(first, last))])
+                finally:
+                    window.close()
+
+    def reduce(self, keys, combine):
+        ### None if there are no rows to combine
+        result = [None]
+
+        def visit(chunk):
+            rows = [combine.reduce(chunk, axis=0)] if numpy is not None else chunk
+            for bits in rows:
+                result[0] = combine(result[0], bits) if result[0] is not None else bits
+
+        self.scan(keys, visit)
+        return result[0]
+
+    def to_bytes(self, result):
+        if result is None:
+            return bytearray(self.row_bytes)
+        if numpy is not None:
+            return bytearray(result.tobytes())
+        return bytearray(binascii.unhexlify('%0*x' % (self.row_bytes * 2, result)))
+
+    ### Queries
+
+    def union(self, keys=None):
+        """Points covered by any of keys"""
+
+        combine = numpy.bitwise_or if numpy is not None else (lambda a, b: a | b)
+        return self.to_bytes(self.reduce(keys, combine))
+
+    def intersection(self, keys=None):
+        """Points covered by all of keys"""
+
+        combine = numpy.bitwise_and if numpy is not None else (lambda a, b: a & b)
+        return self.to_bytes(self.reduce(keys, combine))
+
+    def difference(self, key, keys=None):
+        """Points covered by key and by none of keys (all others by default)"""
+
+        own = self.union([key])
+        if keys is None:
+            keys = [other for other in self.keys if other != key]
+        others = self.union(keys)
+        return bytearray(a & ~b & 0xff for a, b in zip(own, others))
+
+    def popcounts(self, keys=None):
+        """Number of covered points per key, in row order"""
+
+        counts = []
+
+        def visit(chunk):
+            if numpy is not None:
+                counts.extend(numpy.unpackbits(chunk, axis=1).sum(axis=1, dtype=numpy.int64).tolist())
+            else:
+                counts.extend(bin(bits).count('1') for bits in chunk)
+
+        self.scan(keys, visit)
+        return counts
+
+    @staticmethod
+    def popcount(bits):
+        if numpy is not None:
+            return int(numpy.unpackbits(numpy.frombuffer(bytes(bits), dtype=numpy.uint8)).sum())
+        return sum(bin(byte).count('1') for byte in bits)
+
+    def covered(self, bits):
+        """Coverage points of a bitset"""
+
+        if numpy is not None:
+            idxs = numpy.nonzero(numpy.unpackbits(numpy.frombuffer(bytes(bits), dtype=numpy.uint8)))[0]
+            return [self.points[idx] for idx in idxs.tolist() if idx < self.width]
+        return [self.points[idx] for idx in range(self.width) if bits[idx >> 3] & (0x80 >> (idx & 7))]
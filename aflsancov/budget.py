@@ -0,0 +1,141 @@
+#
+#  File: aflsancov/budget.py
+#
+#  Purpose: Time and execution budgets and crash priorities
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import re
+import json
+import time
+import collections
+import threading
+
+
+class Budget:
+    """Wall-clock and target execution budget of a run, plus a cap on the
+    executions spent on a single crash
+
+    Executions are charged from any thread. The per-crash count is thread
+    local, as all executions for one crash happen on one thread.
+    """
+
+    def __init__(self, seconds=None, execs=None, crash_execs=None):
+        self.start = time.time()
+        self.deadline = self.start + seconds if seconds else None
+        self.execs = execs
+        self.crash_execs = crash_execs
+        self.used = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def begin_crash(self):
+        self.local.used = 0
+
+    def charge(self, num=1):
+        with self.lock:
+            self.used += num
+        self.local.used = getattr(self.local, 'used', 0) + num
+
+    def exhausted(self):
+        if self.deadline and time.time() >= self.deadline:
+            return True
+        return bool(self.execs) and self.used >= self.execs
+
+    def crash_exhausted(self):
+        if self.exhausted():
+            return True
+        return bool(self.crash_execs) and getattr(self.local, 'used', 0) >= self.crash_execs
+
+    def limited(self):
+        return bool(self.deadline or self.execs or self.crash_execs)
+
+
+class BudgetState:
+    """Which crash files a budgeted run finished, cut short (with the number
+    of parents analyzed) or never reached, so that --continue can pick up"""
+
+    def __init__(self, path):
+        self.path = path
+        self.complete = set()
+        self.partial = {}
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def load(self):
+        if os.path.isfile(self.path):
+            with open(self.path) as f:
+                state = json.load(f)
+            self.complete = set(state['complete'])
+            self.partial = state['partial']
+            self.pending = set(state['pending'])
+
+    def done(self, cbasename, parents=None):
+        with self.lock:
+            self.pending.discard(cbasename)
+            if parents is None:
+                self.partial.pop(cbasename, None)
+                self.complete.add(cbasename)
+            else:
+                self.partial[cbasename] = parents
+
+    def skipped(self, cbasename):
+        with self.lock:
+            if cbasename not in self.complete and cbasename not in self.partial:
+                self.pending.add(cbasename)
+
+    def save(self):
+        with self.lock:
+            state = {'complete': sorted(self.complete), 'partial': self.partial,
+                     'pending': sorted(self.pending)}
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f, indent=4, sort_keys=True)
+        os.rename(tmp, self.path)
+
+
+def crash_signal(crash_fname):
+    match = re.search(r'sig:(\d+)', os.path.basename(crash_fname))
+    return int(match.group(1)) if match else 0
+
+
+def prioritize(crash_files, priority, cluster_key=None):
+    """Reorder crash files: 'signal' puts the rarest signals first, 'newest'
+    the most recently found files, 'cluster' takes one crash per cluster
+    (largest clusters first) before coming back for a second"""
+
+    if priority == 'signal':
+        counts = collections.Counter(crash_signal(crash) for crash in crash_files)
+        return sorted(crash_files, key=lambda crash: (counts[crash_signal(crash)], crash_signal(crash)))
+
+    if priority == 'newest':
+        return sorted(crash_files, key=lambda crash: -os.path.getmtime(crash))
+
+    if priority == 'cluster':
+        clusters = collections.OrderedDict()
+        for crash in crash_files:
+            clusters.setdefault(cluster_key(crash), []).append(crash)
+        groups = sorted(clusters.values(), key=lambda group: -len(group))
+        ordered = []
+        for rank in range(len(groups[0]) if groups else 0):
+            ordered.extend(group[rank] for group in groups if rank < len(group))
+        return ordered
+
+    return list(crash_files)
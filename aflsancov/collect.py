@@ -0,0 +1,328 @@
+#
+#  File: aflsancov/collect.py
+#
+#  Purpose: Run the target under sancov and decode and symbolize its coverage
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import re
+import glob
+import pipes
+import shlex
+import itertools
+import threading
+
+try:
+    import subprocess32 as subprocess
+except ImportError:
+    import subprocess
+
+
+class CoverageCollector:
+    """Executes --coverage-cmd on one input with sancov enabled, unpacks and
+    decodes the .sancov file and symbolizes the covered (and uncovered) PCs,
+    through the PC table when one is set
+
+    Shared by the reporter and the Session API. scratch_dir holds the
+    staged inputs of --input-mode tmpfs.
+    """
+
+    line_cov_regex = re.compile(r"^(?P<function>[\w|\-|\:]+)$\n"
+                                r"^(?P<filepath>[^:]+):(?P<linenum>\d+):(?P<colnum>\d+)$",
+                                re.MULTILINE)
+
+    find_crash_parent_regex = re.compile(r"^((HARDEN:|ASAN:)\d+,)?((?P<session>[\w|\-]+):)?id:\d+,sig:\d+,"
+                                         r"(sync:(?P<sync>[\w|\-]+),)?src:(?P<id>\d+).*$")
+
+    def __init__(self, args, corpus, budget, metrics, log, scratch_dir=None):
+        self.args = args
+        self.corpus = corpus
+        self.budget = budget
+        self.metrics = metrics
+        self.log = log
+        self.scratch_dir = scratch_dir
+
+        self.bin_name = os.path.basename(args.bin_path)
+        self.sancov_filename_regex = re.compile(r"%s.\d+.sancov" % self.bin_name)
+        self.counters_filename_regex = re.compile(r"%s.\d+.counters-sancov" % re.escape(self.bin_name))
+        ### --input-mode argv runs the command from its tokens, split once
+        self.coverage_argv = None
+        if args.input_mode == 'argv':
+            self.coverage_argv = shlex.split(args.coverage_cmd)
+        self.sancov_seq = itertools.count()
+
+        ### Instrumentation point table, see --pc-table
+        self.pc_table = None
+
+        ### In-process DWARF symbolizer, see --symbolizer
+        self.dwarf = None
+        self.dwarf_lock = threading.Lock()
+
+    def coverage(self, input_fname, scratch):
+        """Execute, decode and symbolize one input, returns its covered and
+        uncovered lines or None if the target wrote no coverage"""
+
+        sancov_file = self.execute_for_coverage(input_fname, scratch)
+        if not sancov_file:
+            return None
+        return self.symbolize_coverage(*self.decode_sancov(sancov_file))
+
+    def scratch_sancov(self, scratch, basename):
+        """Path of the sancov file of one execution in `scratch`. Inputs of
+        different sessions share basenames, so every execution gets its own
+        name and the stash never removes a file that is still to be read"""
+        return '{}/{}.{}.sancov'.format(scratch, basename, next(self.sancov_seq))
+
+    def get_sancov_env(self, sancov_output, afl_input):
+        """Sanitizer options that make the target dump coverage next to
+        `sancov_output`"""
+
+        fpath, fname = os.path.split(sancov_output)
+
+        sancov_env = os.environ.copy()
+        if self.args.sanitizer == "asan":
+            if self.find_crash_parent_regex.match(afl_input):
+                if not self.args.sancov_bug:
+                    sancov_env['ASAN_OPTIONS'] = 'coverage=1:coverage_direct=1:' \
+                                             'coverage_dir=%s' % fpath
+                else:
+                    sancov_env['ASAN_OPTIONS'] = 'coverage=1:coverage_direct=1'
+            else:
+                if not self.args.sancov_bug:
+                    sancov_env['ASAN_OPTIONS'] = 'coverage=1:coverage_dir=%s' % fpath
+                else:
+                    sancov_env['ASAN_OPTIONS'] = 'coverage=1'
+        else:
+            if self.find_crash_parent_regex.match(afl_input):
+                if not self.args.sancov_bug:
+                    sancov_env['UBSAN_OPTIONS'] = 'coverage=1:coverage_direct=1:' \
+                                              'coverage_dir=%s' % fpath
+                else:
+                    sancov_env['UBSAN_OPTIONS'] = 'coverage=1:coverage_direct=1'
+            else:
+                if not self.args.sancov_bug:
+                    sancov_env['UBSAN_OPTIONS'] = 'coverage=1:coverage_dir=%s' % fpath
+                else:
+                    sancov_env['UBSAN_OPTIONS'] = 'coverage=1'
+
+        if self.args.hit_counts:
+            options = 'ASAN_OPTIONS' if self.args.sanitizer == "asan" else 'UBSAN_OPTIONS'
+            sancov_env[options] += ':coverage_counters=1'
+
+        return sancov_env
+
+    def run_target(self, input_fname, env=None, output=None):
+        """Run --coverage-cmd on one input as --input-mode says, returns its
+        exit status"""
+
+        mode = self.args.input_mode
+        data = None
+        shell = True
+        if mode == 'stdin':
+            cmd = self.args.coverage_cmd
+            data = self.corpus.read(input_fname)
+        elif mode == 'tmpfs':
+            cmd = self.args.coverage_cmd.replace('AFL_FILE', pipes.quote(self.stage_input(input_fname)))
+        elif mode == 'argv':
+            cmd = [arg.replace('AFL_FILE', input_fname) for arg in self.coverage_argv]
+            shell = False
+        else:
+            ### Substituted verbatim as ever, commands may quote AFL_FILE themselves
+            cmd = self.args.coverage_cmd.replace('AFL_FILE', input_fname)
+
+        if self.args.verbose:
+            self.log("    CMD: %s" % (cmd if shell else ' '.join(pipes.quote(arg) for arg in cmd)))
+
+        with open(os.devnull, 'w') as devnull:
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE if data is not None else None,
+                                    stdout=output or devnull, stderr=subprocess.STDOUT, shell=shell, env=env,
+                                    executable='/bin/bash' if shell else None)
+            proc.communicate(data)
+        return proc.returncode
+
+    def stage_input(self, input_fname):
+        ### One staging file per thread in the scratch dir, rewritten for
+        ### every execution like afl-fuzz's .cur_input
+        path = '{}/.cur_input-{}'.format(self.scratch_dir, threading.current_thread().ident)
+        with open(path, 'wb') as f:
+            f.write(self.corpus.read(input_fname))
+        return path
+
+    def execute_for_coverage(self, input_fname, scratch):
+        """Run the target on one input with sancov writing to `scratch`,
+        returns the path of the unpacked .sancov file or None"""
+
+        self.budget.charge()
+        return self.run_for_coverage(input_fname, scratch)[1]
+
+    def run_for_coverage(self, input_fname, scratch):
+        ### execute_for_coverage without charging the budget, also returns
+        ### the exit status
+        basename = os.path.basename(input_fname)
+        sancov_env = self.get_sancov_env(scratch + '/' + basename, basename)
+
+        with self.metrics.stage('execute'):
+            status = self.run_target(input_fname, sancov_env)
+
+        raws = glob.glob(scratch + '/*.sancov.raw')
+        if raws:
+            self.run_output("cd {}; {} rawunpack {}".format(scratch, self.args.pysancov_path,
+                                                           ' '.join(os.path.basename(raw) for raw in raws)))
+            for raw in raws:
+                os.remove(raw)
+                if os.path.isfile(raw[:-len('.raw')] + '.map'):
+                    os.remove(raw[:-len('.raw')] + '.map')
+
+        ### Renamed right away, so the next execution in `scratch` finds its own file
+        sancov_fname = self.scratch_sancov(scratch, basename)
+        for filename in os.listdir(scratch):
+            if self.counters_filename_regex.match(filename):
+                os.rename(os.path.join(scratch, filename), sancov_fname[:-len('.sancov')] + '.counters-sancov')
+
+        for filename in os.listdir(scratch):
+            if self.sancov_filename_regex.match(filename):
+                os.rename(os.path.join(scratch, filename), sancov_fname)
+                return status, sancov_fname
+        return status, None
+
+    def decode_sancov(self, sancov_file):
+        """Returns covered and (unless a PC table is used) uncovered PCs"""
+
+        if self.pc_table:
+            return self.covered_pcs(sancov_file), None
+
+        pos_pcs = self.parse_pcs(self.run_output(self.args.sancov_path + " -obj " + self.args.bin_path
+                                                 + " -print " + sancov_file + " 2>/dev/null"))
+        zero_pcs = self.parse_pcs(self.run_output(self.args.pysancov_path + " print " + sancov_file
+                                                  + " 2>/dev/null | " + self.args.pysancov_path
+                                                  + " missing " + self.args.bin_path + " 2>/dev/null"))
+        return pos_pcs, zero_pcs
+
+    def covered_pcs(self, sancov_file):
+        return self.parse_pcs(self.run_output(self.args.pysancov_path + " print " + sancov_file + " 2>/dev/null"))
+
+    def decode_pcs(self, pcs):
+        """decode_sancov for covered PCs taken from the coverage store"""
+
+        if self.pc_table:
+            return pcs, None
+        return pcs, self.missing_pcs(pcs)
+
+    def missing_pcs(self, covered):
+        ### Coverage PCs of --bin-path that are not in covered
+        with open(os.devnull, 'w') as devnull:
+            proc = subprocess.Popen(self.args.pysancov_path + " missing " + self.args.bin_path,
+                                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=devnull,
+                                    shell=True, executable='/bin/bash')
+            out, _ = proc.communicate(''.join('0x%x\n' % pc for pc in sorted(covered)))
+        return self.parse_pcs(out.splitlines())
+
+    def symbolize_coverage(self, pos_pcs, zero_pcs):
+        if self.pc_table:
+            return self.table_coverage(set(pos_pcs))
+
+        pos = set()
+        for frames in self.symbolize_pcs(pos_pcs):
+            pos.update(frames)
+        zero = set()
+        for frames in self.symbolize_pcs(zero_pcs):
+            zero.update(frames)
+        return pos, zero
+
+    def symbolize_pcs(self, pcs):
+        """Return a list of symbolized frames for each PC, in order"""
+
+        if not pcs:
+            return []
+
+        if self.args.symbolizer == 'dwarf':
+            return self.dwarf_symbolizer().symbolize(pcs)
+
+        proc = subprocess.Popen([self.args.llvm_sym_path, '-obj', self.args.bin_path],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                stderr=open(os.devnull, 'w'))
+        out, _ = proc.communicate(''.join('0x%x\n' % pc for pc in pcs))
+
+        ### llvm-symbolizer terminates the frames of each address with an empty line
+        blocks = out.rstrip('\n').split('\n\n')
+        if len(blocks) != len(pcs):
+            self.log("Symbolizer returned {} entries for {} PCs".format(len(blocks), len(pcs)))
+            blocks.extend([''] * (len(pcs) - len(blocks)))
+
+        return [[(fp, func, ln, col) for (func, fp, ln, col) in re.findall(self.line_cov_regex, block)]
+                for block in blocks[:len(pcs)]]
+
+    def symbolize_into_table(self, pcs):
+        ### Symbolize in parallel shards, one llvm-symbolizer per shard
+        nshards = max(1, min(self.args.jobs, len(pcs)))
+        shards = [pcs[i::nshards] for i in range(nshards)]
+
+        from multiprocessing.dummy import Pool as ThreadPool
+        pool = ThreadPool(nshards)
+        try:
+            results = pool.map(self.symbolize_pcs, shards)
+        finally:
+            pool.close()
+            pool.join()
+
+        for shard, frames_list in zip(shards, results):
+            for pc, frames in zip(shard, frames_list):
+                self.pc_table.add(pc, frames)
+
+    def dwarf_symbolizer(self):
+        ### Debug info of --bin-path is parsed once, on first use
+        with self.dwarf_lock:
+            if self.dwarf is None:
+                from aflsancov.dwarf import DwarfSymbolizer
+                self.dwarf = DwarfSymbolizer(self.args.bin_path)
+        return self.dwarf
+
+    def table_coverage(self, covered):
+        self.fill_table(covered)
+        return self.pc_table.lookup(covered), self.pc_table.zero(covered)
+
+    def fill_table(self, covered):
+        ### PCs absent from the table (e.g. a stale table) are symbolized once
+        missing = self.pc_table.missing(sorted(covered))
+        self.metrics.cache('symbolizer', len(covered) - len(missing), len(covered))
+        if missing:
+            frames_list = self.symbolize_pcs(missing)
+            with self.pc_table.lock:
+                for pc, frames in zip(missing, frames_list):
+                    self.pc_table.add(pc, frames)
+
+    def run_output(self, cmd, env=None):
+        ### Thread safe variant of run_cmd that collects output through a pipe
+        if self.args.verbose:
+            self.log("    CMD: %s" % cmd)
+        with open(os.devnull, 'w') as devnull:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=devnull, shell=True,
+                                    env=env, executable='/bin/bash')
+            out, _ = proc.communicate()
+        return out.splitlines()
+
+    @staticmethod
+    def parse_pcs(lines):
+        pcs = []
+        for line in lines:
+            line = line.strip()
+            if line.startswith('0x'):
+                pcs.append(int(line, 16))
+        return pcs
@@ -0,0 +1,166 @@
+#
+#  File: aflsancov/corpus.py
+#
+#  Purpose: Content-addressed AFL corpus and lineage based crash scheduling
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import collections
+import hashlib
+import threading
+
+
+class CorpusIndex:
+    """Content-addressed view of AFL inputs across sync'ed fuzzing sessions
+
+    sync: imports copy the same bytes into several queue/ dirs under different
+    names. Every file is hashed once and all paths carrying identical bytes map
+    to a single canonical entry (the first path indexed for that digest).
+
+    Inputs up to Max_Cached_Input bytes are read once: the bytes that get
+    hashed are kept by digest, least recently used first out beyond
+    Cache_Bytes, and read() serves them to every execution that needs them.
+    """
+
+    Hash_Block_Size = 1 << 16
+    # AFL's MAX_FILE
+    Max_Cached_Input = 1 << 20
+    Cache_Bytes = 64 << 20
+
+    def __init__(self):
+        self.path_to_digest = {}
+        self.digest_to_paths = {}
+        self.contents = collections.OrderedDict()
+        self.contents_size = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def hash_file(cls, path):
+        h = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(cls.Hash_Block_Size), b''):
+                h.update(block)
+        return h.hexdigest()
+
+    def add(self, path):
+        path = os.path.abspath(path)
+        digest = self.path_to_digest.get(path)
+        if digest is None:
+            if os.path.getsize(path) <= self.Max_Cached_Input:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                digest = hashlib.sha1(data).hexdigest()
+                self.cache_contents(digest, data)
+            else:
+                digest = self.hash_file(path)
+            with self.lock:
+                if path not in self.path_to_digest:
+                    self.path_to_digest[path] = digest
+                    self.digest_to_paths.setdefault(digest, []).append(path)
+        return digest
+
+    def digest(self, path):
+        return self.add(path)
+
+    def read(self, path):
+        """Bytes of an input, from memory unless it is large or was evicted"""
+
+        digest = self.add(path)
+        with self.lock:
+            data = self.contents.pop(digest, None)
+            if data is not None:
+                self.contents[digest] = data
+                return data
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) <= self.Max_Cached_Input:
+            self.cache_contents(digest, data)
+        return data
+
+    def cache_contents(self, digest, data):
+        with self.lock:
+            if digest in self.contents:
+                return
+            self.contents[digest] = data
+            self.contents_size += len(data)
+            while self.contents_size > self.Cache_Bytes:
+                _, evicted = self.contents.popitem(last=False)
+                self.contents_size -= len(evicted)
+
+    def canonical(self, path):
+        return self.digest_to_paths[self.add(path)][0]
+
+    def canonical_name(self, digest):
+        return self.digest_to_paths[digest][0]
+
+    def duplicates(self, path):
+        return self.digest_to_paths[self.add(path)]
+
+    def identical(self, path1, path2):
+        return self.add(path1) == self.add(path2)
+
+    def unique_paths(self):
+        return sorted(paths[0] for paths in self.digest_to_paths.values())
+
+
+class LineageScheduler:
+    """Orders crash files so that crashes sharing ancestors run back to back
+
+    The crash -> parent -> ancestor forest is built up front. Crashes are
+    visited in depth-first order of that forest and every ancestor carries a
+    reference count of pending crashes, so results computed for an ancestor
+    can be released as soon as its last dependent crash has been processed.
+    """
+
+    def __init__(self, crash_files, lineages=None, key=None):
+        self.crash_files = list(crash_files)
+        self.lineages = lineages or {}
+        self.key = key or (lambda path: path)
+        self.refcount = collections.Counter()
+
+        for crash in self.crash_files:
+            for ancestor in self.ancestor_keys(crash):
+                self.refcount[ancestor] += 1
+
+    def ancestor_keys(self, crash):
+        keys = []
+        for ancestor in self.lineages.get(crash, []):
+            key = self.key(ancestor)
+            if key not in keys:
+                keys.append(key)
+        return keys
+
+    def order(self):
+        if not self.lineages:
+            return list(self.crash_files)
+
+        # Root-first ancestor chains sort siblings next to each other
+        return sorted(self.crash_files,
+                      key=lambda crash: ([self.key(a) for a in reversed(self.lineages.get(crash, []))],
+                                         os.path.basename(crash)))
+
+    def release(self, crash):
+        released = []
+        for ancestor in self.ancestor_keys(crash):
+            self.refcount[ancestor] -= 1
+            if self.refcount[ancestor] <= 0:
+                del self.refcount[ancestor]
+                released.append(ancestor)
+        return released
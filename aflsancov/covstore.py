@@ -0,0 +1,217 @@
+#
+#  File: aflsancov/covstore.py
+#
+#  Purpose: Per-input coverage that survives rebuilds of the target
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import json
+import bisect
+import hashlib
+import threading
+
+
+class FunctionTable:
+    """Functions of one build of the target with a fingerprint of their code
+
+    A function is keyed by its symbol name, local symbols by their STT_FILE
+    and name. The fingerprint covers the function's size and its line table
+    rows: offset into the function, file name, and line relative to the
+    first row of that file, so that a function that merely moved in the
+    binary, in its source file or to another build dir keeps its
+    fingerprint. An edit that changes neither
+    instruction offsets nor source positions (say < to <=) goes unnoticed,
+    as do changes to initialized data.
+    """
+
+    def __init__(self, build_id, functions):
+        self.build_id = build_id
+        # [(start, size, key, fingerprint), ...] sorted by start
+        self.functions = sorted(functions)
+        self.starts = [start for (start, size, key, fingerprint) in self.functions]
+        self.by_key = dict((key, (start, size, fingerprint))
+                           for (start, size, key, fingerprint) in self.functions)
+
+    @classmethod
+    def from_binary(cls, path, build_id, dwarf=None):
+        if dwarf is None:
+            from aflsancov.dwarf import DwarfSymbolizer
+            dwarf = DwarfSymbolizer(path)
+
+        rows = dwarf.rows
+        addresses = [row[0] for row in rows]
+        keys = {}
+        for (start, size, name, fp) in dwarf.symbols:
+            if not size:
+                continue
+            key = name if fp is None else '{}:{}'.format(fp, name)
+            first_line = {}
+            shape = []
+            for (address, file_idx, line, column, end) in \
+                    rows[bisect.bisect_left(addresses, start):bisect.bisect_left(addresses, start + size)]:
+                fpath = os.path.basename(dwarf.files[file_idx]) if file_idx is not None else None
+                first_line.setdefault(fpath, line)
+                shape.append((address - start, fpath, line - first_line[fpath], column, end))
+            fingerprint = hashlib.sha1(repr((size, shape)).encode('utf-8')).hexdigest()[:16]
+            keys.setdefault(key, []).append((start, size, key, fingerprint))
+
+        ### Keys that do not name one function cannot be remapped
+        return cls(build_id, [entries[0] for entries in keys.values() if len(entries) == 1])
+
+    def locate(self, pc):
+        """(key, offset) of the function containing pc, None if none does"""
+
+        idx = bisect.bisect_right(self.starts, pc) - 1
+        if idx >= 0:
+            start, size, key, fingerprint = self.functions[idx]
+            if pc < start + size:
+                return key, pc - start
+        return None
+
+    def address(self, key, offset):
+        return self.by_key[key][0] + offset
+
+    def changed_since(self, old):
+        """Keys of functions of the old build that are gone or have different
+        code in this one"""
+
+        return set(key for (start, size, key, fingerprint) in old.functions
+                   if key not in self.by_key or self.by_key[key][2] != fingerprint)
+
+    def save(self, path):
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'build-id': self.build_id, 'functions': [list(function) for function in self.functions]},
+                      f, separators=(',', ':'))
+        os.rename(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            table = json.load(f)
+        return cls(table['build-id'], [(start, size, str(key), str(fingerprint))
+                                       for (start, size, key, fingerprint) in table['functions']])
+
+
+class CoverageStore:
+    """Covered PCs of executed inputs, kept across runs and rebuilds
+
+    Entries are keyed by input digest and hold PCs as (function, offset)
+    pairs tagged with the build they were last valid for. After a rebuild,
+    the function tables of both builds are diffed: entries that only cover
+    unchanged functions are carried over to the new build, the others are
+    dropped so that their inputs get executed again. load_table(build_id)
+    returns the FunctionTable of an earlier build, None if it is unknown.
+    """
+
+    State_File = 'build-id'
+
+    def __init__(self, path, table, load_table):
+        self.path = path
+        self.table = table
+        self.load_table = load_table
+        self.changed = {}
+        self.lock = threading.Lock()
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def entry_path(self, digest):
+        return os.path.join(self.path, digest + '.json')
+
+    def changed_functions(self, build_id):
+        ### None if nothing can be carried over from that build
+        with self.lock:
+            if build_id not in self.changed:
+                old = self.load_table(build_id)
+                self.changed[build_id] = self.table.changed_since(old) if old else None
+            return self.changed[build_id]
+
+    def get(self, digest):
+        """Covered PCs of the input in the current build, None if the input
+        has to be executed"""
+
+        path = self.entry_path(digest)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (IOError, ValueError):
+            return None
+
+        if entry['build-id'] != self.table.build_id:
+            changed = self.changed_functions(entry['build-id'])
+            if changed is None or changed.intersection(entry['pcs']):
+                self.remove(path)
+                return None
+            entry['build-id'] = self.table.build_id
+            self.write(path, entry)
+
+        return sorted(self.table.address(key, offset)
+                      for key, offsets in entry['pcs'].items() for offset in offsets)
+
+    def put(self, digest, pcs):
+        """Store the covered PCs of an input, False if some PC lies outside
+        every known function"""
+
+        functions = {}
+        for pc in pcs:
+            located = self.table.locate(pc)
+            if located is None:
+                return False
+            functions.setdefault(located[0], []).append(located[1])
+        self.write(self.entry_path(digest), {'build-id': self.table.build_id, 'pcs': functions})
+        return True
+
+    def reconcile(self):
+        """Carry entries over to the current build once after a rebuild,
+        returns the numbers of kept and dropped entries"""
+
+        state = os.path.join(self.path, self.State_File)
+        if os.path.isfile(state):
+            with open(state) as f:
+                if f.read().strip() == self.table.build_id:
+                    return None
+
+        kept = dropped = 0
+        for fname in os.listdir(self.path):
+            if not fname.endswith('.json'):
+                continue
+            if self.get(fname[:-len('.json')]) is None:
+                dropped += 1
+            else:
+                kept += 1
+
+        with open(state + '.tmp', 'w') as f:
+            f.write(self.table.build_id + '\n')
+        os.rename(state + '.tmp', state)
+        return kept, dropped
+
+    @staticmethod
+    def write(path, entry):
+        tmp = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.current_thread().ident)
+        with open(tmp, 'w') as f:
+            json.dump(entry, f, separators=(',', ':'))
+        os.rename(tmp, path)
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,95 @@
+#
+#  File: aflsancov/diff.py
+#
+#  Purpose: Delta diff (dice) of crashing and non-crashing coverage
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import collections
+
+Granularities = ['line', 'function', 'file']
+
+
+def coarsen(report, granularity):
+    """Project (filepath, function, line, col) coverage onto (filepath,
+    function) or (filepath,) entries"""
+
+    if granularity == 'function':
+        return set(cov_entry[:2] for cov_entry in report)
+    if granularity == 'file':
+        return set(cov_entry[:1] for cov_entry in report)
+    return report
+
+
+def dice(crash_pos, parent_pos, granularity='line'):
+    """Entries covered by the crashing input only, ordered by file, line and column"""
+
+    if granularity != 'line':
+        return sorted(coarsen(crash_pos, granularity).difference(coarsen(parent_pos, granularity)))
+
+    return sorted(crash_pos.difference(parent_pos),
+                  key=lambda cov_entry: (cov_entry[0], cov_entry[2], cov_entry[3]))
+
+
+def dd_stats(crashfile, crashdd_pos_list, slice_linecount, parentfile=None, granularity='line'):
+    """Summarize the dice lines of one crash as written to its JSON file,
+    for coarse granularities counts are of functions or files"""
+
+    if parentfile:
+        dict = {"crashing-input": crashfile, "parent-input": parentfile, "diff-node-spec": []}
+    else:
+        dict = {"crashing-input": crashfile, "diff-node-spec": []}
+
+    counter = collections.Counter(':'.join(str(val) for val in tpl) for tpl in crashdd_pos_list)
+
+    sorted_list = counter.most_common()
+    for tpl in sorted_list:
+        dict['diff-node-spec'].append({'line': tpl[0], 'count': tpl[1]})
+
+    dice_linecount = len(sorted_list)
+
+    dict['slice-linecount'] = slice_linecount
+    dict['dice-linecount'] = dice_linecount
+    dict['shrink-percent'] = 100 - (float(dice_linecount)/slice_linecount)*100
+    if granularity != 'line':
+        dict['granularity'] = granularity
+
+    return dict
+
+
+def hit_stats(crashfile, nodes, slice_linecount, parentfile=None):
+    """Same summary as dd_stats for hit count diffs, nodes as returned by
+    HitMap.diff"""
+
+    if parentfile:
+        dict = {"crashing-input": crashfile, "parent-input": parentfile, "diff-node-spec": []}
+    else:
+        dict = {"crashing-input": crashfile, "diff-node-spec": []}
+
+    for (line, count, hits, hit_delta) in nodes:
+        dict['diff-node-spec'].append({'line': ':'.join(str(val) for val in line), 'count': count,
+                                       'hits': hits, 'hit-delta': hit_delta})
+
+    dice_linecount = len(nodes)
+
+    dict['slice-linecount'] = slice_linecount
+    dict['dice-linecount'] = dice_linecount
+    dict['shrink-percent'] = 100 - (float(dice_linecount)/slice_linecount)*100 if slice_linecount else 0.0
+
+    return dict
@@ -0,0 +1,139 @@
+#
+#  File: aflsancov/distributed.py
+#
+#  Purpose: Lease directory work queue for coordinator/worker runs
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import time
+from shutil import rmtree
+
+
+class LeaseDir:
+    """Work queue over a shared filesystem directory
+
+    Tasks move between pending/, leased/ and done/ by atomic renames, so any
+    number of workers on any number of nodes can claim work without a server.
+    A leased task carries the worker id in its name and its mtime serves as
+    heartbeat; leases that go stale are handed back to pending/. Each worker
+    writes the results of a task to a dir of its own, and the worker that
+    completes the task names the dir the coordinator merges.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pending_dir = os.path.join(path, 'pending')
+        self.leased_dir = os.path.join(path, 'leased')
+        self.done_dir = os.path.join(path, 'done')
+        self.results_top = os.path.join(path, 'results')
+        self.workers_dir = os.path.join(path, 'workers')
+
+    def reset(self):
+        if os.path.isdir(self.path):
+            rmtree(self.path)
+        for d in [self.path, self.pending_dir, self.leased_dir, self.done_dir,
+                  self.results_top, self.workers_dir]:
+            os.mkdir(d)
+
+    def publish(self, items):
+        """Queue one task per item, returns the task names in item order"""
+
+        width = len(str(len(items)))
+        tasks = []
+        for seq, item in enumerate(items):
+            task = '{}.task'.format(str(seq).zfill(width))
+            tmp = os.path.join(self.path, task + '.tmp')
+            with open(tmp, 'w') as f:
+                f.write(item + '\n')
+            os.rename(tmp, os.path.join(self.pending_dir, task))
+            tasks.append(task)
+        return tasks
+
+    def claim(self, worker):
+        """Lease the first pending task, returns (task, item) or None"""
+
+        for task in sorted(os.listdir(self.pending_dir)):
+            lease = os.path.join(self.leased_dir, task + '.' + worker)
+            try:
+                os.rename(os.path.join(self.pending_dir, task), lease)
+            except OSError:
+                # Claimed by another worker in the meantime
+                continue
+            try:
+                os.utime(lease, None)
+                with open(lease) as f:
+                    return task, f.read().rstrip('\n')
+            except (OSError, IOError):
+                # The lease kept the task's old mtime until utime and was
+                # reclaimed as stale right away
+                continue
+        return None
+
+    def lease_path(self, task, worker):
+        return os.path.join(self.leased_dir, task + '.' + worker)
+
+    def heartbeat(self, task, worker):
+        try:
+            os.utime(self.lease_path(task, worker), None)
+        except OSError:
+            pass
+
+    def complete(self, task, worker):
+        """Move the lease to done/, False if it was reclaimed in the meantime
+        and the task belongs to another worker now"""
+
+        try:
+            os.rename(self.lease_path(task, worker), os.path.join(self.done_dir, task + '.' + worker))
+        except OSError:
+            return False
+        return True
+
+    def reclaim(self, timeout):
+        """Hand leases without a heartbeat for `timeout` seconds back to
+        pending/, returns the reassigned (task, worker) pairs"""
+
+        reclaimed = []
+        deadline = time.time() - timeout
+        for lease in sorted(os.listdir(self.leased_dir)):
+            path = os.path.join(self.leased_dir, lease)
+            try:
+                if os.path.getmtime(path) >= deadline:
+                    continue
+                task, worker = lease.split('.task.', 1)
+                os.rename(path, os.path.join(self.pending_dir, task + '.task'))
+            except OSError:
+                continue
+            reclaimed.append((task + '.task', worker))
+        return reclaimed
+
+    def results_dir(self, task, worker):
+        return os.path.join(self.results_top, task + '.' + worker)
+
+    def done(self):
+        """(task, worker) pairs of completed tasks"""
+
+        done = []
+        for entry in os.listdir(self.done_dir):
+            task, worker = entry.split('.task.', 1)
+            done.append((task + '.task', worker))
+        return sorted(done)
+
+    def idle(self):
+        return not os.listdir(self.pending_dir) and not os.listdir(self.leased_dir)
@@ -0,0 +1,822 @@
+#
+#  File: aflsancov/dwarf.py
+#
+#  Purpose: In-process symbolization from ELF .debug_line/.debug_info
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import re
+import bisect
+import struct
+import posixpath
+import zlib
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class DwarfError(Exception):
+    pass
+
+
+def native(data):
+    ### Names as str, like the ones parsed from llvm-symbolizer output
+    return data if isinstance(data, str) else data.decode('utf-8', 'replace')
+
+
+class Reader:
+    """Cursor over a section, in the ELF file's byte order"""
+
+    def __init__(self, data, offset=0, endian='<'):
+        self.data = data
+        self.offset = offset
+        self.endian = endian
+
+    def unpack(self, fmt, size):
+        value = struct.unpack_from(self.endian + fmt, self.data, self.offset)[0]
+        self.offset += size
+        return value
+
+    def u8(self):
+        return self.unpack('B', 1)
+
+    def s8(self):
+        return self.unpack('b', 1)
+
+    def u16(self):
+        return self.unpack('H', 2)
+
+    def u24(self):
+        low = self.u16()
+        return low | self.u8() << 16 if self.endian == '<' else low << 8 | self.u8()
+
+    def u32(self):
+        return self.unpack('I', 4)
+
+    def u64(self):
+        return self.unpack('Q', 8)
+
+    def uint(self, size):
+        return {1: self.u8, 2: self.u16, 3: self.u24, 4: self.u32, 8: self.u64}[size]()
+
+    def uleb(self):
+        value = shift = 0
+        while True:
+            byte = self.u8()
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                return value
+
+    def sleb(self):
+        value = shift = 0
+        while True:
+            byte = self.u8()
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if byte < 0x80:
+                if byte & 0x40:
+                    value -= 1 << shift
+                return value
+
+    def cstr(self):
+        end = self.data.index(b'\0', self.offset)
+        value = native(self.data[self.offset:end])
+        self.offset = end + 1
+        return value
+
+    def initial_length(self):
+        ### Returns (unit length, offset size) of 32 or 64-bit DWARF
+        length = self.u32()
+        if length == 0xffffffff:
+            return self.u64(), 8
+        return length, 4
+
+
+class ElfFile:
+    """Section and symbol access of an ELF file"""
+
+    SHF_COMPRESSED = 0x800
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        if self.data[:4] != b'\x7fELF':
+            raise DwarfError("{} is not an ELF file".format(path))
+
+        elf_class, elf_data = struct.unpack_from('BB', self.data, 4)
+        self.is64 = elf_class == 2
+        self.endian = '<' if elf_data == 1 else '>'
+        if self.is64:
+            shoff, = struct.unpack_from(self.endian + 'Q', self.data, 0x28)
+            shentsize, shnum, shstrndx = struct.unpack_from(self.endian + 'HHH', self.data, 0x3a)
+            shdr = 'IIQQQQIIQQ'
+        else:
+            shoff, = struct.unpack_from(self.endian + 'I', self.data, 0x20)
+            shentsize, shnum, shstrndx = struct.unpack_from(self.endian + 'HHH', self.data, 0x2e)
+            shdr = 'IIIIIIIIII'
+
+        headers = [struct.unpack_from(self.endian + shdr, self.data, shoff + idx * shentsize)
+                   for idx in range(shnum)]
+        names = headers[shstrndx][4] if headers else 0
+        self.sections = {}
+        for (name, sh_type, flags, addr, offset, size, link, info, align, entsize) in headers:
+            end = self.data.index(b'\0', names + name)
+            self.sections[native(self.data[names + name:end])] = \
+                (sh_type, flags, offset, size, link, entsize)
+        self.headers = headers
+
+    def section(self, name):
+        if name not in self.sections:
+            return None
+        sh_type, flags, offset, size, link, entsize = self.sections[name]
+        if sh_type == 8:
+            # SHT_NOBITS
+            return None
+        data = self.data[offset:offset + size]
+        if flags & self.SHF_COMPRESSED:
+            ### Elf_Chdr, ch_type 1 is zlib
+            chdr_size = 24 if self.is64 else 12
+            if struct.unpack_from(self.endian + 'I', data, 0)[0] != 1:
+                raise DwarfError("Unsupported compression of section {}".format(name))
+            data = zlib.decompress(data[chdr_size:])
+        return data
+
+    def functions(self):
+        """(address, size, name, file) of the STT_FUNC symbols in .symtab,
+        file is that of the preceding STT_FILE symbol for local symbols"""
+
+        if '.symtab' not in self.sections:
+            return []
+        sh_type, flags, offset, size, link, entsize = self.sections['.symtab']
+        strtab = self.headers[link][4]
+        functions = []
+        file_name = None
+        for pos in range(offset, offset + size, entsize):
+            if self.is64:
+                name, info, other, shndx, value, sym_size = struct.unpack_from(self.endian + 'IBBHQQ',
+                                                                             self.data, pos)
+            else:
+                name, value, sym_size, info, other, shndx = struct.unpack_from(self.endian + 'IIIBBH',
+                                                                             self.data, pos)
+            end = self.data.index(b'\0', strtab + name)
+            if info & 0xf == 4:
+                # STT_FILE
+                file_name = native(self.data[strtab + name:end])
+            elif info & 0xf == 2 and shndx and value:
+                # STT_FUNC
+                functions.append((value, sym_size, native(self.data[strtab + name:end]),
+                                  file_name if info >> 4 == 0 else None))
+        return functions
+
+
+### DWARF constants, see the DWARF 5 standard, section 7
+DW_TAG_inlined_subroutine = 0x1d
+DW_TAG_compile_unit = 0x11
+DW_TAG_subprogram = 0x2e
+DW_TAG_partial_unit = 0x3c
+DW_TAG_skeleton_unit = 0x4a
+
+DW_AT_name = 0x03
+DW_AT_stmt_list = 0x10
+DW_AT_low_pc = 0x11
+DW_AT_high_pc = 0x12
+DW_AT_comp_dir = 0x1b
+DW_AT_abstract_origin = 0x31
+DW_AT_declaration = 0x3c
+DW_AT_specification = 0x47
+DW_AT_ranges = 0x55
+DW_AT_call_column = 0x57
+DW_AT_call_file = 0x58
+DW_AT_call_line = 0x59
+DW_AT_linkage_name = 0x6e
+DW_AT_str_offsets_base = 0x72
+DW_AT_addr_base = 0x73
+DW_AT_rnglists_base = 0x74
+DW_AT_MIPS_linkage_name = 0x2007
+
+DW_FORM_addr = 0x01
+DW_FORM_data2 = 0x05
+DW_FORM_data4 = 0x06
+DW_FORM_data8 = 0x07
+DW_FORM_string = 0x08
+DW_FORM_data1 = 0x0b
+DW_FORM_sdata = 0x0d
+DW_FORM_strp = 0x0e
+DW_FORM_udata = 0x0f
+DW_FORM_ref_addr = 0x10
+DW_FORM_ref1 = 0x11
+DW_FORM_ref2 = 0x12
+DW_FORM_ref4 = 0x13
+DW_FORM_ref8 = 0x14
+DW_FORM_ref_udata = 0x15
+DW_FORM_indirect = 0x16
+DW_FORM_sec_offset = 0x17
+DW_FORM_strx = 0x1a
+DW_FORM_addrx = 0x1b
+DW_FORM_data16 = 0x1e
+DW_FORM_line_strp = 0x1f
+DW_FORM_implicit_const = 0x21
+DW_FORM_rnglistx = 0x23
+DW_FORM_GNU_addr_index = 0x1f01
+DW_FORM_GNU_str_index = 0x1f02
+
+Fixed_Forms = {0x0b: 1, 0x05: 2, 0x06: 4, 0x07: 8, 0x1e: 16, 0x0c: 1, 0x11: 1, 0x12: 2, 0x13: 4, 0x14: 8,
+               0x20: 8, 0x1c: 4, 0x24: 8}
+Block_Forms = {0x0a: 'u8', 0x03: 'u16', 0x04: 'u32', 0x09: 'uleb', 0x18: 'uleb'}
+Offset_Forms = (0x0e, 0x17, 0x1f, 0x1d, 0x1f20, 0x1f21)
+Uleb_Forms = (0x0f, 0x15, 0x1a, 0x1b, 0x22, 0x23, 0x1f01, 0x1f02)
+Strx_Forms = {0x25: 1, 0x26: 2, 0x27: 3, 0x28: 4}
+Addrx_Forms = {0x29: 1, 0x2a: 2, 0x2b: 3, 0x2c: 4}
+Ref_Forms = (0x11, 0x12, 0x13, 0x14, 0x15)
+
+DW_LNCT_path = 1
+DW_LNCT_directory_index = 2
+
+
+class Unit:
+    """Per compilation unit state needed to resolve attribute values"""
+
+    def __init__(self, offset, version, offset_size, address_size):
+        self.offset = offset
+        self.version = version
+        self.offset_size = offset_size
+        self.address_size = address_size
+        self.str_offsets_base = None
+        self.addr_base = None
+        self.rnglists_base = None
+        self.comp_dir = ''
+        self.files = []
+
+
+class Function:
+    """A subprogram or inlined subroutine DIE with its address ranges"""
+
+    def __init__(self, die_offset, ranges, call=None):
+        self.die_offset = die_offset
+        self.ranges = ranges
+        self.call = call
+        self.children = []
+
+    def contains(self, pc):
+        return any(low <= pc < high for (low, high) in self.ranges)
+
+
+class DwarfSymbolizer:
+    """Resolves PCs to (file, function, line, column) frames like
+    llvm-symbolizer, from the binary's DWARF parsed once
+
+    The line tables of all units become one address sorted row table and
+    subprograms (with their inlined subroutines) one sorted range table, so
+    symbolizing is a binary search per PC: numpy.searchsorted over all PCs
+    at once when numpy is available, bisect otherwise. Frames of inlined
+    code come innermost first, as llvm-symbolizer prints them. Frames are
+    dropped where llvm-symbolizer's output would not pass line_cov_regex,
+    this includes all mangled (C++) names: demangled, they carry a
+    parameter list.
+    """
+
+    ### Frames llvm-symbolizer output would not yield through line_cov_regex
+    Function_Regex = re.compile(r"^[\w|\-|\:]+$")
+
+    def __init__(self, path):
+        self.elf = ElfFile(path)
+        self.endian = self.elf.endian
+        self.info = self.elf.section('.debug_info')
+        if not self.info:
+            raise DwarfError("No .debug_info in {}".format(path))
+        self.abbrev = self.elf.section('.debug_abbrev') or b''
+        self.line = self.elf.section('.debug_line') or b''
+        self.str = self.elf.section('.debug_str') or b''
+        self.line_str = self.elf.section('.debug_line_str') or b''
+        self.str_offsets = self.elf.section('.debug_str_offsets') or b''
+        self.addr = self.elf.section('.debug_addr') or b''
+        self.ranges = self.elf.section('.debug_ranges') or b''
+        self.rnglists = self.elf.section('.debug_rnglists') or b''
+
+        self.abbrev_cache = {}
+        self.names = {}
+        self.refs = {}
+        self.functions = []
+        self.rows = []
+        self.files = []
+        self.file_idx = {}
+        self.parse_info()
+        self.build_tables()
+
+    ### .debug_abbrev
+
+    def abbrevs(self, offset):
+        if offset not in self.abbrev_cache:
+            table = {}
+            reader = Reader(self.abbrev, offset, self.endian)
+            while True:
+                code = reader.uleb()
+                if not code:
+                    break
+                tag = reader.uleb()
+                has_children = reader.u8()
+                specs = []
+                while True:
+                    attr, form = reader.uleb(), reader.uleb()
+                    if not attr and not form:
+                        break
+                    specs.append((attr, form, reader.sleb() if form == DW_FORM_implicit_const else None))
+                table[code] = (tag, has_children, specs)
+            self.abbrev_cache[offset] = table
+        return self.abbrev_cache[offset]
+
+    ### .debug_info
+
+    def read_form(self, reader, form, unit, implicit):
+        """Raw attribute value, index forms are resolved later against the
+        unit's bases"""
+
+        if form == DW_FORM_indirect:
+            return self.read_form(reader, reader.uleb(), unit, implicit)
+        if form == DW_FORM_implicit_const:
+            return implicit
+        if form == 0x19:
+            # DW_FORM_flag_present
+            return 1
+        if form == DW_FORM_addr:
+            return reader.uint(unit.address_size)
+        if form == DW_FORM_string:
+            return reader.cstr()
+        if form == DW_FORM_sdata:
+            return reader.sleb()
+        if form == DW_FORM_ref_addr:
+            return reader.uint(unit.address_size if unit.version == 2 else unit.offset_size)
+        if form in Offset_Forms:
+            return reader.uint(unit.offset_size)
+        if form in Uleb_Forms:
+            return reader.uleb()
+        if form in Strx_Forms:
+            return reader.uint(Strx_Forms[form])
+        if form in Addrx_Forms:
+            return reader.uint(Addrx_Forms[form])
+        if form in Fixed_Forms:
+            size = Fixed_Forms[form]
+            value = reader.uint(size) if size <= 8 else None
+            if size > 8:
+                reader.offset += size
+            return value
+        if form in Block_Forms:
+            size = getattr(reader, Block_Forms[form])()
+            reader.offset += size
+            return None
+        raise DwarfError("Unknown DWARF form 0x{:x}".format(form))
+
+    def string(self, form, value, unit):
+        if form == DW_FORM_string:
+            return value
+        if form == DW_FORM_strp:
+            return Reader(self.str, value).cstr()
+        if form == DW_FORM_line_strp:
+            return Reader(self.line_str, value).cstr()
+        if form in (DW_FORM_strx, DW_FORM_GNU_str_index) or form in Strx_Forms:
+            base = unit.str_offsets_base if unit.str_offsets_base is not None else 8
+            offset = Reader(self.str_offsets, base + value * unit.offset_size, self.endian).uint(unit.offset_size)
+            return Reader(self.str, offset).cstr()
+        return None
+
+    def address(self, form, value, unit):
+        if form in (DW_FORM_addrx, DW_FORM_GNU_addr_index) or form in Addrx_Forms:
+            base = unit.addr_base if unit.addr_base is not None else 8
+            return Reader(self.addr, base + value * unit.address_size, self.endian).uint(unit.address_size)
+        return value
+
+    def die_ranges(self, attrs, unit, base_address):
+        if DW_AT_low_pc in attrs and DW_AT_high_pc in attrs:
+            low = self.address(attrs[DW_AT_low_pc][0], attrs[DW_AT_low_pc][1], unit)
+            form, high = attrs[DW_AT_high_pc]
+            if form not in (DW_FORM_addr, DW_FORM_addrx, DW_FORM_GNU_addr_index) and form not in Addrx_Forms:
+                ### DWARF 4+: high_pc as offset from low_pc
+                high += low
+            return [(low, high)] if high > low else []
+        if DW_AT_ranges in attrs:
+            form, value = attrs[DW_AT_ranges]
+            if unit.version >= 5:
+                return self.rnglist(form, value, unit, base_address)
+            return self.range_list(value, unit, base_address)
+        return []
+
+    def range_list(self, offset, unit, base_address):
+        ### DWARF 2-4 .debug_ranges
+        reader = Reader(self.ranges, offset, self.endian)
+        ranges = []
+        all_ones = (1 << (8 * unit.address_size)) - 1
+        while True:
+            start, end = reader.uint(unit.address_size), reader.uint(unit.address_size)
+            if not start and not end:
+                return ranges
+            if start == all_ones:
+                base_address = end
+            elif end > start:
+                ranges.append((base_address + start, base_address + end))
+
+    def rnglist(self, form, value, unit, base_address):
+        ### DWARF 5 .debug_rnglists
+        if form == DW_FORM_rnglistx:
+            base = unit.rnglists_base if unit.rnglists_base is not None else 12
+            value = base + Reader(self.rnglists, base + value * unit.offset_size,
+                                  self.endian).uint(unit.offset_size)
+        reader = Reader(self.rnglists, value, self.endian)
+        ranges = []
+        while True:
+            kind = reader.u8()
+            if kind == 0:
+                # DW_RLE_end_of_list
+                return [r for r in ranges if r[1] > r[0]]
+            if kind == 1:
+                # DW_RLE_base_addressx
+                base_address = self.address(DW_FORM_addrx, reader.uleb(), unit)
+            elif kind == 2:
+                # DW_RLE_startx_endx
+                ranges.append((self.address(DW_FORM_addrx, reader.uleb(), unit),
+                               self.address(DW_FORM_addrx, reader.uleb(), unit)))
+            elif kind == 3:
+                # DW_RLE_startx_length
+                start = self.address(DW_FORM_addrx, reader.uleb(), unit)
+                ranges.append((start, start + reader.uleb()))
+            elif kind == 4:
+                # DW_RLE_offset_pair
+                start, end = reader.uleb(), reader.uleb()
+                ranges.append((base_address + start, base_address + end))
+            elif kind == 5:
+                # DW_RLE_base_address
+                base_address = reader.uint(unit.address_size)
+            elif kind == 6:
+                # DW_RLE_start_end
+                ranges.append((reader.uint(unit.address_size), reader.uint(unit.address_size)))
+            elif kind == 7:
+                # DW_RLE_start_length
+                start = reader.uint(unit.address_size)
+                ranges.append((start, start + reader.uleb()))
+            else:
+                raise DwarfError("Unknown range list entry {}".format(kind))
+
+    def parse_info(self):
+        reader = Reader(self.info, 0, self.endian)
+        while reader.offset < len(self.info):
+            unit_offset = reader.offset
+            length, offset_size = reader.initial_length()
+            unit_end = reader.offset + length
+            version = reader.u16()
+            unit_type = DW_TAG_compile_unit
+            if version >= 5:
+                unit_type = reader.u8()
+                address_size = reader.u8()
+                abbrev_offset = reader.uint(offset_size)
+                if unit_type in (2, 6):
+                    # DW_UT_type, DW_UT_split_type
+                    reader.offset = unit_end
+                    continue
+                if unit_type in (4, 5):
+                    # DW_UT_skeleton, DW_UT_split_compile
+                    reader.u64()
+            else:
+                abbrev_offset = reader.uint(offset_size)
+                address_size = reader.u8()
+            unit = Unit(unit_offset, version, offset_size, address_size)
+            self.parse_unit(reader, unit, self.abbrevs(abbrev_offset), unit_end)
+            reader.offset = unit_end
+
+    def parse_unit(self, reader, unit, abbrevs, unit_end):
+        ### Stack of (Function or None) per open DIE with children
+        stack = []
+        base_address = 0
+        first = True
+        while reader.offset < unit_end:
+            die_offset = reader.offset
+            code = reader.uleb()
+            if not code:
+                if stack:
+                    stack.pop()
+                continue
+            tag, has_children, specs = abbrevs[code]
+            attrs = {}
+            for (attr, form, implicit) in specs:
+                attrs[attr] = (form, self.read_form(reader, form, unit, implicit))
+
+            if first:
+                ### Unit DIE, its bases apply to all index forms of the unit
+                first = False
+                for attr, name in [(DW_AT_str_offsets_base, 'str_offsets_base'), (DW_AT_addr_base, 'addr_base'),
+                                   (DW_AT_rnglists_base, 'rnglists_base')]:
+                    if attr in attrs:
+                        setattr(unit, name, attrs[attr][1])
+                if DW_AT_comp_dir in attrs:
+                    unit.comp_dir = self.string(attrs[DW_AT_comp_dir][0], attrs[DW_AT_comp_dir][1], unit) or ''
+                if DW_AT_low_pc in attrs:
+                    base_address = self.address(attrs[DW_AT_low_pc][0], attrs[DW_AT_low_pc][1], unit)
+                if DW_AT_stmt_list in attrs:
+                    unit.files = self.parse_line_program(attrs[DW_AT_stmt_list][1], unit)
+
+            self.record_names(die_offset, attrs, unit)
+
+            function = None
+            if tag in (DW_TAG_subprogram, DW_TAG_inlined_subroutine) and DW_AT_declaration not in attrs:
+                ranges = self.die_ranges(attrs, unit, base_address)
+                if ranges:
+                    call = None
+                    if tag == DW_TAG_inlined_subroutine:
+                        call = (self.unit_file(unit, attrs.get(DW_AT_call_file, (0, 0))[1]),
+                                attrs.get(DW_AT_call_line, (0, 0))[1], attrs.get(DW_AT_call_column, (0, 0))[1])
+                    function = Function(die_offset, ranges, call)
+                    parent = next((f for f in reversed(stack) if f is not None), None)
+                    if parent is not None and tag == DW_TAG_inlined_subroutine:
+                        parent.children.append(function)
+                    elif tag == DW_TAG_subprogram:
+                        self.functions.append(function)
+                    else:
+                        function = None
+
+            if has_children:
+                stack.append(function)
+
+    def record_names(self, die_offset, attrs, unit):
+        name = linkage = None
+        for attr in (DW_AT_linkage_name, DW_AT_MIPS_linkage_name):
+            if attr in attrs:
+                linkage = self.string(attrs[attr][0], attrs[attr][1], unit)
+        if DW_AT_name in attrs:
+            name = self.string(attrs[DW_AT_name][0], attrs[DW_AT_name][1], unit)
+        if linkage:
+            name = linkage
+        if name:
+            self.names[die_offset] = name
+        for attr in (DW_AT_abstract_origin, DW_AT_specification):
+            if attr in attrs:
+                form, value = attrs[attr]
+                self.refs[die_offset] = value + unit.offset if form in Ref_Forms else value
+
+    def function_name(self, die_offset):
+        seen = set()
+        while die_offset not in self.names and die_offset in self.refs and die_offset not in seen:
+            seen.add(die_offset)
+            die_offset = self.refs[die_offset]
+        return self.names.get(die_offset, '??')
+
+    ### .debug_line
+
+    def unit_file(self, unit, idx):
+        if 0 <= idx < len(unit.files) and unit.files[idx] is not None:
+            return unit.files[idx]
+        return None
+
+    def intern_file(self, path):
+        if path not in self.file_idx:
+            self.file_idx[path] = len(self.files)
+            self.files.append(path)
+        return self.file_idx[path]
+
+    def entry_formats(self, reader):
+        return [(reader.uleb(), reader.uleb()) for _ in range(reader.u8())]
+
+    def read_entries(self, reader, formats, unit):
+        entries = []
+        for _ in range(reader.uleb()):
+            entry = {}
+            for (content, form) in formats:
+                value = self.read_form(reader, form, unit, None)
+                if content == DW_LNCT_path:
+                    entry[content] = self.string(form, value, unit)
+                else:
+                    entry[content] = value
+            entries.append(entry)
+        return entries
+
+    def parse_line_program(self, offset, unit):
+        """Appends the rows of one line number program to self.rows, returns
+        its file table as interned indices"""
+
+        reader = Reader(self.line, offset, self.endian)
+        length, offset_size = reader.initial_length()
+        program_end = reader.offset + length
+        version = reader.u16()
+        line_unit = Unit(unit.offset, version, offset_size, unit.address_size)
+        line_unit.str_offsets_base = unit.str_offsets_base
+        if version >= 5:
+            line_unit.address_size = reader.u8()
+            reader.u8()
+        header_length = reader.uint(offset_size)
+        program_start = reader.offset + header_length
+        min_inst_length = reader.u8()
+        max_ops = reader.u8() if version >= 4 else 1
+        ### default_is_stmt, rows are used whatever their is_stmt, as by
+        ### llvm-symbolizer
+        reader.u8()
+        line_base = reader.s8()
+        line_range = reader.u8()
+        opcode_base = reader.u8()
+        opcode_lengths = [0] + [reader.u8() for _ in range(opcode_base - 1)]
+
+        comp_dir = unit.comp_dir
+        if version >= 5:
+            dirs = [entry.get(DW_LNCT_path) or '' for entry in
+                    self.read_entries(reader, self.entry_formats(reader), line_unit)]
+            files = [(entry.get(DW_LNCT_path) or '', entry.get(DW_LNCT_directory_index, 0)) for entry in
+                     self.read_entries(reader, self.entry_formats(reader), line_unit)]
+        else:
+            dirs = [comp_dir]
+            while True:
+                directory = reader.cstr()
+                if not directory:
+                    break
+                dirs.append(directory)
+            files = [None]
+            while True:
+                name = reader.cstr()
+                if not name:
+                    break
+                files.append((name, reader.uleb()))
+                reader.uleb()
+                reader.uleb()
+
+        def file_path(entry):
+            name, dir_idx = entry
+            if not posixpath.isabs(name):
+                directory = dirs[dir_idx] if dir_idx < len(dirs) else ''
+                if not posixpath.isabs(directory):
+                    directory = posixpath.join(comp_dir, directory)
+                name = posixpath.join(directory, name)
+            return self.intern_file(name)
+
+        def file_table():
+            return [file_path(entry) if entry else None for entry in files]
+
+        table = file_table()
+        reader.offset = program_start
+        ### Rows of the current sequence, rows at or past its end cover nothing
+        rows = []
+
+        address, file_idx, line, column, op_index = 0, 1, 1, 0, 0
+        while reader.offset < program_end:
+            opcode = reader.u8()
+            if opcode >= opcode_base:
+                adjusted = opcode - opcode_base
+                advance = adjusted // line_range
+                address += min_inst_length * ((op_index + advance) // max_ops)
+                op_index = (op_index + advance) % max_ops
+                line += line_base + adjusted % line_range
+                rows.append((address, table[file_idx] if file_idx < len(table) else None, line, column, False))
+            elif opcode == 0:
+                size = reader.uleb()
+                end = reader.offset + size
+                sub = reader.u8() if size else 0
+                if sub == 1:
+                    # DW_LNE_end_sequence
+                    rows = [row for row in rows if row[0] < address]
+                    if rows:
+                        self.rows.extend(rows)
+                        self.rows.append((address, None, line, column, True))
+                    rows = []
+                    address, file_idx, line, column, op_index = 0, 1, 1, 0, 0
+                elif sub == 2:
+                    # DW_LNE_set_address
+                    address = reader.uint(size - 1)
+                    op_index = 0
+                elif sub == 3:
+                    # DW_LNE_define_file
+                    files.append((reader.cstr(), reader.uleb()))
+                    table = file_table()
+                reader.offset = end
+            elif opcode == 1:
+                # DW_LNS_copy
+                rows.append((address, table[file_idx] if file_idx < len(table) else None, line, column, False))
+            elif opcode == 2:
+                # DW_LNS_advance_pc
+                advance = reader.uleb()
+                address += min_inst_length * ((op_index + advance) // max_ops)
+                op_index = (op_index + advance) % max_ops
+            elif opcode == 3:
+                line += reader.sleb()
+            elif opcode == 4:
+                file_idx = reader.uleb()
+            elif opcode == 5:
+                column = reader.uleb()
+            elif opcode == 8:
+                # DW_LNS_const_add_pc
+                advance = (255 - opcode_base) // line_range
+                address += min_inst_length * ((op_index + advance) // max_ops)
+                op_index = (op_index + advance) % max_ops
+            elif opcode == 9:
+                address += reader.u16()
+                op_index = 0
+            else:
+                # negate_stmt, basic_block, prologue/epilogue, isa and unknown opcodes
+                for _ in range(opcode_lengths[opcode]):
+                    reader.uleb()
+
+        return table
+
+    def build_tables(self):
+        ### Sequence ends sort before rows starting at the same address, rows
+        ### at one address keep program order so that the last one wins
+        self.rows.sort(key=lambda row: (row[0], not row[4]))
+        self.row_addresses = [row[0] for row in self.rows]
+
+        self.functions.sort(key=lambda function: min(function.ranges))
+        self.function_ranges = sorted((low, high, idx) for idx, function in enumerate(self.functions)
+                                      for (low, high) in function.ranges)
+        self.function_starts = [low for (low, high, idx) in self.function_ranges]
+
+        ### Like llvm-symbolizer, symbols without a size extend to the next one
+        self.symbols = sorted(self.elf.functions())
+        for idx, (value, size, name, fp) in enumerate(self.symbols):
+            if not size and idx + 1 < len(self.symbols):
+                self.symbols[idx] = (value, self.symbols[idx + 1][0] - value, name, fp)
+        self.symbol_starts = [value for (value, size, name, fp) in self.symbols]
+
+        if numpy:
+            self.row_addresses = numpy.array(self.row_addresses, dtype=numpy.uint64)
+            self.function_starts = numpy.array(self.function_starts, dtype=numpy.uint64)
+
+    def search(self, starts, pcs):
+        ### Index of the last start <= pc for every pc, -1 if none
+        if numpy is not None and isinstance(starts, numpy.ndarray):
+            return (numpy.searchsorted(starts, numpy.array(pcs, dtype=numpy.uint64), side='right') - 1).tolist()
+        return [bisect.bisect_right(starts, pc) - 1 for pc in pcs]
+
+    def function_chain(self, pc, idx):
+        ### Subprogram containing pc and the inlined subroutines down to pc
+        while idx >= 0:
+            low, high, function_idx = self.function_ranges[idx]
+            if low <= pc < high:
+                chain = [self.functions[function_idx]]
+                while True:
+                    inner = next((f for f in chain[-1].children if f.contains(pc)), None)
+                    if inner is None:
+                        return chain
+                    chain.append(inner)
+            ### Ranges do not nest across subprograms, only a few to look back on
+            if pc - low > 1 << 24:
+                break
+            idx -= 1
+        return []
+
+    def symbol(self, pc):
+        ### (name, file) of the function symbol containing pc
+        idx = bisect.bisect_right(self.symbol_starts, pc) - 1
+        if idx >= 0:
+            value, size, name, fp = self.symbols[idx]
+            if pc < value + max(size, 1):
+                return name, fp
+        return '??', None
+
+    def symbolize(self, pcs):
+        """Frames of every PC, in order, each a list of (file, function, line,
+        column) string tuples like linecov_report yields"""
+
+        row_idxs = self.search(self.row_addresses, pcs)
+        function_idxs = self.search(self.function_starts, pcs)
+        frames_list = []
+        for pc, row_idx, function_idx in zip(pcs, row_idxs, function_idxs):
+            fp, line, column = '??', 0, 0
+            if row_idx >= 0 and not self.rows[row_idx][4] and self.rows[row_idx][1] is not None:
+                fp, line, column = self.files[self.rows[row_idx][1]], self.rows[row_idx][2], self.rows[row_idx][3]
+
+            chain = self.function_chain(pc, function_idx)
+            if not chain:
+                ### No debug info, llvm-symbolizer falls back to the symbol
+                ### table and the STT_FILE name of local symbols
+                func, symbol_fp = self.symbol(pc)
+                frames = [(symbol_fp if fp == '??' and symbol_fp else fp, func, line, column)]
+            else:
+                frames = []
+                for depth in range(len(chain) - 1, -1, -1):
+                    func = self.function_name(chain[depth].die_offset)
+                    if not depth:
+                        ### llvm-symbolizer names the outermost frame after the
+                        ### symbol table (e.g. main.cold for split functions)
+                        symbol = self.symbol(pc)[0]
+                        func = func if symbol == '??' else symbol
+                    frames.append((fp, func, line, column))
+                    if chain[depth].call:
+                        fp, line, column = chain[depth].call
+                        fp = self.files[fp] if fp is not None else '??'
+
+            frames_list.append([(frame_fp, frame_func, str(frame_line), str(frame_column))
+                                for (frame_fp, frame_func, frame_line, frame_column) in frames
+                                if self.Function_Regex.match(frame_func) and not frame_func.startswith('_Z')
+                                and ':' not in frame_fp])
+        return frames_list
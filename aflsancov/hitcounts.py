@@ -0,0 +1,126 @@
+#
+#  File: aflsancov/hitcounts.py
+#
+#  Purpose: Per-line hit counts from SanitizerCoverage 8-bit counters
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class HitMap:
+    """Turns 8-bit edge counters into per-line hit counts
+
+    Counter i belongs to the i-th PC of the instrumentation point table in
+    ascending address order. The hit count of a line is the sum of the
+    counters of all PCs mapping to it (uint32). Lines are indexed in
+    (file, line, column) order, which is also the tie-break of rankings.
+    numpy is used when available, plain arrays otherwise.
+    """
+
+    def __init__(self, pc_table):
+        self.num_pcs = len(pc_table.pcs)
+        pcs = sorted(pc_table.pcs)
+
+        frames = set()
+        for pc in pcs:
+            frames.update(pc_table.frames(pc))
+        self.lines = sorted(frames, key=lambda cov_entry: (cov_entry[0], int(cov_entry[2]),
+                                                           int(cov_entry[3]), cov_entry[1]))
+        line_idx = dict((line, idx) for idx, line in enumerate(self.lines))
+
+        pc_index = array.array('l')
+        line_index = array.array('l')
+        for idx, pc in enumerate(pcs):
+            for frame in pc_table.frames(pc):
+                pc_index.append(idx)
+                line_index.append(line_idx[frame])
+
+        if numpy:
+            self.pc_index = numpy.array(pc_index, dtype=numpy.intp)
+            self.line_index = numpy.array(line_index, dtype=numpy.intp)
+        else:
+            self.pc_index = pc_index
+            self.line_index = line_index
+
+    def line_hits(self, counters):
+        """uint32 hit count of every line for one input's raw counters"""
+
+        num = min(len(counters), self.num_pcs)
+        if numpy:
+            pc_hits = numpy.zeros(self.num_pcs, dtype=numpy.uint32)
+            pc_hits[:num] = numpy.frombuffer(counters, dtype=numpy.uint8, count=num)
+            return numpy.bincount(self.line_index, weights=pc_hits[self.pc_index],
+                                  minlength=len(self.lines)).astype(numpy.uint32)
+
+        pc_hits = bytearray(counters[:num])
+        hits = array.array('L', [0]) * len(self.lines)
+        for pc, line in zip(self.pc_index, self.line_index):
+            if pc < num:
+                hits[line] += pc_hits[pc]
+        return hits
+
+    @staticmethod
+    def read_counters(path):
+        """Raw 8-bit counters of a .counters-sancov file, one byte per edge"""
+
+        with open(path, 'rb') as f:
+            return f.read()
+
+    @staticmethod
+    def covered(hits):
+        if numpy:
+            return int(numpy.count_nonzero(hits))
+        return sum(1 for hit in hits if hit)
+
+    def diff(self, crash_hits, parents_hits):
+        """Lines executed more often by the crash than by its parents
+
+        Returns (line, count, hits, hit-delta) tuples ranked by the number of
+        parents the crash exceeds, then by the summed excess hits.
+        """
+
+        if numpy:
+            crash = crash_hits.astype(numpy.int64)
+            counts = numpy.zeros(len(self.lines), dtype=numpy.int64)
+            deltas = numpy.zeros(len(self.lines), dtype=numpy.int64)
+            for parent_hits in parents_hits:
+                delta = crash - parent_hits
+                more = delta > 0
+                counts += more
+                deltas += numpy.where(more, delta, 0)
+            idx = numpy.nonzero(counts)[0]
+            order = idx[numpy.lexsort((idx, -deltas[idx], -counts[idx]))]
+            return [(self.lines[i], int(counts[i]), int(crash_hits[i]), int(deltas[i])) for i in order]
+
+        counts = array.array('l', [0]) * len(self.lines)
+        deltas = array.array('l', [0]) * len(self.lines)
+        for parent_hits in parents_hits:
+            for i, (crash, parent) in enumerate(zip(crash_hits, parent_hits)):
+                if crash > parent:
+                    counts[i] += 1
+                    deltas[i] += crash - parent
+        order = sorted((i for i in range(len(self.lines)) if counts[i]),
+                       key=lambda i: (-counts[i], -deltas[i], i))
+        return [(self.lines[i], counts[i], crash_hits[i], deltas[i]) for i in order]
@@ -0,0 +1,178 @@
+#
+#  File: aflsancov/hotspots.py
+#
+#  Purpose: Cross-crash hotspot aggregation of delta-diff results
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import json
+import time
+import collections
+import threading
+
+
+class HotspotAggregator:
+    """Running statistics over the dice of all crashes of a run
+
+    Keeps, per dice line, the number of crashes it shows up in and the
+    summed node counts, how often pairs of lines show up together and the
+    distribution of shrink-percent. Lines are interned, and the state is
+    checkpointed to a JSON file every `checkpoint_every` crashes or
+    `checkpoint_secs` seconds, so long runs have a current report and can
+    resume from it. Each crash's contribution is kept, so a crash added
+    again (e.g. analyzed deeper by a resumed run) replaces its earlier one.
+    Crashes the budget cut short (partial) are counted, and every hotspot
+    reports how many of its crashes were partial. Flaky crashes (see
+    --repro-runs) are kept out of the ranking and only listed.
+    """
+
+    # Pairs are counted among the highest ranked nodes of a dice only
+    Max_Pair_Nodes = 16
+    Top_Hotspots = 50
+    Shrink_Buckets = 10
+
+    def __init__(self, path, checkpoint_every=100, checkpoint_secs=60):
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_secs = checkpoint_secs
+        self.lock = threading.Lock()
+        self.lines = []
+        self.line_idx = {}
+        self.line_crashes = []
+        self.line_hits = []
+        self.line_partial = []
+        self.pairs = collections.Counter()
+        self.shrink = [0] * self.Shrink_Buckets
+        # crash key -> {'nodes': [[line idx, count]], 'bucket': shrink bucket,
+        #               'partial': true if the budget cut the crash short,
+        #               'flaky': true if not counted as the crash is flaky}
+        self.contributions = {}
+        self.pending = 0
+        self.last_checkpoint = time.time()
+
+        if os.path.isfile(path):
+            self.load()
+
+    def intern(self, spec):
+        if spec not in self.line_idx:
+            self.line_idx[spec] = len(self.lines)
+            self.lines.append(spec)
+            self.line_crashes.append(0)
+            self.line_hits.append(0)
+            self.line_partial.append(0)
+        return self.line_idx[spec]
+
+    def add(self, stats, build=None):
+        key = '{}/{}'.format(build, stats['crashing-input']) if build else stats['crashing-input']
+        with self.lock:
+            ### A crash counted before is replaced, not counted twice
+            if key in self.contributions:
+                old = self.contributions.pop(key)
+                if not old.get('flaky'):
+                    self.count(old, -1)
+
+            bucket = int(stats['shrink-percent'] * self.Shrink_Buckets / 100)
+            contribution = {'nodes': [[self.intern(node['line']), node['count']]
+                                      for node in stats['diff-node-spec']],
+                            'bucket': max(0, min(bucket, self.Shrink_Buckets - 1))}
+            if stats.get('partial'):
+                contribution['partial'] = True
+            if stats.get('flaky'):
+                contribution['flaky'] = True
+            else:
+                self.count(contribution, 1)
+            self.contributions[key] = contribution
+
+            self.pending += 1
+            if self.pending >= self.checkpoint_every \
+                    or time.time() - self.last_checkpoint >= self.checkpoint_secs:
+                self.save()
+
+    def count(self, contribution, sign):
+        ### Add (sign 1) or subtract (sign -1) one crash's contribution
+        idxs = []
+        partial = sign if contribution.get('partial') else 0
+        for idx, hits in contribution['nodes']:
+            self.line_crashes[idx] += sign
+            self.line_hits[idx] += sign * hits
+            self.line_partial[idx] += partial
+            idxs.append(idx)
+
+        top = sorted(idxs[:self.Max_Pair_Nodes])
+        for i in range(len(top)):
+            for j in range(i + 1, len(top)):
+                self.pairs[(top[i], top[j])] += sign
+                if not self.pairs[(top[i], top[j])]:
+                    del self.pairs[(top[i], top[j])]
+
+        self.shrink[contribution['bucket']] += sign
+
+    def hotspots(self, num=None):
+        """Lines ranked by the number of crashes whose dice they are in"""
+
+        num = num or self.Top_Hotspots
+        crashes = self.counted()
+        order = sorted((i for i in range(len(self.lines)) if self.line_crashes[i]),
+                       key=lambda i: (-self.line_crashes[i], -self.line_hits[i], i))
+        return [{'line': self.lines[i], 'crashes': self.line_crashes[i], 'count': self.line_hits[i],
+                 'share': float(self.line_crashes[i]) / crashes, 'partial': self.line_partial[i]}
+                for i in order[:num]]
+
+    def counted(self):
+        return sum(1 for contribution in self.contributions.values() if not contribution.get('flaky'))
+
+    def cooccurring(self, num=None):
+        num = num or self.Top_Hotspots
+        return [{'lines': [self.lines[i], self.lines[j]], 'crashes': n}
+                for ((i, j), n) in sorted(self.pairs.items(), key=lambda kv: (-kv[1], kv[0]))[:num]]
+
+    def save(self):
+        ### Called with self.lock held or once processing is done
+        state = {'crashes': self.counted(), 'hotspots': self.hotspots(), 'cooccurring': self.cooccurring(),
+                 'partial-crashes': sum(1 for contribution in self.contributions.values()
+                                        if contribution.get('partial') and not contribution.get('flaky')),
+                 'flaky-crashes': sorted(key for key, contribution in self.contributions.items()
+                                         if contribution.get('flaky')),
+                 'shrink-histogram': self.shrink, 'lines': self.lines, 'line-crashes': self.line_crashes,
+                 'line-counts': self.line_hits, 'line-partial': self.line_partial,
+                 'pairs': [[i, j, n] for ((i, j), n) in sorted(self.pairs.items())],
+                 'contributions': self.contributions}
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.rename(tmp, self.path)
+        self.pending = 0
+        self.last_checkpoint = time.time()
+
+    def load(self):
+        with open(self.path) as f:
+            state = json.load(f)
+        self.lines = state['lines']
+        self.line_idx = dict((spec, idx) for idx, spec in enumerate(self.lines))
+        self.line_crashes = state['line-crashes']
+        self.line_hits = state['line-counts']
+        self.line_partial = state.get('line-partial', [0] * len(self.lines))
+        self.pairs = collections.Counter(dict(((i, j), n) for (i, j, n) in state['pairs']))
+        self.shrink = state['shrink-histogram']
+        self.contributions = state['contributions']
+
+    def close(self):
+        with self.lock:
+            self.save()
@@ -0,0 +1,204 @@
+#
+#  File: aflsancov/metrics.py
+#
+#  Purpose: Live throughput, latency and cache metrics of a running triage
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import time
+import threading
+import contextlib
+import collections
+
+
+class Metrics:
+    """Crash throughput, per operation latencies, cache hit rates and
+    pipeline queue depths
+
+    Executions are read off the run's Budget, which is charged for every
+    target execution anyway. Queue depths are polled from the depths() of
+    running pipelines, summed over the builds of a fan-out. Everything else
+    is counted from any thread.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.start = time.time()
+        self.crashes_total = 0
+        self.crashes_done = 0
+        self.stage_secs = collections.defaultdict(float)
+        self.stage_calls = collections.defaultdict(int)
+        self.cache_hits = collections.defaultdict(int)
+        self.cache_lookups = collections.defaultdict(int)
+        self.queue_sources = []
+        self.lock = threading.Lock()
+
+    def add_crashes(self, num):
+        with self.lock:
+            self.crashes_total += num
+
+    def crash_done(self):
+        with self.lock:
+            self.crashes_done += 1
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.stage_secs[name] += time.time() - start
+                self.stage_calls[name] += 1
+
+    def cache(self, name, hits, lookups=1):
+        with self.lock:
+            self.cache_hits[name] += int(hits)
+            self.cache_lookups[name] += lookups
+
+    def watch_queues(self, depths):
+        with self.lock:
+            self.queue_sources.append(depths)
+
+    def unwatch_queues(self, depths):
+        with self.lock:
+            self.queue_sources.remove(depths)
+
+    def queue_depths(self):
+        with self.lock:
+            sources = list(self.queue_sources)
+        depths = collections.OrderedDict()
+        for source in sources:
+            for name, depth in source().items():
+                depths[name] = depths.get(name, 0) + depth
+        return depths
+
+    def snapshot(self):
+        depths = self.queue_depths()
+        with self.lock:
+            elapsed = max(time.time() - self.start, 1e-6)
+            stats = collections.OrderedDict()
+            stats['run_time'] = int(elapsed)
+            stats['crashes_total'] = self.crashes_total
+            stats['crashes_done'] = self.crashes_done
+            stats['crashes_per_min'] = round(self.crashes_done * 60.0 / elapsed, 2)
+            stats['execs_done'] = self.budget.used
+            stats['execs_per_sec'] = round(self.budget.used / elapsed, 2)
+            left = max(self.crashes_total - self.crashes_done, 0)
+            stats['eta_secs'] = int(left * elapsed / self.crashes_done) if self.crashes_done else -1
+            for name in sorted(self.stage_calls):
+                stats[name + '_mean_ms'] = round(1000 * self.stage_secs[name] / self.stage_calls[name], 2)
+            for name in sorted(self.cache_lookups):
+                stats[name + '_cache_hit_rate'] = round(float(self.cache_hits[name])
+                                                        / max(self.cache_lookups[name], 1), 4)
+            for name, depth in depths.items():
+                stats[name + '_queue_depth'] = depth
+        return stats
+
+    def status_text(self):
+        ### Same layout as afl-fuzz's fuzzer_stats
+        stats = self.snapshot()
+        width = max(len(key) for key in stats)
+        return ''.join("%s : %s\n" % (key.ljust(width), value) for key, value in stats.items())
+
+    def prometheus_text(self):
+        lines = []
+        for key, value in self.snapshot().items():
+            name = 'afl_sancov_' + key
+            lines.append("# TYPE %s gauge" % name)
+            lines.append("%s %s" % (name, value))
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsExporter:
+    """Refreshes the stats file (and a Prometheus textfile) every `interval`
+    seconds from a daemon thread, and optionally serves the Prometheus text
+    format on 127.0.0.1:`port`"""
+
+    def __init__(self, metrics, stats_file, interval, textfile=None, port=None):
+        self.metrics = metrics
+        self.stats_file = stats_file
+        self.interval = interval
+        self.textfile = textfile
+        self.port = port
+        self.stopped = threading.Event()
+        self.thread = None
+        self.server = None
+
+    def start(self):
+        """Start refreshing, then serving. Raises socket.error if the port
+        cannot be bound, the files are refreshed regardless"""
+
+        if self.interval:
+            self.thread = threading.Thread(target=self.refresh)
+            self.thread.daemon = True
+            self.thread.start()
+
+        if self.port:
+            try:
+                from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+            except ImportError:
+                from http.server import HTTPServer, BaseHTTPRequestHandler
+
+            metrics = self.metrics
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = metrics.prometheus_text()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body.encode('ascii'))
+
+                def log_message(self, *args):
+                    pass
+
+            self.server = HTTPServer(('127.0.0.1', self.port), Handler)
+            server_thread = threading.Thread(target=self.server.serve_forever)
+            server_thread.daemon = True
+            server_thread.start()
+
+    def refresh(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+
+    def write(self):
+        if self.stats_file:
+            self.write_atomic(self.stats_file, self.metrics.status_text())
+        if self.textfile:
+            self.write_atomic(self.textfile, self.metrics.prometheus_text())
+
+    @staticmethod
+    def write_atomic(path, text):
+        ### Readers (and node_exporter) never see a half written file
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.rename(tmp, path)
+
+    def close(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        self.write()
@@ -0,0 +1,160 @@
+#
+#  File: aflsancov/pipeline.py
+#
+#  Purpose: Thread pipeline overlapping execution, decoding, symbolization and diffing
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import sys
+import collections
+import threading
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+
+class StagedPipeline:
+    """Runs items through a chain of stages connected by bounded queues
+
+    Every stage has its own pool of worker threads, so slow target runs,
+    symbolizer I/O and output writes overlap. The sink is called from a single
+    thread in input order, and the number of items in flight is bounded so
+    out-of-order results never pile up. Should the sink raise, no more items
+    are fed or sunk, the stages drain and run() re-raises the exception.
+    """
+
+    def __init__(self, stages, sink, queue_size=8):
+        # stages: [(name, func, workers)], func(item) -> item
+        self.stages = stages
+        self.sink = sink
+        self.queue_size = queue_size
+        self.queues = None
+
+    def depths(self):
+        """Items waiting in front of each stage and of the sink"""
+
+        depths = collections.OrderedDict()
+        queues = self.queues
+        if queues:
+            for (name, _, _), stage_queue in zip(self.stages, queues):
+                depths[name] = stage_queue.qsize()
+            depths['sink'] = queues[-1].qsize()
+        return depths
+
+    def run(self, items):
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        self.queues = queues
+        inflight = threading.Semaphore(self.queue_size * (len(self.stages) + 1) +
+                                       sum(workers for (_, _, workers) in self.stages))
+        remaining = [workers for (_, _, workers) in self.stages]
+        lock = threading.Lock()
+        failure = []
+
+        def stage_worker(idx):
+            name, func, workers = self.stages[idx]
+            while True:
+                seq, item, error = queues[idx].get()
+                if seq is None:
+                    break
+                if error is None:
+                    try:
+                        item = func(item)
+                    except Exception, e:
+                        error = "{} stage: {}".format(name, e)
+                queues[idx + 1].put((seq, item, error))
+
+            ### The last worker of a stage shuts the next stage down
+            with lock:
+                remaining[idx] -= 1
+                last = remaining[idx] == 0
+            if last:
+                next_workers = self.stages[idx + 1][2] if idx + 1 < len(self.stages) else 1
+                for _ in range(next_workers):
+                    queues[idx + 1].put((None, None, None))
+
+        def sink_worker():
+            pending = {}
+            next_seq = 0
+            while True:
+                seq, item, error = queues[-1].get()
+                if seq is None:
+                    break
+                pending[seq] = (item, error)
+                while next_seq in pending:
+                    item, error = pending.pop(next_seq)
+                    try:
+                        if not failure:
+                            self.sink(item, error)
+                    except Exception:
+                        failure.append(sys.exc_info())
+                    finally:
+                        inflight.release()
+                        next_seq += 1
+
+        threads = [threading.Thread(target=sink_worker)]
+        for idx, (_, _, workers) in enumerate(self.stages):
+            threads.extend(threading.Thread(target=stage_worker, args=(idx,)) for _ in range(workers))
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        for seq, item in enumerate(items):
+            inflight.acquire()
+            if failure:
+                break
+            queues[0].put((seq, item, None))
+        for _ in range(self.stages[0][2]):
+            queues[0].put((None, None, None))
+
+        for thread in threads:
+            thread.join()
+
+        if failure:
+            exc_type, exc_value, exc_tb = failure[0]
+            raise exc_type, exc_value, exc_tb
+
+
+class CrashJob:
+    """State of one crash file travelling through the pipeline"""
+
+    def __init__(self, crash_fname):
+        self.crash_fname = crash_fname
+        self.cbasename = os.path.basename(crash_fname)
+        self.scratch = None
+        # Usable parents in lineage order and the cache keys of their coverage
+        self.parents = []
+        self.parent_keys = []
+        # Coverage this job has to produce: key -> sancov file, pcs, reports
+        self.sancov = collections.OrderedDict()
+        self.pcs = {}
+        self.counters = {}
+        # Covered PCs of parents taken from the coverage store
+        self.stored = {}
+        self.reports = {}
+        self.stats = None
+        self.skipped = False
+        # Number of parents analyzed when the budget cut the job short, or
+        # not started at all as the budget was spent while it was queued
+        self.partial = None
+        self.deferred = False
+        # Coverage keys this job promised to compute for everyone
+        self.claimed = []
@@ -0,0 +1,109 @@
+#
+#  File: aflsancov/prefilter.py
+#
+#  Purpose: Cheap AFL edge tuple signal for screening and ranking parents
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import pipes
+import tempfile
+import threading
+import collections
+
+try:
+    import subprocess32 as subprocess
+except ImportError:
+    import subprocess
+
+Trace = collections.namedtuple('Trace', ['status', 'tuples'])
+
+
+def read_showmap(path):
+    """Tuples (edge id, hit count bucket) of an afl-showmap output file"""
+    tuples = set()
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                tuples.add(line)
+    return frozenset(tuples)
+
+
+def afl_state(queue_file):
+    """Flags afl-fuzz left for a queue file under queue/.state/"""
+    qdir, name = os.path.split(queue_file)
+    return set(flag for flag in ['redundant_edges', 'variable_behavior']
+               if os.path.exists(os.path.join(qdir, '.state', flag, name)))
+
+
+class ShowmapPrefilter:
+    """Screens and ranks candidate parents of a crash on afl-showmap traces
+    of an AFL-instrumented build before any sanitizer execution
+
+    cmd runs afl-showmap on AFL_FILE and writes the trace to SHOWMAP_FILE,
+    its exit status is afl-showmap's (2: crash, 1: timeout). Traces are
+    cached by input digest. Candidates that crash or time out, that AFL
+    flagged as variable behavior, or that take the crash's exact tuples are
+    dropped; the rest are ranked by the number of tuples in which they
+    differ from the crash, and AFL's redundant_edges entries go last among
+    equals.
+    """
+
+    Status_Timeout = 1
+    Status_Crash = 2
+
+    def __init__(self, cmd, scratch_dir):
+        self.cmd = cmd
+        self.scratch_dir = scratch_dir
+        self.traces = {}
+        self.lock = threading.Lock()
+        self.runs = 0
+
+    def trace(self, path, digest=None):
+        key = digest or os.path.abspath(path)
+        if key not in self.traces:
+            fd, out = tempfile.mkstemp(prefix='showmap-', dir=self.scratch_dir)
+            os.close(fd)
+            try:
+                cmd = self.cmd.replace('AFL_FILE', pipes.quote(path)).replace('SHOWMAP_FILE', pipes.quote(out))
+                with open(os.devnull, 'w') as devnull:
+                    status = subprocess.call(cmd, stdout=devnull, stderr=subprocess.STDOUT, shell=True,
+                                             executable='/bin/bash')
+                trace = Trace(status, read_showmap(out)) if os.path.getsize(out) else None
+            finally:
+                os.remove(out)
+            with self.lock:
+                self.runs += 1
+                self.traces[key] = trace
+        return self.traces[key]
+
+    def rank(self, crash_trace, candidates):
+        """candidates: (path, trace, flags) in lineage order, returns the
+        usable paths best first"""
+
+        ranked = []
+        for depth, (path, trace, flags) in enumerate(candidates):
+            if trace is None or trace.status in (self.Status_Timeout, self.Status_Crash):
+                continue
+            if 'variable_behavior' in flags or trace.tuples == crash_trace.tuples:
+                continue
+            distance = len(crash_trace.tuples ^ trace.tuples)
+            ranked.append(((distance, 'redundant_edges' in flags, depth), path))
+        return [path for _, path in sorted(ranked)]
@@ -0,0 +1,173 @@
+#
+#  File: aflsancov/queuecov.py
+#
+#  Purpose: Streaming consolidated coverage of AFL queue inputs
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import re
+import json
+import time
+import bisect
+
+
+def queue_id(queue_file):
+    match = re.match(r'id:(\d+)', os.path.basename(queue_file))
+    return int(match.group(1)) if match else -1
+
+
+def cycle_lookup(plot_data):
+    """Maps a unix time to the number of queue cycles afl-fuzz had completed
+    by then, from the session's plot_data"""
+
+    times, cycles = [], []
+    if os.path.isfile(plot_data):
+        with open(plot_data) as f:
+            for line in f:
+                if line.startswith('#'):
+                    continue
+                fields = line.split(',')
+                if len(fields) > 1:
+                    times.append(int(fields[0]))
+                    cycles.append(int(fields[1]))
+
+    def cycle(mtime):
+        idx = bisect.bisect_right(times, mtime)
+        return cycles[idx - 1] if idx else 0
+    return cycle
+
+
+class QueueCoverage:
+    """Running union of queue coverage, one queue file at a time
+
+    Covered PCs are a union set, so each file only costs its execution plus
+    symbolizing the PCs it newly covers. Lines and functions seen for the
+    first time are appended to id-delta-cov. The union, the last id done per
+    session, the digests of the inputs seen and the size of id-delta-cov are
+    checkpointed together, a resumed run truncates id-delta-cov back to the
+    checkpoint.
+    """
+
+    Checkpoint_Files = 100
+    Checkpoint_Secs = 60
+
+    def __init__(self, state_path, delta_path):
+        self.state_path = state_path
+        self.delta_path = delta_path
+        self.pcs = set()
+        self.lines = set()
+        self.functions = set()
+        self.last_ids = {}
+        self.digests = set()
+        self.files = 0
+        self.delta = None
+        self.pending = 0
+        self.last_checkpoint = time.time()
+
+    def load(self):
+        if not os.path.isfile(self.state_path):
+            return
+        with open(self.state_path) as f:
+            state = json.load(f)
+        self.pcs = set(state['pcs'])
+        self.lines = set(tuple(line) for line in state['lines'])
+        self.functions = set(tuple(function) for function in state['functions'])
+        self.last_ids = state['last-ids']
+        self.digests = set(state.get('digests', []))
+        self.files = state['files']
+        with open(self.delta_path, 'r+') as f:
+            f.truncate(state['delta-size'])
+
+    def open(self):
+        self.delta = open(self.delta_path, 'a')
+
+    def done(self, session, qid):
+        return qid <= self.last_ids.get(session, -1)
+
+    def first_seen(self, digest):
+        """False for inputs seen before, in this run or a resumed one"""
+
+        if digest in self.digests:
+            return False
+        self.digests.add(digest)
+        return True
+
+    def add(self, session, queue_file, cycle, pcs, symbolize):
+        """symbolize maps a list of PCs to (file, function, line, col) frames,
+        returns the number of newly covered lines"""
+
+        new_pcs = sorted(set(pcs) - self.pcs)
+        self.pcs.update(new_pcs)
+
+        name = os.path.basename(queue_file)
+        new_lines = 0
+        for (fp, func, ln, col) in sorted(symbolize(new_pcs)) if new_pcs else []:
+            if (fp, func) not in self.functions:
+                self.functions.add((fp, func))
+                self.delta.write("%s, %d, %s, function, %s\n" % (name, cycle, fp, func))
+            if (fp, func, ln) not in self.lines:
+                self.lines.add((fp, func, ln))
+                self.delta.write("%s, %d, %s, line, %s\n" % (name, cycle, fp, ln))
+                new_lines += 1
+
+        self.last_ids[session] = max(queue_id(queue_file), self.last_ids.get(session, -1))
+        self.files += 1
+        self.pending += 1
+        if self.pending >= self.Checkpoint_Files or time.time() - self.last_checkpoint >= self.Checkpoint_Secs:
+            self.save()
+        return new_lines
+
+    def save(self):
+        self.delta.flush()
+        os.fsync(self.delta.fileno())
+        state = {'pcs': sorted(self.pcs), 'lines': sorted(self.lines), 'functions': sorted(self.functions),
+                 'last-ids': self.last_ids, 'digests': sorted(self.digests), 'files': self.files, 'delta-size': self.delta.tell()}
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.rename(tmp, self.state_path)
+        self.pending = 0
+        self.last_checkpoint = time.time()
+
+    def close(self):
+        if self.delta:
+            self.save()
+            self.delta.close()
+            self.delta = None
+
+    def write_pos_cov(self, path):
+        with open(path, 'w') as f:
+            f.write("# src_file, coverage_type, fcn/line\n")
+            self.write_report(f, self.functions, self.lines)
+
+    def write_zero_cov(self, path, zero_frames, include_lines):
+        ### Only functions and lines no queue file reached at all
+        functions = set((fp, func) for (fp, func, ln, col) in zero_frames) - self.functions
+        lines = set((fp, func, ln) for (fp, func, ln, col) in zero_frames) - self.lines
+        with open(path, 'w') as f:
+            f.write("# src_file, coverage_type, fcn/line\n")
+            self.write_report(f, functions, lines if include_lines else [])
+
+    @staticmethod
+    def write_report(f, functions, lines):
+        for (fp, func) in sorted(functions):
+            f.write("%s, function, %s\n" % (fp, func))
+        for (fp, func, ln) in sorted(lines, key=lambda line: (line[0], int(line[2]), line[1])):
+            f.write("%s, line, %s\n" % (fp, ln))
@@ -0,0 +1,2336 @@
+#
+#  File: aflsancov/reporter.py
+#
+#  Version: 1.1
+#
+#  Purpose: Leverage sancov towards coverage consolidation, program spec analysis etc.
+#
+#  Forked off of afl-cov (ver 0.5): Copyright (C) 2015 Michael Rash (mbr@cipherdyne.org)
+#  Port to coverage sanitizer by Bhargava Shastry (bshastry@sec.t-labs.tu-berlin.de)
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+from shutil import rmtree
+import shutil
+from sys import argv
+import re
+import glob
+from argparse import ArgumentParser
+import sys, os
+import collections
+import json
+import copy
+import threading
+import time
+import socket
+import tempfile
+import fnmatch
+import shlex
+
+try:
+    import subprocess32 as subprocess
+except ImportError:
+    import subprocess
+
+from aflsancov.budget import Budget, BudgetState, prioritize
+from aflsancov.collect import CoverageCollector
+from aflsancov.corpus import CorpusIndex, LineageScheduler
+from aflsancov.diff import Granularities, coarsen, dice, dd_stats, hit_stats
+from aflsancov.metrics import Metrics
+from aflsancov.repro import VerdictCache, crashed, flaky, repro_verdict
+
+
+class AFLSancovReporter:
+    """Base class for the AFL Sancov reporter"""
+
+    Version = '1.1'
+    Description = 'A tool for spectrum based fault localization'
+    Want_Output = True
+    No_Output = False
+    ### Options of a coordinator its local workers must not inherit
+    Coordinator_Options = ['--coordinate', '--local-workers', '--metrics-port', '--metrics-textfile']
+
+    # func_cov_regex = re.compile(r"^(?P<filepath>[^:]+):(?P<linenum>\d+)\s" \
+    #                             "(?P<function>[\w|\-|\:]+)$", re.MULTILINE)
+    #
+    line_cov_regex = CoverageCollector.line_cov_regex
+
+    # Is_Crash_Regex     = re.compile(r"id.*,(sig:\d{2}),.*")
+    # find_crash_parent_regex = re.compile(r"^(HARDEN\-|ASAN\-)?(?P<session>[\w|\-]+):id.*?"
+    #                                      r"(sync:(?P<sync>[\w|\-]+))?,src:(?P<id>\d+).*$")
+
+
+    # This regex merges legacy Is_Crash_Regex and namesake
+    # old_find_crash_parent_regex = re.compile(r"^(HARDEN\-|ASAN\-)?((?P<session>[\w|\-]+):)?id:\d+,sig:\d+,"
+    #                                      r"(sync:(?P<sync>[\w|\-]+),)?src:(?P<id>\d+).*$")
+    find_queue_parent_regex = re.compile(r"id:\d+,(sync:(?P<sync>[\w|\-]+),)?src:(?P<id>\d+).*$")
+
+    # For proposed successor of current naming convention
+    find_crash_parent_regex = CoverageCollector.find_crash_parent_regex
+
+
+    def __init__(self, args, parent=None):
+
+        if parent:
+            self.argv = parent.argv
+            self.args = copy.copy(parent.args)
+        else:
+            self.argv = list(args)
+            self.args = self.parse_cmdline(args)
+
+        self.cov_paths = {}
+
+        ### global coverage tracking dictionary
+        self.global_pos_report = set()
+        self.global_zero_report = set()
+
+        ### For diffs between two consecutive queue files
+        self.curr_pos_report = set()
+        self.curr_zero_report = set()
+        self.prev_pos_report = set()
+        self.prev_zero_report = set()
+
+        ### For use in dd-mode
+        self.crashdd_pos_report = set()
+        # self.crashdd_zero_report = set()
+        self.parentdd_pos_report = set()
+        # self.parentdd_zero_report = set()
+
+        ### List of all tuples singularly in crash positive reports
+        self.crashdd_pos_list = []
+
+        ### Target execution, sancov decoding and symbolization, set up by
+        ### setup_parsing, and the instrumentation point table, see --pc-table
+        self.collector = None
+        self.pc_table = None
+
+        ### Covered PCs of executed inputs kept across rebuilds, see
+        ### --coverage-store
+        self.coverage_store = None
+
+        ### PC counters -> line hits map and raw counters of non-crashing
+        ### inputs by coverage cache key, see --hit-counts
+        self.hit_map = None
+        self.hit_cache = {}
+
+        ### Content-addressed corpus and per-binary coverage cache keyed
+        ### by (bin_path, input digest)
+        self.corpus = CorpusIndex()
+        self.cov_cache = {}
+        self.crash_verdicts = {}
+        self.parent_cache = {}
+        self.bin_id = None
+
+        ### Reproducibility verdicts of crash files by input digest and by
+        ### name for the JSON, see --repro-runs
+        self.verdict_cache = None
+        self.verdict_cache_lock = threading.Lock()
+        self.repro_locks = {}
+        self.crash_repro = {}
+        ### Target runs of all reproducibility checks share --jobs slots,
+        ### and a crashing rerun's sancov file by crash file is kept for
+        ### the crash's coverage
+        self.rerun_slots = None
+        self.repro_sancov = {}
+
+        ### afl-showmap traces for ranking parents, see --showmap-cmd
+        self.prefilter = None
+        self.stash = None
+
+        ### Consolidated results and cross-crash statistics, see
+        ### --results-db and --hotspots
+        self.results = None
+        self.hotspots = None
+
+        ### Run budget, see --time-budget, and what a budgeted run finished,
+        ### see --continue
+        self.budget = Budget()
+        self.budget_state = None
+        self.crash_partial = None
+
+        ### Throughput, latencies, cache hit rates and pipeline queue depths,
+        ### see --stats-interval
+        self.metrics = Metrics(self.budget)
+        self.exporter = None
+
+        ### Shared coverage cache of a distributed run, see --worker
+        self.shared_cov_cache_dir = None
+
+        ### Crash files that do not crash are moved out of --crash-dir, unless
+        ### other builds still have to look at them
+        self.move_filtered = True
+
+        if parent:
+            ### Builds of a fan-out share corpus index, lineage and caches
+            self.corpus = parent.corpus
+            self.cov_cache = parent.cov_cache
+            self.crash_verdicts = parent.crash_verdicts
+            self.parent_cache = parent.parent_cache
+            self.hit_cache = parent.hit_cache
+            self.results = parent.results
+            self.hotspots = parent.hotspots
+            self.budget = parent.budget
+            self.metrics = parent.metrics
+            self.rerun_slots = parent.rerun_slots
+
+    def setup_parsing(self):
+        self.bin_name = os.path.basename(self.args.bin_path)
+        self.collector = CoverageCollector(self.args, self.corpus, self.budget, self.metrics, self.logr,
+                                           self.cov_paths.get('scratch_dir'))
+
+    def run(self):
+        if self.args.version:
+            print "afl-sancov-" + self.Version
+            return 0
+
+        if not self.validate_args():
+            return 1
+
+        self.rerun_slots = threading.BoundedSemaphore(self.args.jobs)
+        self.budget = Budget(self.args.time_budget, self.args.exec_budget, self.args.crash_exec_budget)
+        self.metrics = Metrics(self.budget)
+
+        if self.args.worker:
+            return not self.run_worker()
+
+        if not self.init_tracking():
+            return 1
+
+        from aflsancov.metrics import MetricsExporter
+        self.exporter = MetricsExporter(self.metrics,
+                                        self.cov_paths['stats'] if self.args.stats_interval else None,
+                                        self.args.stats_interval, self.args.metrics_textfile,
+                                        self.args.metrics_port)
+        try:
+            self.exporter.start()
+        except socket.error, e:
+            self.logr("Could not serve metrics on 127.0.0.1:{} ({}), writing the stats file only"
+                      .format(self.args.metrics_port, e))
+        if self.args.results_db:
+            from aflsancov.results import ResultsStore
+            self.results = ResultsStore(self.args.results_db, self.args.resume)
+        if self.args.hotspots:
+            from aflsancov.hotspots import HotspotAggregator
+            self.hotspots = HotspotAggregator(self.cov_paths['hotspots'], self.args.hotspot_checkpoint)
+
+        try:
+            self.setup_parsing()
+
+            if self.args.coordinate:
+                return not self.run_coordinator()
+
+            if self.args.pc_table and not self.init_pc_table():
+                return 1
+            if self.args.coverage_store and not self.init_coverage_store():
+                return 1
+
+            if self.args.build:
+                builds = self.init_builds()
+                if not builds:
+                    return 1
+                rv = self.process_builds([self] + builds)
+            else:
+                rv = self.process()
+        finally:
+            self.cleanup()
+            if self.results:
+                self.results.close()
+            if self.hotspots:
+                self.hotspots.close()
+            self.exporter.close()
+
+        return not rv
+
+    def process(self):
+        if self.args.queue_cov:
+            return self.process_queue_coverage()
+        if self.args.pipeline or self.args.hit_counts:
+            return self.process_afl_crashes_pipelined()
+        if self.args.dd_num == 1:
+            return self.process_afl_crashes()
+        return self.process_afl_crashes_deep()
+
+    def init_builds(self):
+        """Set up one reporter per additional --build, each writing to its own
+        tree under sancov/builds"""
+
+        builds = []
+        names = set([self.build_name()])
+        builds_dir = self.cov_paths['top_dir'] + '/builds'
+        if not self.is_dir(builds_dir):
+            os.mkdir(builds_dir)
+
+        self.move_filtered = False
+        for (bin_path, coverage_cmd, sanitizer) in self.args.build:
+            build = AFLSancovReporter(None, self)
+            build.args.bin_path = bin_path
+            build.args.coverage_cmd = coverage_cmd
+            build.args.sanitizer = sanitizer
+            build.args.build = None
+            build.move_filtered = False
+
+            name = build.build_name()
+            suffix = 1
+            while name in names:
+                suffix += 1
+                name = "{}-{}".format(build.build_name(), suffix)
+            names.add(name)
+
+            if not build.init_tracking(builds_dir + '/' + name):
+                return None
+            build.setup_parsing()
+            if build.args.pc_table and not build.init_pc_table():
+                return None
+            if build.args.coverage_store and not build.init_coverage_store():
+                return None
+
+            self.logr("*** Build {}: {}".format(name, build.build_label()))
+            builds.append(build)
+
+        return builds
+
+    def build_name(self):
+        return "{}-{}".format(os.path.basename(self.args.bin_path), self.args.sanitizer)
+
+    def build_label(self):
+        return "{} ({}, {})".format(self.args.bin_path, self.args.sanitizer, self.args.coverage_cmd)
+
+    def process_builds(self, builds):
+        """Run all builds of a fan-out, concurrently unless --sancov-bug
+        forces sancov files through the shared current directory"""
+
+        results = [False] * len(builds)
+
+        def process_build(idx):
+            try:
+                results[idx] = builds[idx].process()
+            except Exception, e:
+                builds[idx].logr("Build {} failed: {}".format(builds[idx].build_label(), e))
+
+        if self.args.sancov_bug:
+            for idx in range(len(builds)):
+                process_build(idx)
+        else:
+            threads = [threading.Thread(target=process_build, args=(idx,)) for idx in range(len(builds))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        return all(results)
+
+    def dd_stats(self, crashfile, crashdd_pos_list, slice_linecount, parentfile=None):
+        return dd_stats(crashfile, crashdd_pos_list, slice_linecount, parentfile, self.granularity(crashfile))
+
+    def granularity(self, cbasename):
+        """Line level for crashes selected by --drill-down, --granularity otherwise"""
+
+        for pattern in self.args.drill_down or []:
+            if fnmatch.fnmatch(cbasename, pattern):
+                return 'line'
+        return self.args.granularity
+
+    def write_dd_result(self, cbasename, dict):
+        verdict = self.crash_repro.get(cbasename)
+        if verdict:
+            dict['flaky'] = flaky(verdict)
+            dict['crash-rate'] = verdict['crash-rate']
+            dict['coverage-stability'] = verdict['coverage-stability']
+        if self.args.crash_json:
+            self.dd_write_json(self.cov_paths['delta_diff_dir'] + '/' + cbasename + '.json', dict)
+        if self.results:
+            self.results.add(dict, self.build_name())
+        if self.hotspots:
+            self.hotspots.add(dict, self.build_name())
+
+    def dd_write_json(self, filename, dict):
+        with open(filename, "w") as file:
+            json.dump(dict, file, indent=4)
+
+    def write_result_as_json(self, cbasename, pbasename=None):
+
+        # header = "diff crash ({}) -> parent ({})".format(cbasename, pbasename)
+        # self.write_file(header, crashdd_outfile)
+        # self.prev_pos_report contains crash file's exec slice
+        slice_linecount = len(coarsen(self.prev_pos_report, self.granularity(cbasename)))
+        if pbasename:
+            dict = self.dd_stats(cbasename, self.crashdd_pos_list, slice_linecount, pbasename)
+        else:
+            dict = self.dd_stats(cbasename, self.crashdd_pos_list, slice_linecount)
+
+        if self.crash_partial is not None:
+            dict['partial'] = True
+            dict['parents-analyzed'] = self.crash_partial
+
+        self.write_dd_result(cbasename, dict)
+
+        ## Reset state to be safe
+        self.crashdd_pos_list = []
+
+    def cleanup(self):
+        ### Wait for the stash to archive (or drop) all sancov files and
+        ### remove transient artifacts (covered.txt, cmd-out.tmp, ...)
+        if self.stash:
+            for error in self.stash.close():
+                self.logr("Could not stash sancov file {}".format(error))
+            self.stash = None
+
+        scratch = self.cov_paths.get('scratch_dir')
+        if scratch and os.path.isdir(scratch):
+            rmtree(scratch)
+
+    def init_scratch(self):
+        """Create this run's dir for transient artifacts and the stash that
+        disposes of sancov files"""
+
+        scratch_root = self.args.scratch_dir or self.cov_paths['delta_diff_dir']
+        self.cov_paths['scratch_dir'] = tempfile.mkdtemp(prefix='.afl-sancov-', dir=scratch_root)
+        self.cov_paths['tmp_out'] = self.cov_paths['scratch_dir'] + '/cmd-out.tmp'
+
+        archive = None
+        if self.args.preserve_all_sancov_files:
+            archive = self.cov_paths['dd_stash_dir'] + '/sancov-files.tar.gz'
+        from aflsancov.results import SancovStash
+        self.stash = SancovStash(archive, self.args.resume)
+
+    def stash_sancov(self, sancov_fname):
+        if os.path.isfile(sancov_fname):
+            self.stash.add(sancov_fname)
+
+    def parent_walk(self, crash_fname):
+        """Parents to try for crash_fname: its ancestors nearest first, or
+        as ranked by the afl-showmap prefilter (see --showmap-cmd)"""
+
+        if self.args.showmap_cmd:
+            ranked = self.prefilter_parents(crash_fname)
+            if ranked is not None:
+                return iter(ranked)
+        return iter(self.resolve_lineage(crash_fname))
+
+    def next_parent(self, crash_fname, parents):
+
+        ### AFL corpus sometimes contains parent file that is identical to crash file
+        ### or a parent (in queue) that also crashes the program. In case we bump into
+        ### such parents, we try the crash file's next ancestor.
+        for pname in parents:
+            if not self.parent_identical_or_crashes(crash_fname, pname):
+                return pname
+            self.logr("Looking up ancestors of crash file {}".format(os.path.basename(crash_fname)))
+        return None
+
+    def prefilter_parents(self, crash_fname):
+        """Screen and rank the nearest --prefilter-candidates ancestors on
+        afl-showmap traces, so that only the most informative parents get
+        sanitizer runs. Returns None when there is nothing to rank on"""
+
+        cbasename = os.path.basename(crash_fname)
+        crash_trace = self.prefilter.trace(crash_fname, self.corpus.digest(crash_fname))
+        if crash_trace is None:
+            self.logr("No afl-showmap trace for crash file {}, using lineage order".format(cbasename))
+            return None
+
+        from aflsancov.prefilter import afl_state
+        candidates = []
+        for pname in self.resolve_lineage(crash_fname):
+            if len(candidates) >= self.args.prefilter_candidates:
+                break
+            if self.find_crash_parent_regex.match(os.path.basename(pname)) \
+                    or self.corpus.identical(crash_fname, pname):
+                continue
+            candidates.append((pname, self.prefilter.trace(pname, self.corpus.digest(pname)), afl_state(pname)))
+
+        ranked = self.prefilter.rank(crash_trace, candidates)
+        self.logr("Prefilter kept {}/{} ancestors of crash file {}".format(len(ranked), len(candidates),
+                                                                          cbasename))
+        return ranked
+
+    def parent_identical_or_crashes(self, crash, parent):
+
+        # Base names
+        cbasename = os.path.basename(crash)
+        pbasename = os.path.basename(parent)
+
+        ## Filter queue filenames with sig info
+        if self.find_crash_parent_regex.match(pbasename):
+            self.logr("Parent ({}) looks like crashing input!".format(pbasename))
+            return True
+
+        if self.corpus.identical(crash, parent):
+            self.logr("Crash file ({}) and parent ({}) are identical!"
+                      .format(cbasename, pbasename))
+            return True
+
+        ### Dry-run to make sure parent doesn't cause a crash. Verdicts are
+        ### shared by all paths holding the same bytes.
+        verdict_key = (self.args.bin_path, self.corpus.digest(parent))
+        if verdict_key not in self.crash_verdicts:
+            self.crash_verdicts[verdict_key] = self.does_dry_run_throw_error(parent)
+
+        if self.crash_verdicts[verdict_key]:
+            self.logr("Parent ({}) crashes binary!".format(pbasename))
+            return True
+
+        return False
+
+    def generate_cov_for_parent(self, parent_fname):
+        pbasename = os.path.basename(parent_fname)
+
+        ### Identical bytes yield identical coverage, whichever session's
+        ### name the lineage walk reached them by
+        cache_key = (self.args.bin_path, self.corpus.digest(parent_fname))
+        self.metrics.cache('coverage', cache_key in self.cov_cache)
+        if cache_key in self.cov_cache:
+            if self.args.verbose:
+                self.logr("Reusing coverage of {} for parent {}"
+                          .format(os.path.basename(self.corpus.canonical(parent_fname)), pbasename))
+            self.curr_pos_report, self.curr_zero_report = self.cov_cache[cache_key]
+            return True
+
+        if self.shared_cov_cache_dir and self.load_shared_coverage(cache_key):
+            self.curr_pos_report, self.curr_zero_report = self.cov_cache[cache_key]
+            return True
+
+        pcs = self.stored_pcs(parent_fname)
+        if pcs is not None:
+            with self.metrics.stage('symbolize'):
+                self.curr_pos_report, self.curr_zero_report = \
+                    self.collector.symbolize_coverage(*self.collector.decode_pcs(pcs))
+            if self.curr_pos_report:
+                self.cov_cache[cache_key] = (self.curr_pos_report, self.curr_zero_report)
+                return True
+
+        #### The output should be written to delta-diff dir
+        #### as afl_input namesake witha sancov extension
+        ### raw sancov file
+        self.cov_paths['parent_sancov_raw'] = self.collector.scratch_sancov(self.cov_paths['scratch_dir'], pbasename)
+        self.cov_paths['parent_afl'] = pbasename
+
+        ### execute the command to generate code coverage stats
+        ### for the current AFL test case file
+        sancov_env = self.collector.get_sancov_env(self.cov_paths['parent_sancov_raw'], pbasename)
+
+        self.budget.charge()
+        with self.metrics.stage('execute'), self.target_output() as output:
+            self.collector.run_target(parent_fname, sancov_env, output)
+
+        if self.args.sancov_bug:
+            sancovfile = "".join(glob.glob("*.sancov"))
+            cov_cmd = 'mv {} {}'.format(sancovfile, self.cov_paths['scratch_dir'])
+            self.run_cmd(cov_cmd, self.No_Output)
+
+        # This renames default sancov file to specified filename
+        # and populates self.curr* report with non-crashing input's
+        # linecov info.
+        with self.metrics.stage('symbolize'):
+            extracted = self.rename_and_extract_linecov(self.cov_paths['parent_sancov_raw'])
+        if extracted and self.coverage_store:
+            self.store_pcs(parent_fname, self.collector.covered_pcs(self.cov_paths['parent_sancov_raw']))
+        self.stash_sancov(self.cov_paths['parent_sancov_raw'])
+        if not extracted:
+            self.logr("Error generating cov info for parent {}".format(pbasename))
+            return False
+
+        self.cov_cache[cache_key] = (self.curr_pos_report, self.curr_zero_report)
+        return True
+
+    def generate_cov_for_crash(self, crash_fname):
+
+        cbasename = os.path.basename(crash_fname)
+
+        self.cov_paths['crash_sancov_raw'] = self.collector.scratch_sancov(self.cov_paths['scratch_dir'], cbasename)
+
+        self.cov_paths['crash_afl'] = cbasename
+
+        ### Make sure crashing input indeed triggers a program crash
+        if not self.dry_run_crash(crash_fname):
+            return False
+
+        if self.args.repro_runs > 1 and not self.args.sancov_bug:
+            ### Coverage of a run that crashed, see crash_coverage
+            sancov_file = self.crash_coverage(crash_fname, self.cov_paths['scratch_dir'])
+            extracted = False
+            if sancov_file:
+                os.rename(sancov_file, self.cov_paths['crash_sancov_raw'])
+                with self.metrics.stage('symbolize'):
+                    extracted = self.extract_linecov(self.cov_paths['crash_sancov_raw'])
+                self.stash_sancov(self.cov_paths['crash_sancov_raw'])
+            if not extracted:
+                self.logr("Error generating coverage info for crash file {}".format(cbasename))
+            return extracted
+
+        ### execute the command to generate code coverage stats
+        ### for the current AFL test case file
+        sancov_env = self.collector.get_sancov_env(self.cov_paths['crash_sancov_raw'], cbasename)
+
+        self.budget.charge()
+        with self.metrics.stage('execute'), self.target_output() as output:
+            self.collector.run_target(crash_fname, sancov_env, output)
+
+        if self.args.sancov_bug:
+            rawfilename = "".join(glob.glob("*.sancov.raw"))
+            mapfilename = "".join(glob.glob("*.sancov.map"))
+
+            cov_cmd = 'mv {} {} {}'.format(rawfilename, mapfilename,
+                                            self.cov_paths['scratch_dir'])
+            self.run_cmd(cov_cmd, self.No_Output)
+
+        globstrraw = os.path.basename("".join(glob.glob(self.cov_paths['scratch_dir'] + "/*.sancov.raw")))
+        globstrmap = os.path.basename("".join(glob.glob(self.cov_paths['scratch_dir'] + "/*.sancov.map")))
+        ### Run pysancov rawunpack before calling rename
+        self.run_cmd("cd {}; pysancov rawunpack {} ; rm {} {}".format(self.cov_paths['scratch_dir'],
+                                                                      globstrraw, globstrraw, globstrmap),
+                     self.No_Output)
+        # self.run_cmd("cd pysancov rawunpack " + globstrraw + " ; rm " + globstrraw + " " + globstrmap, self.No_Output)
+
+        # This renames default sancov file to specified filename
+        # and populates self.curr* report with non-crashing input's
+        # linecov info.
+        with self.metrics.stage('symbolize'):
+            extracted = self.rename_and_extract_linecov(self.cov_paths['crash_sancov_raw'])
+        self.stash_sancov(self.cov_paths['crash_sancov_raw'])
+        if not extracted:
+            self.logr("Error generating coverage info for crash file {}".format(cbasename))
+            return False
+
+        return True
+
+    def process_afl_crashes_deep(self):
+
+        '''
+        1. Process crash file
+        2. Pick and process crash file's parent and N other randomly selected queue files
+        3. Do a repeated intersection of s.difference(t)
+        :return:
+        '''
+
+        crash_files = self.import_unique_crashes(self.args.crash_dir)
+        num_crash_files = len(crash_files)
+
+        self.logr("\n*** Imported %d new crash files from: %s\n" \
+                  % (num_crash_files, (self.args.afl_fuzzing_dir + '/unique')))
+
+        if not self.import_afl_dirs():
+            return False
+
+        self.index_queue_files()
+
+        scheduler = self.schedule_crashes(crash_files)
+        crash_file_counter = 0
+
+        for crash_fname in self.crash_queue(scheduler):
+
+            crash_file_counter += 1
+            self.logr("[+] Processing crash file ({}/{})".format(crash_file_counter, num_crash_files))
+
+            self.budget.begin_crash()
+            self.crash_partial = None
+            self.process_crash_deep(crash_fname)
+            self.budget_state.done(os.path.basename(crash_fname), self.crash_partial)
+            self.metrics.crash_done()
+            self.release_ancestors(scheduler, crash_fname)
+
+        self.save_budget_state()
+        self.cleanup()
+        return True
+
+    def process_crash_deep(self, crash_fname):
+
+        cbasename = os.path.basename(crash_fname)
+
+        if not self.generate_cov_for_crash(crash_fname):
+            return False
+
+        # Store this in self.prev_pos_report
+        self.prev_pos_report = self.curr_pos_report
+
+        queue_cnt = 0
+        # Find parent
+        parents = self.parent_walk(crash_fname)
+
+        while queue_cnt < self.args.dd_num:
+
+            if self.budget.crash_exhausted():
+                self.logr("Budget exhausted after {} parents of crash file {}".format(queue_cnt, cbasename))
+                self.crash_partial = queue_cnt
+                break
+
+            pname = self.next_parent(crash_fname, parents)
+            if not pname:
+                self.logr("Cannot find ancestors of crash file {}. Bailing out".format(cbasename))
+                break
+
+            # Select a random queue file
+            # pname = random.choice(queue_files)
+
+            # if self.parent_identical_or_crashes(crash_fname, pname):
+            #     self.logr("Skipping parent of crash file {}".format(cbasename))
+            #     continue
+
+            if not self.generate_cov_for_parent(pname):
+                self.logr("Error generating cov info for parent of {}".format(cbasename))
+                continue
+
+            # Increment queue_cnt
+            queue_cnt += 1
+            self.logr("Processing parent {}/{}".format(queue_cnt, self.args.dd_num))
+
+            # Obtain Pc.difference(Pnc) and write to file
+            with self.metrics.stage('diff'):
+                self.crashdd_pos_report = dice(self.prev_pos_report, self.curr_pos_report,
+                                               self.granularity(cbasename))
+
+            # Extend the global list with current crash delta diff
+            self.crashdd_pos_list.extend(self.crashdd_pos_report)
+
+        self.write_result_as_json(cbasename)
+        return True
+
+    def process_afl_crashes(self):
+
+        '''
+        1. Process crash file
+        2. Pick and process crash file's parent
+        3. Do a s.difference(t)
+        :return:
+        '''
+
+        crash_files = self.import_unique_crashes(self.args.crash_dir)
+        num_crash_files = len(crash_files)
+
+        self.logr("\n*** Imported %d new crash files from: %s\n" \
+                  % (num_crash_files, (self.args.afl_fuzzing_dir + '/unique')))
+
+        scheduler = self.schedule_crashes(crash_files)
+        crash_file_counter = 0
+
+        for crash_fname in self.crash_queue(scheduler):
+
+            crash_file_counter += 1
+            self.logr("[+] Processing crash file ({}/{})".format(crash_file_counter, num_crash_files))
+
+            self.budget.begin_crash()
+            self.process_crash(crash_fname)
+            self.budget_state.done(os.path.basename(crash_fname))
+            self.metrics.crash_done()
+            self.release_ancestors(scheduler, crash_fname)
+
+        self.save_budget_state()
+        self.cleanup()
+        return True
+
+    def process_crash(self, crash_fname):
+
+        cbasename = os.path.basename(crash_fname)
+
+        # Find parent
+        pname = self.next_parent(crash_fname, self.parent_walk(crash_fname))
+        if not pname:
+            self.logr("Cannot find ancestors of crash file {}. Bailing out".format(cbasename))
+            return False
+
+        pbasename = os.path.basename(pname)
+
+        if not self.generate_cov_for_parent(pname):
+            self.logr("Error generating cov info for parent of {}".format(cbasename))
+            return False
+
+        self.prev_pos_report = self.curr_pos_report
+        self.prev_zero_report = self.curr_zero_report
+
+        if not self.generate_cov_for_crash(crash_fname):
+            return False
+
+        # Obtain Pc.difference(Pnc) and write to file
+        with self.metrics.stage('diff'):
+            self.crashdd_pos_report = dice(self.curr_pos_report, self.prev_pos_report, self.granularity(cbasename))
+        self.crashdd_pos_list = self.crashdd_pos_report
+
+        self.write_result_as_json(cbasename, pbasename)
+        return True
+
+    def process_afl_crashes_pipelined(self):
+        """Process crash files through the execute -> decode -> symbolize ->
+        diff -> write pipeline, see --pipeline"""
+
+        crash_files = self.import_unique_crashes(self.args.crash_dir)
+        num_crash_files = len(crash_files)
+
+        self.logr("\n*** Imported %d new crash files from: %s\n" \
+                  % (num_crash_files, (self.args.afl_fuzzing_dir + '/unique')))
+
+        if self.args.dd_num > 1:
+            if not self.import_afl_dirs():
+                return False
+            self.index_queue_files()
+
+        scheduler = self.schedule_crashes(crash_files)
+        workers = self.pipeline_workers()
+        self.cov_inflight = {}
+        self.cov_inflight_lock = threading.Lock()
+        counter = [0]
+
+        def sink(job, error):
+            counter[0] += 1
+            self.logr("[+] Processed crash file ({}/{})".format(counter[0], num_crash_files))
+            if error:
+                self.logr("Error processing crash file {}: {}".format(job.cbasename, error))
+            elif job.stats:
+                if job.partial is not None:
+                    job.stats['partial'] = True
+                    job.stats['parents-analyzed'] = job.partial
+                self.write_dd_result(job.cbasename, job.stats)
+            if job.deferred:
+                self.budget_state.skipped(job.cbasename)
+            else:
+                self.budget_state.done(job.cbasename, job.partial)
+                self.metrics.crash_done()
+            self.release_ancestors(scheduler, job.crash_fname)
+
+        from aflsancov.pipeline import StagedPipeline, CrashJob
+        pipeline = StagedPipeline([('execute', self.releasing(self.pipeline_execute), workers['execute']),
+                                   ('decode', self.releasing(self.pipeline_decode), workers['decode']),
+                                   ('symbolize', self.releasing(self.pipeline_symbolize), workers['symbolize']),
+                                   ('diff', self.timed('diff', self.pipeline_diff), workers['diff'])],
+                                  sink, self.args.pipeline_queue)
+        self.metrics.watch_queues(pipeline.depths)
+        try:
+            pipeline.run(CrashJob(crash_fname) for crash_fname in self.crash_queue(scheduler))
+        finally:
+            self.metrics.unwatch_queues(pipeline.depths)
+
+        self.save_budget_state()
+        self.cleanup()
+        return True
+
+    def process_queue_coverage(self):
+        """Stream the queue of every session in id order through one union
+        of covered PCs: id-delta-cov gets what each file newly covers,
+        pos-cov and zero-cov the totals, see --queue-cov"""
+
+        if not self.import_afl_dirs():
+            return False
+
+        from aflsancov.queuecov import QueueCoverage, cycle_lookup, queue_id
+        queue = []
+        cycles = {}
+        for fuzz_dir in sorted(self.cov_paths['dirs'].keys()):
+            session = os.path.basename(fuzz_dir)
+            cycles[session] = cycle_lookup(fuzz_dir + '/plot_data')
+            for qfile in self.import_test_cases(fuzz_dir + '/queue'):
+                queue.append((queue_id(qfile), session, qfile))
+        queue.sort()
+
+        bitsets = None
+        if self.args.queue_bitsets:
+            from aflsancov.bitsets import BitsetStore
+            try:
+                bitsets = BitsetStore(self.cov_paths['queue_bitsets'], sorted(self.pc_table.pcs),
+                                      self.binary_id())
+            except ValueError, e:
+                self.logr("{}, rerun with --overwrite".format(e))
+                return False
+
+        qcov = QueueCoverage(self.cov_paths['queue_cov_state'], self.cov_paths['id_delta_cov'])
+        if self.args.resume:
+            qcov.load()
+        qcov.open()
+        self.metrics.add_crashes(sum(1 for (qid, session, qfile) in queue if not qcov.done(session, qid)))
+        scratch = tempfile.mkdtemp(prefix='queue-', dir=self.cov_paths['scratch_dir'])
+
+        try:
+            for (qid, session, qfile) in queue:
+                if qcov.done(session, qid):
+                    continue
+                if self.budget.exhausted():
+                    self.logr("*** Budget exhausted, continue queue coverage with --continue")
+                    break
+
+                ### sync: copies carry no new coverage
+                pcs = []
+                if qcov.first_seen(self.corpus.digest(qfile)):
+                    pcs = self.stored_pcs(qfile) or self.queue_file_pcs(qfile, scratch)
+                    if bitsets is not None:
+                        bitsets.add(session + '/' + os.path.basename(qfile), pcs)
+                        bitsets.flush()
+
+                with self.metrics.stage('symbolize'):
+                    new_lines = qcov.add(session, qfile, cycles[session](int(os.path.getmtime(qfile))),
+                                         pcs, self.frames_of_pcs)
+                self.metrics.crash_done()
+                if self.args.verbose:
+                    self.logr("{}/{}: {} new lines".format(session, os.path.basename(qfile), new_lines))
+        finally:
+            qcov.close()
+            if bitsets is not None:
+                bitsets.close()
+
+        qcov.write_pos_cov(self.cov_paths['pos_cov'])
+        qcov.write_zero_cov(self.cov_paths['zero_cov'], self.zero_frames(qcov.pcs),
+                            self.args.coverage_include_lines)
+        self.logr("*** Queue coverage: {} files, {} lines in {} functions"
+                  .format(qcov.files, len(qcov.lines), len(qcov.functions)))
+        self.cleanup()
+        return True
+
+    def queue_file_pcs(self, qfile, scratch):
+        sancov_file = self.collector.execute_for_coverage(qfile, scratch)
+        if not sancov_file:
+            self.logr("Error generating cov info for queue file {}".format(os.path.basename(qfile)))
+            return []
+
+        with self.metrics.stage('decode'):
+            pcs = self.collector.covered_pcs(sancov_file)
+        self.store_pcs(qfile, pcs)
+        self.stash_sancov(sancov_file)
+        return pcs
+
+    def frames_of_pcs(self, pcs):
+        if self.pc_table:
+            ### Only the new PCs of one queue file, not the whole table
+            self.collector.fill_table(set(pcs))
+            return self.pc_table.lookup(pcs)
+
+        frames = set()
+        for pc_frames in self.collector.symbolize_pcs(pcs):
+            frames.update(pc_frames)
+        return frames
+
+    def zero_frames(self, covered):
+        if self.pc_table:
+            return self.pc_table.zero(covered)
+        return self.frames_of_pcs(self.collector.missing_pcs(covered))
+
+    def pipeline_workers(self):
+        workers = collections.OrderedDict((stage, 1) for stage in ['execute', 'decode', 'symbolize', 'diff'])
+        for spec in (self.args.pipeline or '').split(','):
+            if not spec.strip():
+                continue
+            stage, _, num = spec.partition('=')
+            workers[stage.strip()] = int(num)
+        return workers
+
+    def pipeline_execute(self, job):
+
+        if self.budget.exhausted():
+            job.skipped = job.deferred = True
+            return job
+
+        self.budget.begin_crash()
+        if not self.dry_run_crash(job.crash_fname):
+            job.skipped = True
+            return job
+
+        job.scratch = tempfile.mkdtemp(prefix='exec-', dir=self.cov_paths['scratch_dir'])
+        sancov_file = self.crash_coverage(job.crash_fname, job.scratch)
+        if not sancov_file:
+            self.logr("Error generating coverage info for crash file {}".format(job.cbasename))
+            rmtree(job.scratch)
+            job.skipped = True
+            return job
+        job.sancov['crash'] = sancov_file
+
+        parents = self.parent_walk(job.crash_fname)
+        while len(job.parents) < self.args.dd_num:
+            if self.budget.crash_exhausted():
+                self.logr("Budget exhausted after {} parents of crash file {}".format(len(job.parents),
+                                                                                     job.cbasename))
+                job.partial = len(job.parents)
+                break
+
+            pname = self.next_parent(job.crash_fname, parents)
+            if not pname:
+                self.logr("Cannot find ancestors of crash file {}. Bailing out".format(job.cbasename))
+                break
+
+            cache_key = (self.args.bin_path, self.corpus.digest(pname))
+            claimed = self.claim_coverage(cache_key)
+            self.metrics.cache('coverage', not claimed)
+            if claimed:
+                job.claimed.append(cache_key)
+                pcs = self.stored_pcs(pname)
+                if pcs is not None:
+                    job.stored[cache_key] = pcs
+                else:
+                    sancov_file = self.collector.execute_for_coverage(pname, job.scratch)
+                    if sancov_file:
+                        job.sancov[cache_key] = sancov_file
+                    else:
+                        self.logr("Error generating cov info for parent {}".format(os.path.basename(pname)))
+                        self.release_coverage(cache_key)
+            elif cache_key not in job.claimed:
+                self.wait_coverage(cache_key)
+
+            if cache_key in job.sancov or cache_key in job.stored or cache_key in self.cov_cache:
+                job.parents.append(pname)
+                job.parent_keys.append(cache_key)
+            elif self.args.dd_num == 1:
+                break
+
+        return job
+
+    def pipeline_decode(self, job):
+        for key, pcs in job.stored.items():
+            with self.metrics.stage('decode'):
+                job.pcs[key] = self.collector.decode_pcs(pcs)
+
+        for key, sancov_file in job.sancov.items():
+            with self.metrics.stage('decode'):
+                job.pcs[key] = self.collector.decode_sancov(sancov_file)
+            if key != 'crash':
+                self.store_pcs(job.parents[job.parent_keys.index(key)], job.pcs[key][0])
+            # Leaves job.scratch empty once the stash caught up
+            self.stash_sancov(sancov_file)
+
+            counters_file = sancov_file[:-len('.sancov')] + '.counters-sancov'
+            if self.hit_map and os.path.isfile(counters_file):
+                job.counters[key] = self.hit_map.read_counters(counters_file)
+                self.stash_sancov(counters_file)
+        return job
+
+    def pipeline_symbolize(self, job):
+        for key, (pos_pcs, zero_pcs) in job.pcs.items():
+            with self.metrics.stage('symbolize'):
+                job.reports[key] = self.collector.symbolize_coverage(pos_pcs, zero_pcs)
+            if key != 'crash' and job.reports[key][0]:
+                if key in job.counters:
+                    self.hit_cache[key] = job.counters[key]
+                self.cov_cache[key] = job.reports[key]
+
+        self.release_job_coverage(job)
+        return job
+
+    def releasing(self, stage):
+        ### Jobs waiting on coverage claimed by a failing job must not hang
+        def run_stage(job):
+            try:
+                return stage(job)
+            except Exception:
+                self.release_job_coverage(job)
+                raise
+        return run_stage
+
+    def timed(self, name, stage):
+        def run_stage(job):
+            with self.metrics.stage(name):
+                return stage(job)
+        return run_stage
+
+    def release_job_coverage(self, job):
+        for key in job.claimed:
+            self.release_coverage(key)
+
+    def pipeline_diff(self, job):
+        if job.skipped or not job.reports.get('crash', [None])[0]:
+            return job
+
+        if self.hit_map:
+            return self.pipeline_hit_diff(job)
+
+        crash_pos = job.reports['crash'][0]
+        crashdd_pos_list = []
+        parents = []
+        for pname, key in zip(job.parents, job.parent_keys):
+            if key not in self.cov_cache:
+                continue
+            parent_pos = self.cov_cache[key][0]
+            parents.append((pname, parent_pos))
+            crashdd_pos_list.extend(dice(crash_pos, parent_pos, self.granularity(job.cbasename)))
+
+        if self.args.dd_num == 1:
+            if not parents:
+                return job
+            # Sequential mode reports the parent's slice
+            pname, parent_pos = parents[0]
+            job.stats = self.dd_stats(job.cbasename, crashdd_pos_list,
+                                      len(coarsen(parent_pos, self.granularity(job.cbasename))),
+                                      os.path.basename(pname))
+        else:
+            job.stats = self.dd_stats(job.cbasename, crashdd_pos_list,
+                                      len(coarsen(crash_pos, self.granularity(job.cbasename))))
+        return job
+
+    def pipeline_hit_diff(self, job):
+        if 'crash' not in job.counters:
+            self.logr("No hit counters for crash file {}".format(job.cbasename))
+            return job
+
+        parents = [(pname, key) for pname, key in zip(job.parents, job.parent_keys) if key in self.hit_cache]
+        if not parents:
+            return job
+
+        crash_hits = self.hit_map.line_hits(job.counters['crash'])
+        parents_hits = [self.hit_map.line_hits(self.hit_cache[key]) for _, key in parents]
+        nodes = self.hit_map.diff(crash_hits, parents_hits)
+
+        if self.args.dd_num == 1:
+            # Sequential mode reports the parent's slice
+            job.stats = hit_stats(job.cbasename, nodes, self.hit_map.covered(parents_hits[0]),
+                                  os.path.basename(parents[0][0]))
+        else:
+            job.stats = hit_stats(job.cbasename, nodes, self.hit_map.covered(crash_hits))
+        return job
+
+    def claim_coverage(self, cache_key):
+        """Returns True if the caller has to compute coverage for cache_key"""
+
+        with self.cov_inflight_lock:
+            if cache_key in self.cov_cache or cache_key in self.cov_inflight:
+                return False
+            self.cov_inflight[cache_key] = threading.Event()
+            return True
+
+    def release_coverage(self, cache_key):
+        with self.cov_inflight_lock:
+            event = self.cov_inflight.pop(cache_key, None)
+        if event:
+            event.set()
+
+    def wait_coverage(self, cache_key):
+        with self.cov_inflight_lock:
+            event = self.cov_inflight.get(cache_key)
+        if event:
+            event.wait()
+
+    def dry_run_crash(self, crash_fname):
+        """Make sure crashing input indeed triggers a program crash, filter it otherwise"""
+
+        cbasename = os.path.basename(crash_fname)
+        if self.args.repro_runs > 1:
+            verdict = self.reproduce(crash_fname)
+            if flaky(verdict):
+                self.crash_repro[cbasename] = verdict
+                self.logr("Crash input ({}) crashed {} of {} runs, analyzing it as flaky"
+                          .format(cbasename, verdict['crashes'], verdict['runs']))
+            elif verdict['crashes']:
+                self.crash_repro[cbasename] = verdict
+            if verdict['crashes']:
+                return True
+        elif self.does_dry_run_throw_error(crash_fname):
+            return True
+
+        self.logr("Crash input ({}) does not crash the program! Filtering crash file."
+                  .format(cbasename))
+        if self.move_filtered:
+            os.rename(crash_fname, self.cov_paths['dd_filter_dir'] + '/' + cbasename)
+        else:
+            shutil.copy(crash_fname, self.cov_paths['dd_filter_dir'] + '/' + cbasename)
+        return False
+
+    def crash_coverage(self, crash_fname, scratch):
+        """execute_for_coverage for a crash file that passed dry_run_crash.
+        With --repro-runs, the coverage of one of the check's crashing runs
+        is reused, and otherwise the crash is run until it crashes, at most
+        --repro-runs times, so that a flaky crash never yields coverage of
+        a run that did not crash"""
+
+        if self.args.repro_runs == 1:
+            return self.collector.execute_for_coverage(crash_fname, scratch)
+
+        sancov_fname = self.collector.scratch_sancov(scratch, os.path.basename(crash_fname))
+        with self.verdict_cache_lock:
+            kept = self.repro_sancov.pop(crash_fname, None)
+        if kept:
+            repro_scratch, sancov_file = kept
+            os.rename(sancov_file, sancov_fname)
+            rmtree(repro_scratch)
+            return sancov_fname
+
+        for _ in range(self.args.repro_runs):
+            self.budget.charge()
+            status, sancov_file = self.collector.run_for_coverage(crash_fname, scratch)
+            if crashed(status):
+                return sancov_file
+            if sancov_file:
+                os.remove(sancov_file)
+        self.logr("Crash input ({}) did not crash in {} coverage runs".format(os.path.basename(crash_fname),
+                                                                               self.args.repro_runs))
+        return None
+
+    def resolve_lineage(self, crash_fname):
+        """Return the ancestors of a crash file, nearest first"""
+
+        lineage = []
+        seen = set()
+        pname = self.find_parent_crashing(crash_fname)
+        while pname and pname not in seen:
+            seen.add(pname)
+            lineage.append(pname)
+            pname = self.find_queue_parent(pname)
+        return lineage
+
+    def schedule_crashes(self, crash_files):
+
+        if self.args.crash_order == 'name':
+            return LineageScheduler(crash_files)
+
+        lineages = {}
+        for crash_fname in crash_files:
+            lineages[crash_fname] = self.resolve_lineage(crash_fname)
+
+        scheduler = LineageScheduler(crash_files, lineages, self.corpus.digest)
+        self.logr("*** Scheduled {} crash files over {} distinct ancestors"
+                  .format(len(crash_files), len(scheduler.refcount)))
+        return scheduler
+
+    def crash_queue(self, scheduler):
+        """Crash files in processing order. Skips crash files a continued run
+        already finished and stops once the budget is spent"""
+
+        order = self.prioritize(scheduler.order())
+        self.metrics.add_crashes(sum(1 for crash_fname in order if not self.args.resume
+                                     or os.path.basename(crash_fname) not in self.budget_state.complete))
+        for idx, crash_fname in enumerate(order):
+            if self.args.resume and os.path.basename(crash_fname) in self.budget_state.complete:
+                self.release_ancestors(scheduler, crash_fname)
+                continue
+            if self.budget.exhausted():
+                self.logr("*** Budget exhausted, {} crash files left for --continue".format(len(order) - idx))
+                for crash in order[idx:]:
+                    self.budget_state.skipped(os.path.basename(crash))
+                return
+            yield crash_fname
+
+    def prioritize(self, crash_files):
+        if not self.args.priority:
+            return crash_files
+        return prioritize(crash_files, self.args.priority, self.crash_cluster)
+
+    def crash_cluster(self, crash_fname):
+        ### Crashes mutated from the same queue entry
+        pname = self.find_parent_crashing(crash_fname)
+        if pname and os.path.isfile(pname):
+            return self.corpus.digest(pname)
+        return None
+
+    def save_budget_state(self):
+        if self.budget.limited() or self.args.resume:
+            self.budget_state.save()
+
+    def release_ancestors(self, scheduler, crash_fname):
+        ### Drop cached coverage of ancestors no pending crash depends on
+        for digest in scheduler.release(crash_fname):
+            self.cov_cache.pop((self.args.bin_path, digest), None)
+            self.hit_cache.pop((self.args.bin_path, digest), None)
+
+    def run_coordinator(self):
+        """Shard the crash list over a lease dir, reassign work of dead
+        workers and merge results into the canonical delta-diff layout"""
+
+        from aflsancov.distributed import LeaseDir
+        lease = LeaseDir(self.args.coordinate)
+        lease.reset()
+
+        crash_files = self.import_unique_crashes(self.args.crash_dir)
+        crash_files = self.prioritize(self.schedule_crashes(crash_files).order())
+        ### The lease dir starts over, crash files a continued run finished
+        ### are not published again
+        if self.args.resume:
+            crash_files = [crash for crash in crash_files
+                           if os.path.basename(crash) not in self.budget_state.complete]
+        tasks = dict(zip(lease.publish([os.path.abspath(crash) for crash in crash_files]), crash_files))
+        self.metrics.add_crashes(len(crash_files))
+        self.logr("*** Published {} crash files to {}".format(len(crash_files), lease.path))
+
+        self.cov_paths['cov_cache_dir'] = self.cov_paths['top_dir'] + '/cov-cache'
+        if not self.is_dir(self.cov_paths['cov_cache_dir']):
+            os.mkdir(self.cov_paths['cov_cache_dir'])
+
+        workers = [self.spawn_local_worker() for _ in range(self.args.local_workers)]
+        merged = set()
+        restarts = 0
+
+        while True:
+            for task, worker in lease.reclaim(self.args.lease_timeout):
+                self.logr("Worker {} went silent, reassigning {}".format(worker, task))
+
+            self.merge_done(lease, merged, tasks)
+            if len(merged) == len(crash_files):
+                break
+
+            if self.budget.exhausted():
+                self.logr("*** Budget exhausted with {} crash files left".format(len(crash_files) - len(merged)))
+                break
+
+            if workers and all(worker.poll() is not None for worker in workers):
+                ### Workers only leave work behind cleanly once their budget is spent
+                if all(worker.returncode == 0 for worker in workers):
+                    self.merge_done(lease, merged, tasks)
+                    self.logr("*** Local workers spent their budget with {} crash files left"
+                              .format(len(crash_files) - len(merged)))
+                    break
+                if restarts >= len(crash_files):
+                    self.logr("Local workers keep dying, giving up")
+                    return False
+                self.logr("All local workers exited with work left, respawning")
+                restarts += len(workers)
+                for task, worker in lease.reclaim(0):
+                    self.logr("Reassigning {} of {}".format(task, worker))
+                workers = [self.spawn_local_worker() for _ in range(self.args.local_workers)]
+
+            time.sleep(self.args.poll_interval)
+
+        ### Local workers still running after a budget stop would go on
+        ### leasing the crash files left over
+        for worker in workers:
+            if worker.poll() is None and len(merged) < len(crash_files):
+                worker.terminate()
+            worker.wait()
+
+        for task in set(tasks) - merged:
+            self.budget_state.skipped(os.path.basename(tasks[task]))
+        self.save_budget_state()
+        self.cleanup()
+        return True
+
+    def merge_done(self, lease, merged, tasks):
+        for task, worker in lease.done():
+            if task not in merged:
+                parents = self.merge_task_results(lease.results_dir(task, worker))
+                self.budget_state.done(os.path.basename(tasks[task]), parents)
+                merged.add(task)
+                self.metrics.crash_done()
+                self.logr("[+] Merged crash file ({}/{})".format(len(merged), len(tasks)))
+
+    def spawn_local_worker(self):
+        env = os.environ.copy()
+        top = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env['PYTHONPATH'] = os.pathsep.join([top] + filter(None, [env.get('PYTHONPATH')]))
+        return subprocess.Popen([sys.executable, '-m', 'aflsancov'] + self.worker_argv(), env=env)
+
+    def worker_argv(self):
+        """Command line of a local worker, the coordinator's own without the
+        options only the coordinator acts on"""
+
+        argv = []
+        args = iter(self.argv)
+        for arg in args:
+            if arg in self.Coordinator_Options:
+                next(args, None)
+            elif arg.split('=', 1)[0] not in self.Coordinator_Options:
+                argv.append(arg)
+        return argv + ['--worker', self.args.coordinate]
+
+    def merge_task_results(self, results_dir):
+        """Merge the results of one task, returns the number of parents
+        analyzed if the worker's budget cut the crash short"""
+
+        parents = None
+        for fname in os.listdir(results_dir):
+            src = os.path.join(results_dir, fname)
+            if fname == 'filtered':
+                with open(src) as f:
+                    crash = f.read().rstrip('\n')
+                if os.path.isfile(crash):
+                    os.rename(crash, self.cov_paths['dd_filter_dir'] + '/' + os.path.basename(crash))
+            elif fname.endswith('.cov.json'):
+                dst = os.path.join(self.cov_paths['cov_cache_dir'], fname)
+                if not os.path.exists(dst):
+                    shutil.copy(src, dst)
+            elif fname.endswith('.json'):
+                with open(src) as f:
+                    result = json.load(f)
+                self.write_dd_result(fname[:-len('.json')], result)
+                if result.get('partial'):
+                    parents = result['parents-analyzed']
+        return parents
+
+    def run_worker(self):
+        """Process crash files leased from the coordinator until no work is
+        left, publishing per-crash JSON and computed coverage"""
+
+        from aflsancov.distributed import LeaseDir
+        lease = LeaseDir(self.args.worker)
+        worker = '{}-{}'.format(socket.gethostname(), os.getpid())
+
+        ### Per-crash JSON is how results get to the coordinator
+        self.args.crash_json = True
+        self.args.results_db = None
+        self.args.hotspots = False
+
+        if not self.init_tracking(os.path.join(lease.workers_dir, worker)):
+            return False
+        self.setup_parsing()
+        if self.args.pc_table and not self.init_pc_table():
+            return False
+        if self.args.coverage_store and not self.init_coverage_store():
+            return False
+        self.move_filtered = False
+        self.shared_cov_cache_dir = self.args.afl_fuzzing_dir + '/sancov/cov-cache'
+
+        if self.args.dd_num > 1 and not self.import_afl_dirs():
+            return False
+
+        current = []
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(max(self.args.lease_timeout / 3.0, 0.1)):
+                if current:
+                    lease.heartbeat(current[0], worker)
+
+        beat = threading.Thread(target=heartbeat)
+        beat.daemon = True
+        beat.start()
+
+        try:
+            while True:
+                if self.budget.exhausted():
+                    self.logr("*** Budget exhausted, worker {} stops claiming work".format(worker))
+                    break
+
+                claimed = lease.claim(worker)
+                if not claimed:
+                    if lease.idle():
+                        break
+                    time.sleep(self.args.poll_interval)
+                    continue
+
+                task, crash_fname = claimed
+                current[:] = [task]
+                self.logr("[+] Worker {} processing {}".format(worker, os.path.basename(crash_fname)))
+                results_dir = lease.results_dir(task, worker)
+                self.process_leased_crash(crash_fname, results_dir)
+                if not lease.complete(task, worker):
+                    ### Reclaimed while we were slow, the task is someone else's now
+                    self.logr("Worker {} lost the lease on {}, dropping its results".format(worker, task))
+                    rmtree(results_dir)
+                current[:] = []
+        finally:
+            stop.set()
+            beat.join()
+            self.cleanup()
+
+        return True
+
+    def process_leased_crash(self, crash_fname, results_dir):
+        cbasename = os.path.basename(crash_fname)
+        known = set(self.cov_cache)
+
+        self.budget.begin_crash()
+        self.crash_partial = None
+        if self.args.dd_num == 1:
+            self.process_crash(crash_fname)
+        else:
+            self.process_crash_deep(crash_fname)
+
+        tmp_dir = results_dir + '.tmp'
+        if os.path.isdir(tmp_dir):
+            rmtree(tmp_dir)
+        os.mkdir(tmp_dir)
+
+        jsonfile = self.cov_paths['delta_diff_dir'] + '/' + cbasename + '.json'
+        if os.path.isfile(jsonfile):
+            shutil.copy(jsonfile, tmp_dir)
+        if os.path.isfile(self.cov_paths['dd_filter_dir'] + '/' + cbasename):
+            with open(tmp_dir + '/filtered', 'w') as f:
+                f.write(crash_fname + '\n')
+
+        for cache_key in set(self.cov_cache) - known:
+            self.dump_coverage(cache_key, tmp_dir)
+
+        if os.path.isdir(results_dir):
+            rmtree(results_dir)
+        os.rename(tmp_dir, results_dir)
+
+    def coverage_cache_name(self, cache_key):
+        return '{}-{}.cov.json'.format(self.binary_id(), cache_key[1])
+
+    def dump_coverage(self, cache_key, dst_dir):
+        pos, zero = self.cov_cache[cache_key]
+        with open(os.path.join(dst_dir, self.coverage_cache_name(cache_key)), 'w') as f:
+            json.dump({'pos': sorted(pos), 'zero': sorted(zero)}, f, separators=(',', ':'))
+
+    def load_shared_coverage(self, cache_key):
+        path = os.path.join(self.shared_cov_cache_dir, self.coverage_cache_name(cache_key))
+        if not os.path.isfile(path):
+            return False
+        with open(path) as f:
+            cov = json.load(f)
+        self.cov_cache[cache_key] = (set(tuple(entry) for entry in cov['pos']),
+                                     set(tuple(entry) for entry in cov['zero']))
+        return True
+
+    def get_parent(self, filepath, isCrash=True):
+
+        ### Lineage lookups are memoized, ancestors are shared by many crashes
+        cache_key = (os.path.abspath(filepath), isCrash)
+        if cache_key not in self.parent_cache:
+            self.parent_cache[cache_key] = self.lookup_parent(filepath, isCrash)
+        return self.parent_cache[cache_key]
+
+    def lookup_parent(self, filepath, isCrash=True):
+
+        dirname, basename = os.path.split(filepath)
+
+        if isCrash:
+            match = self.find_crash_parent_regex.match(basename)
+            # (_, _, session, _, syncname, src_id) = match.groups()
+            (_, _, _, session, _, syncname, src_id) = match.groups()
+
+            searchdir = self.args.afl_fuzzing_dir
+            # if syncname:
+            #     searchdir += '/' + syncname + '/queue'
+            if session:
+                searchdir += '/' + session + '/queue'
+            else:
+                assert False, "Parent of crash file {} cannot be found".format(basename)
+
+
+        else:
+            match = self.find_queue_parent_regex.match(basename)
+            if not match:
+                self.logr("No parent could be found for {}".format(basename))
+                return None
+
+            (_, syncname, src_id) = match.groups()
+
+            searchdir = dirname
+
+            if syncname:
+                searchdir += '/../../' + syncname + '/queue'
+
+
+        search_cmd = "find " + searchdir + " -maxdepth 1" + " -name id:" + src_id + "*"
+
+        parent_fname = subprocess.check_output(search_cmd, stderr=subprocess.STDOUT, shell=True)
+
+        parent_list = filter(None, parent_fname.split("\n"))
+        if (len(parent_list) == 0):
+            self.logr("No parents found for file {}".format(basename))
+            return None
+
+        if (len(parent_list) > 1):
+            self.logr("Multiple parents found for file {}. Selecting first.".format(basename))
+
+        return os.path.abspath(parent_list[0].rstrip("\n"))
+
+    def index_queue_files(self):
+        """Hash every queue file of every session once and return one
+        canonical path per distinct content"""
+
+        for fuzz_dir in sorted(self.cov_paths['dirs'].keys()):
+            for qfile in self.import_test_cases(fuzz_dir + '/queue'):
+                self.corpus.add(qfile)
+
+        queue_files = self.corpus.unique_paths()
+        self.logr("*** Indexed {} queue files ({} distinct)".format(len(self.corpus.path_to_digest),
+                                                                  len(queue_files)))
+        return queue_files
+
+    def find_queue_parent(self, queue_fname):
+        return self.get_parent(queue_fname, False)
+
+    def find_parent_crashing(self, crash_fname):
+        return self.get_parent(crash_fname)
+
+    def init_tracking(self, top_dir=None):
+
+        self.cov_paths['top_dir'] = top_dir or self.args.afl_fuzzing_dir + '/sancov'
+        # Web dir is for sancov 3.9 only. Currently unsupported.
+        self.cov_paths['web_dir'] = self.cov_paths['top_dir'] + '/web'
+        # Consolidated coverage for non-crashing (i.e., queue) inputs only.
+        self.cov_paths['cons_dir'] = self.cov_paths['top_dir'] + '/cons-cov'
+        # Diff for queue inputs only.
+        self.cov_paths['diff_dir'] = self.cov_paths['top_dir'] + '/diff'
+        self.cov_paths['log_file'] = self.cov_paths['top_dir'] + '/afl-sancov.log'
+        self.cov_paths['hotspots'] = self.cov_paths['top_dir'] + '/hotspots.json'
+        self.cov_paths['budget_state'] = self.cov_paths['top_dir'] + '/budget-state.json'
+        self.budget_state = BudgetState(self.cov_paths['budget_state'])
+        # Transient artifacts live in scratch_dir, see init_scratch
+        self.cov_paths['tmp_out'] = self.cov_paths['top_dir'] + '/cmd-out.tmp'
+
+        ### global coverage results
+        self.cov_paths['id_delta_cov'] = self.cov_paths['top_dir'] + '/id-delta-cov'
+        self.cov_paths['zero_cov'] = self.cov_paths['top_dir'] + '/zero-cov'
+        self.cov_paths['pos_cov'] = self.cov_paths['top_dir'] + '/pos-cov'
+        self.cov_paths['queue_cov_state'] = self.cov_paths['top_dir'] + '/queue-cov-state.json'
+        self.cov_paths['queue_bitsets'] = self.cov_paths['top_dir'] + '/queue-bitsets'
+
+        self.cov_paths['dirs'] = {}
+        self.cov_paths['parent_afl'] = ''
+        self.cov_paths['crash_afl'] = ''
+        self.cov_paths['parent_sancov_raw'] = ''
+        self.cov_paths['crash_sancov_raw'] = ''
+        # Diff in delta debug mode
+        self.cov_paths['delta_diff_dir'] = self.cov_paths['top_dir'] + '/delta-diff'
+        self.cov_paths['dd_stash_dir'] = self.cov_paths['delta_diff_dir'] + '/.raw'
+        self.cov_paths['dd_filter_dir'] = self.cov_paths['delta_diff_dir'] + '/.filter'
+        self.cov_paths['dd_final_stats'] = self.cov_paths['delta_diff_dir'] + '/final_stats.dd'
+
+        if self.args.overwrite:
+            self.init_mkdirs()
+        elif self.args.resume and self.is_dir(self.cov_paths['top_dir']):
+            ### Pick up where an earlier budgeted run stopped
+            self.budget_state.load()
+        else:
+            if self.is_dir(self.cov_paths['top_dir']):
+                print "[*] Existing coverage dir %s found, use --overwrite to " \
+                      "re-calculate coverage" % (self.cov_paths['top_dir'])
+                return False
+            else:
+                self.init_mkdirs()
+
+        self.write_status(self.cov_paths['top_dir'] + '/afl-sancov-status')
+        self.cov_paths['stats'] = self.cov_paths['top_dir'] + '/afl-sancov-stats'
+        self.init_scratch()
+        ### Execute workers of the pipeline share one prefilter and its traces
+        if self.args.showmap_cmd:
+            from aflsancov.prefilter import ShowmapPrefilter
+            self.prefilter = ShowmapPrefilter(self.args.showmap_cmd, self.cov_paths['scratch_dir'])
+        return True
+
+    def import_afl_dirs(self):
+
+        if not self.args.afl_fuzzing_dir:
+            print "[*] Must specify AFL fuzzing dir with --afl-fuzzing-dir or -d"
+            return False
+
+        assert 'top_dir' in self.cov_paths, "Trying to import fuzzing data without sancov dir"
+
+        def_dir = self.args.afl_fuzzing_dir
+
+        if self.is_dir(def_dir + '/queue'):
+            if def_dir not in self.cov_paths['dirs']:
+                self.add_fuzz_dir(def_dir)
+        else:
+            for p in os.listdir(def_dir):
+                fuzz_dir = def_dir + '/' + p
+                if self.is_dir(fuzz_dir):
+                    if self.is_dir(fuzz_dir + '/queue'):
+                        ### found an AFL fuzzing directory instance
+                        if fuzz_dir not in self.cov_paths['dirs']:
+                            self.add_fuzz_dir(fuzz_dir)
+
+        return True
+
+    def binary_id(self):
+        if not self.bin_id:
+            from aflsancov.symbolize import elf_build_id
+            self.bin_id = elf_build_id(self.args.bin_path)
+            if not self.bin_id:
+                self.bin_id = CorpusIndex.hash_file(self.args.bin_path)
+        return self.bin_id
+
+    def init_pc_table(self):
+        """Load the instrumentation point table of --bin-path, indexing the
+        binary first if no table exists for its build-id"""
+
+        from aflsancov.symbolize import PCTable
+        build_id = self.binary_id()
+        table_dir = os.path.join(self.args.cache_dir, 'pc-table')
+        table_file = os.path.join(table_dir, build_id + '.json')
+
+        if os.path.isfile(table_file):
+            self.pc_table = self.collector.pc_table = PCTable.load(table_file)
+            self.logr("*** Loaded PC table for {} ({} PCs)".format(self.bin_name, len(self.pc_table.pcs)))
+            self.init_hit_map()
+            return True
+
+        self.logr("*** Indexing instrumentation points of {}".format(self.bin_name))
+        out = self.run_cmd(self.args.pysancov_path + " missing " + self.args.bin_path
+                           + " < /dev/null 2>/dev/null", self.Want_Output)
+        pcs = self.collector.parse_pcs(out)
+        if not pcs:
+            self.logr("Could not enumerate coverage PCs of {}".format(self.args.bin_path))
+            return False
+
+        self.pc_table = self.collector.pc_table = PCTable(build_id)
+        self.collector.symbolize_into_table(pcs)
+
+        if not self.is_dir(table_dir):
+            os.makedirs(table_dir)
+        self.pc_table.save(table_file)
+        self.logr("*** Indexed {} PCs into {}".format(len(self.pc_table.pcs), table_file))
+        self.init_hit_map()
+        return True
+
+    def init_coverage_store(self):
+        """Open the coverage store of --bin-path, carrying its entries over
+        from the previous build after a rebuild"""
+
+        from aflsancov.covstore import CoverageStore, FunctionTable
+        build_id = self.binary_id()
+        table_dir = os.path.join(self.args.cache_dir, 'function-table')
+        table_file = os.path.join(table_dir, build_id + '.json')
+
+        if os.path.isfile(table_file):
+            table = FunctionTable.load(table_file)
+        else:
+            self.logr("*** Fingerprinting functions of {}".format(self.bin_name))
+            dwarf = self.collector.dwarf_symbolizer() if self.args.symbolizer == 'dwarf' else None
+            table = FunctionTable.from_binary(self.args.bin_path, build_id, dwarf)
+            if not self.is_dir(table_dir):
+                os.makedirs(table_dir)
+            table.save(table_file)
+
+        def load_table(old_build_id):
+            path = os.path.join(table_dir, old_build_id + '.json')
+            return FunctionTable.load(path) if os.path.isfile(path) else None
+
+        self.coverage_store = CoverageStore(os.path.join(self.args.cache_dir, 'coverage', self.build_name()),
+                                            table, load_table)
+        reconciled = self.coverage_store.reconcile()
+        if reconciled:
+            self.logr("*** Coverage store: kept {} inputs, {} reach changed functions"
+                      .format(*reconciled))
+        return True
+
+    def stored_pcs(self, fname):
+        if not self.coverage_store:
+            return None
+        pcs = self.coverage_store.get(self.corpus.digest(fname))
+        self.metrics.cache('store', pcs is not None)
+        if pcs is not None and self.args.verbose:
+            self.logr("Reusing stored coverage of {}".format(os.path.basename(fname)))
+        return pcs
+
+    def store_pcs(self, fname, pcs):
+        if self.coverage_store and pcs:
+            if not self.coverage_store.put(self.corpus.digest(fname), pcs):
+                self.logr("Coverage of {} not stored, it has PCs outside the known functions of {}"
+                          .format(os.path.basename(fname), self.bin_name))
+
+    def init_hit_map(self):
+        if self.args.hit_counts:
+            from aflsancov.hitcounts import HitMap
+            self.hit_map = HitMap(self.pc_table)
+
+    def extract_linecov_from_table(self, sancov_fname):
+        ### Positive and zero coverage as set lookups, one pysancov run per input
+        covered = set(self.collector.parse_pcs(self.run_cmd(self.args.pysancov_path + " print "
+                                                            + sancov_fname + " 2>/dev/null", self.Want_Output)))
+
+        self.curr_pos_report, self.curr_zero_report = self.collector.table_coverage(covered)
+        return bool(self.curr_pos_report)
+
+    # Rename <binary_name>.<pid>.sancov to user-supplied `sancov_fname`
+    # Extract linecov info into self.curr* report
+    def rename_and_extract_linecov(self, sancov_fname):
+        out_lines = []
+
+        # Raw sancov file in fpath
+        fpath, fname = os.path.split(sancov_fname)
+        # Find and rename sancov file
+        if not self.find_sancov_file_and_rename(fpath, sancov_fname):
+            return False
+
+        return self.extract_linecov(sancov_fname)
+
+    def extract_linecov(self, sancov_fname):
+        fpath = os.path.dirname(sancov_fname)
+
+        if self.pc_table:
+            return self.extract_linecov_from_table(sancov_fname)
+
+        if self.args.symbolizer == 'dwarf':
+            self.curr_pos_report, self.curr_zero_report = \
+                self.collector.symbolize_coverage(*self.collector.decode_sancov(sancov_fname))
+            return bool(self.curr_pos_report)
+
+        # Positive line coverage
+        # sancov -obj torture_test -print torture_test.28801.sancov 2>/dev/null | llvm-symbolizer -obj torture_test > out
+        out_lines = self.run_cmd(self.args.sancov_path \
+                                 + " -obj " + self.args.bin_path \
+                                 + " -print " + sancov_fname \
+                                 + " 2>/dev/null" \
+                                 + " | " + self.args.llvm_sym_path \
+                                 + " -obj " + self.args.bin_path,
+                                 self.Want_Output)
+
+        # Pos line coverage
+        # self.write_file("\n".join(out_lines), cp['pos_line_cov'])
+        # In-memory representation
+        self.curr_pos_report = self.linecov_report("\n".join(out_lines))
+        if not self.curr_pos_report:
+            return False
+
+        # Zero line coverage
+        # pysancov print cp['sancov_raw'] > covered.txt
+        # pysancov missing bin_path < covered.txt 2>/dev/null | llvm-symbolizer -obj bin_path > cp['zero_line_cov']
+        covered = os.path.join(fpath, "covered.txt")
+        out_lines = self.run_cmd(self.args.pysancov_path \
+                                 + " print " + sancov_fname + " > " + covered + ";" \
+                                 + " " + self.args.pysancov_path + " missing " + self.args.bin_path \
+                                 + " < " + covered + " 2>/dev/null | " \
+                                 + self.args.llvm_sym_path + " -obj " + self.args.bin_path,
+                                 self.Want_Output)
+        self.curr_zero_report = self.linecov_report("\n".join(out_lines))
+
+        # Pos func coverage
+        # sancov -demangle -obj bin_path -covered-functions cp['sancov_raw'] 2>/dev/null
+        # out_lines = self.run_cmd(self.args.sancov_path \
+        #                          + " -demangle" + " -obj " + self.args.bin_path \
+        #                          + " -covered-functions " + cp['sancov_raw'] + " 2>/dev/null",
+        #                          self.Want_Output)
+        # # self.write_file("\n".join(out_lines), cp['pos_func_cov'])
+        # self.curr_reports.append(FuncCov_Report("\n".join(out_lines)))
+
+        # Zero func coverage
+        # sancov -demangle -obj bin_path -not-covered-functions cp['sancov_raw'] 2>/dev/null
+        # out_lines = self.run_cmd(self.args.sancov_path \
+        #                          + " -demangle" + " -obj " + self.args.bin_path \
+        #                          + " -not-covered-functions " + cp['sancov_raw'] + " 2>/dev/null",
+        #                          self.Want_Output)
+        # # self.write_file("\n".join(out_lines), cp['zero_func_cov'])
+        # self.curr_reports.append(FuncCov_Report("\n".join(out_lines)))
+        return True
+
+    def linecov_report(self, repstr):
+        return set((fp, func, ln, col) for (func, fp, ln, col) \
+                   in re.findall(self.line_cov_regex, repstr))
+        # Don't do this if you want to keep sets
+        # return sorted(s, key=lambda cov_entry: cov_entry[0])
+
+    def find_sancov_file_and_rename(self, searchdir, newname):
+
+        for filename in os.listdir(searchdir):
+            match = self.collector.sancov_filename_regex.match(filename)
+            if match and match.group(0):
+                src = os.path.join(searchdir, match.group(0))
+                if os.path.isfile(src):
+                    os.rename(src, newname)
+                    return True
+                assert False, "sancov file is a directory!"
+
+        # assert False, "sancov file {} not found!".format(newname)
+        self.logr("Could not generate coverage info for parent {}. Bailing out!".format(newname))
+        return False
+
+    # Credit: http://stackoverflow.com/a/1104641/4712439
+    def does_dry_run_throw_error(self, input_fname):
+
+        self.budget.charge()
+
+        with self.metrics.stage('execute'):
+            status = self.collector.run_target(input_fname)
+
+        return crashed(status)
+
+    def reproduce(self, crash_fname):
+        """Reproducibility verdict of a crash file over --repro-runs parallel
+        runs with coverage, cached by binary build and input digest"""
+
+        digest = self.corpus.digest(crash_fname)
+        cache = self.repro_verdicts()
+        ### Crash files with identical bytes are verified once
+        with self.verdict_cache_lock:
+            lock = self.repro_locks.setdefault(digest, threading.Lock())
+        with lock:
+            verdict = cache.get(digest, self.args.repro_runs)
+            if not verdict:
+                verdict = self.reproduce_runs(crash_fname)
+                cache.put(digest, verdict)
+        return verdict
+
+    def reproduce_runs(self, crash_fname):
+        runs = self.args.repro_runs
+        self.budget.charge(runs)
+        from multiprocessing.dummy import Pool as ThreadPool
+        pool = ThreadPool(max(1, min(runs, self.args.jobs)))
+        try:
+            results = pool.map(self.rerun, [crash_fname] * runs)
+        finally:
+            pool.close()
+            pool.join()
+
+        ### The first crashing run with coverage stands in for the crash's
+        ### coverage run, see crash_coverage
+        kept = None
+        for (status, pcs, scratch, sancov_file) in results:
+            if kept is None and sancov_file and crashed(status):
+                kept = (scratch, sancov_file)
+            elif scratch:
+                rmtree(scratch)
+        if kept:
+            with self.verdict_cache_lock:
+                self.repro_sancov[crash_fname] = kept
+
+        return repro_verdict([result[0] for result in results], [result[1] for result in results])
+
+    def rerun(self, input_fname):
+        ### Exit status, covered PCs (None if unavailable), scratch dir and
+        ### sancov file of one run. The target runs in one of the --jobs
+        ### slots shared by all reruns.
+        if self.args.sancov_bug:
+            # sancov files land in the current dir, runs cannot tell theirs apart
+            with self.rerun_slots, self.metrics.stage('execute'):
+                return self.collector.run_target(input_fname), None, None, None
+
+        scratch = tempfile.mkdtemp(prefix='repro-', dir=self.cov_paths['scratch_dir'])
+        with self.rerun_slots:
+            status, sancov_file = self.collector.run_for_coverage(input_fname, scratch)
+        pcs = None
+        if sancov_file:
+            pcs = self.collector.covered_pcs(sancov_file)
+        return status, pcs, scratch, sancov_file
+
+    def repro_verdicts(self):
+        ### Verdicts of --bin-path are loaded once, on first use
+        with self.verdict_cache_lock:
+            if self.verdict_cache is None:
+                cache_dir = os.path.join(self.args.cache_dir, 'repro')
+                if not self.is_dir(cache_dir):
+                    os.makedirs(cache_dir)
+                self.verdict_cache = VerdictCache(os.path.join(cache_dir, self.binary_id() + '.jsonl'))
+        return self.verdict_cache
+
+    def target_output(self):
+        ### Target output goes to a file only with --disable-cmd-redirection
+        if self.args.disable_cmd_redirection:
+            return open(self.cov_paths['tmp_out'], 'w')
+        return open(os.devnull, 'w')
+
+    def run_cmd(self, cmd, collect, env=None):
+
+        out = []
+
+        if self.args.verbose:
+            self.logr("    CMD: %s" % cmd)
+
+        fh = None
+        if self.args.disable_cmd_redirection or collect == self.Want_Output:
+            fh = open(self.cov_paths['tmp_out'], 'w')
+        else:
+            fh = open(os.devnull, 'w')
+
+        if env is None:
+            subprocess.call(cmd, stdin=None,
+                            stdout=fh, stderr=subprocess.STDOUT, shell=True, executable='/bin/bash')
+        else:
+            subprocess.call(cmd, stdin=None,
+                            stdout=fh, stderr=subprocess.STDOUT, shell=True, env=env, executable='/bin/bash')
+
+        fh.close()
+
+        if self.args.disable_cmd_redirection or collect == self.Want_Output:
+            with open(self.cov_paths['tmp_out'], 'r') as f:
+                for line in f:
+                    out.append(line.rstrip('\n'))
+
+        return out
+
+    @staticmethod
+    def import_test_cases(qdir):
+        return sorted(glob.glob(qdir + "/id:*"))
+
+    @staticmethod
+    def import_unique_crashes(dir):
+        return sorted(glob.glob(dir + "/*id:*"))
+
+    def parse_cmdline(self, args):
+        p = ArgumentParser(self.Description)
+
+        p.add_argument("-e", "--coverage-cmd", type=str,
+                       help="Set command to exec (including args, and assumes code coverage support)")
+        p.add_argument("--input-mode", choices=['file', 'stdin', 'tmpfs', 'argv'], default='file',
+                       help="How --coverage-cmd gets each input: 'file' substitutes the path for AFL_FILE "
+                            "verbatim (quote AFL_FILE in the command if paths need it), 'stdin' pipes the input "
+                            "from memory, 'tmpfs' substitutes the (shell quoted) path of a staging file in "
+                            "--scratch-dir rewritten for every run, 'argv' runs the command without a shell, "
+                            "substituting the path for AFL_FILE in its arguments")
+        p.add_argument("-d", "--afl-fuzzing-dir", type=str,
+                       help="top level AFL fuzzing directory")
+        p.add_argument("-O", "--overwrite", action='store_true',
+                       help="Overwrite existing coverage results", default=False)
+        p.add_argument("--disable-cmd-redirection", action='store_true',
+                       help="Disable redirection of command results to /dev/null",
+                       default=False)
+        p.add_argument("--coverage-include-lines", action='store_true',
+                       help="Include lines in zero-coverage status files",
+                       default=False)
+        p.add_argument("--preserve-all-sancov-files", action='store_true',
+                       help="Keep all sancov files (not usually necessary) in a compressed archive, "
+                            "delta-diff/.raw/sancov-files.tar.gz",
+                       default=False)
+        p.add_argument("--scratch-dir", type=str,
+                       help="Dir for transient artifacts (sancov files, command output), defaults to "
+                            "/dev/shm when available and the delta-diff dir otherwise")
+        p.add_argument("-v", "--verbose", action='store_true',
+                       help="Verbose mode", default=False)
+        p.add_argument("-V", "--version", action='store_true',
+                       help="Print version and exit", default=False)
+        p.add_argument("-q", "--quiet", action='store_true',
+                       help="Quiet mode", default=False)
+        p.add_argument("--sanitizer", type=str,
+                       help="Experimental! Indicates which sanitizer the binary has been instrumented with.\n"
+                            "Options are: asan, ubsan, defaulting to ubsan. Msan, and lsan are unsupported.",
+                       default="ubsan")
+        p.add_argument("--sancov-path", type=str,
+                       help="Path to sancov binary", default="sancov")
+        p.add_argument("--pysancov-path", type=str,
+                       help="Path to sancov.py script (in clang compiler-rt)",
+                       default="pysancov")
+        p.add_argument("--llvm-sym-path", type=str,
+                       help="Path to llvm-symbolizer", default="llvm-symbolizer")
+        p.add_argument("--symbolizer", choices=['llvm', 'dwarf'], default='llvm',
+                       help="Symbolize PCs with llvm-symbolizer (--llvm-sym-path) or in-process from the "
+                            "binary's DWARF .debug_line/.debug_info")
+        p.add_argument("--bin-path", type=str,
+                       help="Path to coverage instrumented binary")
+        p.add_argument("--crash-dir", type=str,
+                       help="Path to unique AFL crashes post triage")
+        p.add_argument("--dd-num", type=int,
+                       help="Experimental! Perform more compute intensive analysis of crashing input by comparing its"
+                            "path profile with aggregated path profiles of N=dd-num randomly selected non-crashing inputs",
+                       default=1)
+        p.add_argument("--sancov-bug", action='store_true',
+                       help="Sancov bug that occurs for certain coverage_dir env vars", default=False)
+        p.add_argument("--crash-order", type=str, choices=['lineage', 'name'],
+                       help="Order in which crash files are processed: 'lineage' groups crashes sharing "
+                            "ancestors and releases cached parent coverage early, 'name' is plain "
+                            "filename order", default='lineage')
+        p.add_argument("--priority", type=str, choices=['signal', 'newest', 'cluster'],
+                       help="Process crash files by priority: rarest signal first, newest first, or one "
+                            "crash per parent cluster (largest first) before the next")
+        p.add_argument("--time-budget", type=float, metavar='SECS',
+                       help="Stop starting new work after SECS seconds of wall-clock time")
+        p.add_argument("--exec-budget", type=int, metavar='N',
+                       help="Stop starting new work after N target executions")
+        p.add_argument("--crash-exec-budget", type=int, metavar='N',
+                       help="Analyze no more parents of a crash once N executions were spent on it; "
+                            "results cut short are marked partial")
+        p.add_argument("--repro-runs", type=int, metavar='N', default=1,
+                       help="Run every crash file N times in parallel before analyzing it. Crash files that "
+                            "crash in only some runs are analyzed and flagged flaky in their JSON and in "
+                            "--results-db, with crash rate and coverage stability, and are left out of the "
+                            "--hotspots ranking. Verdicts are cached per build and input in --cache-dir")
+        p.add_argument("--continue", dest='resume', action='store_true',
+                       help="Reuse an existing sancov dir and process the crash files an earlier budgeted "
+                            "run did not finish", default=False)
+        p.add_argument("--build", nargs=3, action='append',
+                       metavar=('BIN_PATH', 'COVERAGE_CMD', 'SANITIZER'),
+                       help="Analyze an additional build in the same pass (may be repeated). Corpus "
+                            "indexing and lineage are shared; results go to sancov/builds/<bin>-<sanitizer>")
+        p.add_argument("--coordinate", type=str, metavar='LEASE_DIR',
+                       help="Distribute crash files to workers through a lease dir on a shared filesystem "
+                            "and merge their results into the sancov/delta-diff layout")
+        p.add_argument("--worker", type=str, metavar='LEASE_DIR',
+                       help="Process crash files leased from a coordinator's lease dir")
+        p.add_argument("--local-workers", type=int,
+                       help="Number of workers the coordinator spawns on the local host", default=0)
+        p.add_argument("--lease-timeout", type=float,
+                       help="Seconds without heartbeat after which a worker's lease is reassigned",
+                       default=60.0)
+        p.add_argument("--poll-interval", type=float,
+                       help="Seconds between lease dir scans", default=1.0)
+        p.add_argument("--pipeline", type=str, metavar='STAGE=N,...',
+                       help="Process crash files through a staged pipeline (execute, decode, symbolize, "
+                            "diff) with N worker threads per stage, e.g. execute=4,symbolize=2. Results "
+                            "are written in the same order as without it")
+        p.add_argument("--pipeline-queue", type=int,
+                       help="Capacity of the queues between pipeline stages", default=8)
+        p.add_argument("--pc-table", action='store_true',
+                       help="Index all coverage PCs of --bin-path once (keyed by build-id) and resolve "
+                            "positive and zero coverage by table lookup instead of symbolizing every input",
+                       default=False)
+        p.add_argument("--coverage-store", action='store_true',
+                       help="Keep the covered PCs of executed inputs in --cache-dir relative to their "
+                            "functions, so that after a rebuild of --bin-path only inputs reaching functions "
+                            "whose code changed are executed again (binary built with -g)",
+                       default=False)
+        p.add_argument("--queue-cov", action='store_true',
+                       help="Consolidate the coverage of all queue files instead of analyzing crashes: "
+                            "id-delta-cov lists what each queue file newly covers, pos-cov and zero-cov "
+                            "the totals. Resumable with --continue", default=False)
+        p.add_argument("--queue-bitsets", action='store_true',
+                       help="With --queue-cov, also keep a coverage bitset per queue file over the PC table "
+                            "in sancov/queue-bitsets, for corpus-wide queries (requires --pc-table)",
+                       default=False)
+        p.add_argument("--showmap-cmd", type=str,
+                       help="afl-showmap command line for an AFL-instrumented build that traces AFL_FILE "
+                            "into SHOWMAP_FILE, e.g. 'afl-showmap -q -o SHOWMAP_FILE -- ./target-afl < "
+                            "AFL_FILE'. Ancestors of a crash are screened and ranked by edge tuple "
+                            "difference from it before any sanitizer runs")
+        p.add_argument("--prefilter-candidates", type=int, metavar='N', default=8,
+                       help="Number of ancestors of a crash traced with --showmap-cmd")
+        p.add_argument("--granularity", choices=Granularities, default='line',
+                       help="Diff coverage at line, function or file level; coarse levels are derived "
+                            "from line coverage without extra sancov runs")
+        p.add_argument("--drill-down", action='append', metavar='GLOB',
+                       help="Diff crash files whose name matches GLOB at line level regardless of "
+                            "--granularity (can be repeated)")
+        p.add_argument("--hit-counts", action='store_true',
+                       help="Diff per-line hit counts from 8-bit coverage counters (binary built with "
+                            "-fsanitize-coverage=edge,8bit-counters) instead of line sets, requires --pc-table",
+                       default=False)
+        p.add_argument("--hotspots", action='store_true',
+                       help="Aggregate dice lines, line co-occurrence and shrink-percent over all crashes "
+                            "into sancov/hotspots.json, checkpointed while running", default=False)
+        p.add_argument("--hotspot-checkpoint", type=int, metavar='N', default=100,
+                       help="Checkpoint hotspots every N crashes (and at least every minute)")
+        p.add_argument("--results-db", type=str,
+                       help="Also write all delta-diff results to one file with indices by crash, line "
+                            "and cluster: SQLite for a .db or .sqlite path, JSON lines otherwise")
+        p.add_argument("--no-crash-json", dest='crash_json', action='store_false',
+                       help="Do not write a JSON file per crash (requires --results-db)")
+        p.add_argument("--stats-interval", type=float, metavar='SECS', default=60.0,
+                       help="Refresh throughput, latency, cache and pipeline queue statistics in "
+                            "sancov/afl-sancov-stats every SECS seconds, 0 disables")
+        p.add_argument("--metrics-textfile", type=str, metavar='PATH',
+                       help="Also write the statistics in Prometheus text format to PATH, e.g. for "
+                            "node_exporter's textfile collector")
+        p.add_argument("--metrics-port", type=int, metavar='PORT',
+                       help="Serve the statistics in Prometheus text format on 127.0.0.1:PORT")
+        p.add_argument("--cache-dir", type=str,
+                       help="Dir for persistent per-binary caches, defaults to "
+                            "AFL_FUZZING_DIR/.afl-sancov-cache")
+        p.add_argument("-j", "--jobs", type=int,
+                       help="Number of parallel jobs, defaults to the number of cores")
+
+        return p.parse_args(args)
+
+    def set_defaults(self):
+        """Fill in the defaults of --scratch-dir, --cache-dir and --jobs that
+        depend on the host or on other options"""
+
+        if self.args.scratch_dir is None and os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+            self.args.scratch_dir = '/dev/shm'
+
+        if not self.args.cache_dir and self.args.afl_fuzzing_dir:
+            self.args.cache_dir = os.path.join(self.args.afl_fuzzing_dir, '.afl-sancov-cache')
+
+        if not self.args.jobs:
+            import multiprocessing
+            self.args.jobs = multiprocessing.cpu_count()
+
+    def valid_argv(self, coverage_cmd):
+        if self.args.input_mode == 'argv':
+            try:
+                shlex.split(coverage_cmd)
+            except ValueError, e:
+                print "[*] Cannot split coverage command '%s' into arguments: %s" % (coverage_cmd, e)
+                return False
+        return True
+
+    def validate_args(self):
+        if self.args.coverage_cmd:
+            if 'AFL_FILE' not in self.args.coverage_cmd and self.args.input_mode != 'stdin':
+                print "[*] --coverage-cmd must contain AFL_FILE"
+                return False
+            if not self.valid_argv(self.args.coverage_cmd):
+                return False
+        else:
+            print "[*] --coverage-cmd missing"
+            return False
+
+        if not self.args.afl_fuzzing_dir:
+            print "[*] --afl-fuzzing-dir missing"
+            return False
+
+        if not self.args.queue_cov and (not self.args.crash_dir or not os.path.isdir(self.args.crash_dir)):
+            print "[*] --crash-dir missing or not a dir"
+            return False
+
+        if not self.args.bin_path:
+            print "[*] Please provide path to coverage " \
+                  "instrumented binary using the --bin-path argument"
+            return False
+
+        if not self.which(self.args.bin_path):
+            print "[*] Could not find an executable binary in " \
+                  "--bin-path '%s'" % self.args.bin_path
+            return False
+
+        if not self.which(self.args.sancov_path):
+            print "[*] sancov command not found: %s" % (self.args.sancov_path)
+            return False
+
+        if not self.which(self.args.pysancov_path):
+            print "[*] sancov.py script not found: %s" % (self.args.pysancov_path)
+            return False
+
+        if self.args.symbolizer == 'dwarf' or self.args.coverage_store:
+            from aflsancov.dwarf import ElfFile
+            option = '--symbolizer dwarf' if self.args.symbolizer == 'dwarf' else '--coverage-store'
+            for bin_path in [self.args.bin_path] + [build[0] for build in self.args.build or []]:
+                try:
+                    sections = ElfFile(self.which(bin_path) or bin_path).sections
+                except Exception:
+                    sections = {}
+                if '.debug_info' not in sections or '.debug_line' not in sections:
+                    print "[*] %s requires a binary built with -g: %s" % (option, bin_path)
+                    return False
+        if self.args.symbolizer != 'dwarf' and not self.which(self.args.llvm_sym_path):
+            print "[*] llvm-symbolizer command not found: %s" % (self.args.llvm_sym_path)
+            return False
+
+        for (bin_path, coverage_cmd, sanitizer) in self.args.build or []:
+            if 'AFL_FILE' not in coverage_cmd and self.args.input_mode != 'stdin':
+                print "[*] --build coverage command must contain AFL_FILE"
+                return False
+            if not self.valid_argv(coverage_cmd):
+                return False
+            if not self.which(bin_path):
+                print "[*] Could not find an executable binary in --build '%s'" % bin_path
+                return False
+            if sanitizer not in ['asan', 'ubsan']:
+                print "[*] --build sanitizer must be asan or ubsan"
+                return False
+
+        if self.args.pipeline:
+            if self.args.sancov_bug:
+                print "[*] --pipeline cannot be combined with --sancov-bug"
+                return False
+            for spec in self.args.pipeline.split(','):
+                stage, _, num = spec.partition('=')
+                if stage.strip() not in ['execute', 'decode', 'symbolize', 'diff'] \
+                        or not num.isdigit() or int(num) < 1:
+                    print "[*] --pipeline expects STAGE=N pairs for stages execute, decode, symbolize, diff"
+                    return False
+
+        if self.args.hit_counts:
+            if not self.args.pc_table:
+                print "[*] --hit-counts requires --pc-table"
+                return False
+            if self.args.sancov_bug or self.args.coordinate:
+                print "[*] --hit-counts cannot be combined with --sancov-bug or --coordinate"
+                return False
+            if self.args.granularity != 'line':
+                print "[*] --hit-counts diffs at line level only"
+                return False
+            if self.args.coverage_store:
+                print "[*] --hit-counts cannot be combined with --coverage-store, it stores no counters"
+                return False
+
+        if self.args.showmap_cmd:
+            if 'AFL_FILE' not in self.args.showmap_cmd or 'SHOWMAP_FILE' not in self.args.showmap_cmd:
+                print "[*] --showmap-cmd must contain AFL_FILE and SHOWMAP_FILE"
+                return False
+            if self.args.prefilter_candidates < 1:
+                print "[*] --prefilter-candidates must be positive"
+                return False
+
+        if self.args.repro_runs < 1:
+            print "[*] --repro-runs must be positive"
+            return False
+
+        if self.args.stats_interval < 0:
+            print "[*] --stats-interval cannot be negative"
+            return False
+
+        if self.args.build and (self.args.coordinate or self.args.worker):
+            print "[*] --build cannot be combined with --coordinate or --worker"
+            return False
+
+        if self.args.queue_cov and self.args.coordinate:
+            print "[*] --queue-cov cannot be combined with --coordinate"
+            return False
+
+        if self.args.queue_bitsets and not (self.args.queue_cov and self.args.pc_table):
+            print "[*] --queue-bitsets requires --queue-cov and --pc-table"
+            return False
+
+        if self.args.resume and self.args.overwrite:
+            print "[*] --continue cannot be combined with --overwrite"
+            return False
+
+        if not self.args.crash_json and not self.args.results_db:
+            print "[*] --no-crash-json requires --results-db"
+            return False
+
+        self.set_defaults()
+
+        if self.args.scratch_dir and not os.path.isdir(self.args.scratch_dir):
+            print "[*] --scratch-dir is not a dir: %s" % self.args.scratch_dir
+            return False
+
+        # if self.args.dd_mode and not self.args.dd_raw_queue_path:
+        #     print "[*] --dd-mode requires --dd-raw-queue-path to be set"
+        #     return False
+
+        # if self.args.dd_mode and not self.args.dd_crash_file:
+        #     print "[*] Pass crashing input to --dd-crash-file"
+        #     return False
+
+        return True
+
+    ### credit: http://stackoverflow.com/questions/377017/test-if-executable-exists-in-python
+    @staticmethod
+    def is_exe(fpath):
+        return os.path.isfile(fpath) and os.access(fpath, os.X_OK)
+
+    @classmethod
+    def which(cls, prog):
+        fpath, fname = os.path.split(prog)
+        if fpath:
+            if cls.is_exe(prog):
+                return prog
+        else:
+            for path in os.environ["PATH"].split(os.pathsep):
+                path = path.strip('"')
+                exe_file = os.path.join(path, prog)
+                if cls.is_exe(exe_file):
+                    return exe_file
+
+        return None
+
+    def add_fuzz_dir(self, fdir):
+        self.cov_paths['dirs'][fdir] = {}
+        self.cov_paths['dirs'][fdir]['prev_file'] = ''
+        return
+
+    def init_mkdirs(self):
+
+        # lcov renamed cons and delta-diff dir added
+        create_cov_dirs = 0
+        if self.is_dir(self.cov_paths['top_dir']):
+            if self.args.overwrite:
+                rmtree(self.cov_paths['top_dir'])
+                create_cov_dirs = 1
+        else:
+            create_cov_dirs = 1
+
+        if create_cov_dirs:
+            for k in ['top_dir', 'web_dir', 'cons_dir', 'diff_dir']:
+                os.mkdir(self.cov_paths[k])
+            for k in ['delta_diff_dir', 'dd_stash_dir', 'dd_filter_dir']:
+                os.mkdir(self.cov_paths[k])
+
+            ### write coverage results in the following format
+            cfile = open(self.cov_paths['id_delta_cov'], 'w')
+            cfile.write("# id:NNNNNN*_file, cycle, src_file, coverage_type, fcn/line\n")
+            cfile.close()
+
+        return
+
+    @staticmethod
+    def is_dir(dpath):
+        return os.path.exists(dpath) and os.path.isdir(dpath)
+
+    def logr(self, pstr):
+        if not self.args.quiet:
+            print "    " + pstr
+        self.append_file(pstr, self.cov_paths['log_file'])
+        return
+
+    @staticmethod
+    def append_file(pstr, path):
+        f = open(path, 'a')
+        f.write("%s\n" % pstr)
+        f.close()
+        return
+
+    @classmethod
+    def write_status(cls, status_file):
+        f = open(status_file, 'w')
+        f.write("afl_sancov_pid     : %d\n" % os.getpid())
+        f.write("afl_sancov_version : %s\n" % cls.Version)
+        f.write("command_line       : %s\n" % ' '.join(argv))
+        f.close()
+        return
@@ -0,0 +1,91 @@
+#
+#  File: aflsancov/repro.py
+#
+#  Purpose: Crash reproducibility verdicts over repeated runs
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import json
+import threading
+
+
+def crashed(status):
+    """Exit status of a crash: killed by a signal, or 128 + signal as a
+    shell reports it"""
+
+    return status > 128 or status < 0
+
+
+def repro_verdict(statuses, coverages):
+    """Verdict on repeated runs of one input from their exit statuses and the
+    covered PCs of the runs that yielded coverage
+
+    Coverage stability is the share of PCs covered by every run out of those
+    covered by any, None with fewer than two covered runs.
+    """
+
+    crashes = sum(1 for status in statuses if crashed(status))
+    coverages = [set(pcs) for pcs in coverages if pcs is not None]
+    stability = None
+    if len(coverages) > 1:
+        union = set.union(*coverages)
+        stability = round(len(set.intersection(*coverages)) / float(len(union)), 4) if union else 1.0
+    return {'runs': len(statuses), 'crashes': crashes,
+            'crash-rate': round(crashes / float(len(statuses)), 4) if statuses else 0.0,
+            'coverage-stability': stability}
+
+
+def flaky(verdict):
+    return 0 < verdict['crashes'] < verdict['runs']
+
+
+class VerdictCache:
+    """Reproducibility verdicts of one build of the target by input digest,
+    appended to a JSON lines file so that later runs skip the reruns"""
+
+    def __init__(self, path):
+        self.path = path
+        self.verdicts = {}
+        self.lock = threading.Lock()
+        if os.path.isfile(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn last line of an interrupted run
+                        continue
+                    self.verdicts[entry.pop('digest')] = entry
+
+    def get(self, digest, runs):
+        """Cached verdict over at least runs runs, None if there is none"""
+
+        with self.lock:
+            verdict = self.verdicts.get(digest)
+        if verdict and verdict['runs'] >= runs:
+            return verdict
+        return None
+
+    def put(self, digest, verdict):
+        with self.lock:
+            self.verdicts[digest] = verdict
+            entry = dict(verdict, digest=digest)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry, sort_keys=True) + '\n')
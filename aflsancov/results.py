@@ -0,0 +1,279 @@
+#
+#  File: aflsancov/results.py
+#
+#  Purpose: Disposal of sancov files and the consolidated results store
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import json
+import hashlib
+import threading
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+
+class SancovStash:
+    """Disposes of spent sancov files on a background thread
+
+    With an archive path the files are appended to a compressed tar archive
+    before removal, so preserving them costs no per-file renames on the
+    (possibly network backed) fuzzing filesystem. A resumed run carries the
+    files of an existing archive over into the new one.
+    """
+
+    def __init__(self, archive=None, resume=False):
+        self.archive = archive
+        self.resume = resume
+        self.errors = []
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def add(self, path):
+        self.queue.put(path)
+
+    def run(self):
+        tar = None
+        tar_path = self.archive
+        if self.archive:
+            import tarfile
+            if self.resume and os.path.isfile(self.archive):
+                ### Compressed archives cannot be appended to in place
+                tar_path = self.archive + '.tmp'
+            tar = tarfile.open(tar_path, 'w:gz')
+            if tar_path != self.archive:
+                try:
+                    old = tarfile.open(self.archive, 'r:gz')
+                    for member in old:
+                        tar.addfile(member, old.extractfile(member))
+                    old.close()
+                except (tarfile.TarError, IOError, EOFError), e:
+                    self.errors.append("{}: {}".format(self.archive, e))
+        while True:
+            path = self.queue.get()
+            if path is None:
+                break
+            try:
+                if tar:
+                    tar.add(path, os.path.basename(path))
+                os.remove(path)
+            except (IOError, OSError), e:
+                self.errors.append("{}: {}".format(path, e))
+        if tar:
+            tar.close()
+            if tar_path != self.archive:
+                os.rename(tar_path, self.archive)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        return self.errors
+
+
+class ResultsStore:
+    """Consolidated delta-diff results of a run in one file
+
+    Source files and function names go to a string table and every crash
+    is written as soon as its result is known. A path ending in .db or
+    .sqlite selects an SQLite database with indexed tables, any other path
+    a JSON lines file whose last line holds the indices. Crashes with the
+    same set of dice lines share a cluster. Markers of the per-crash JSON
+    (granularity, partial, flaky and the reproducibility rates, hit counts
+    of nodes) are kept as well, unset where the JSON has none.
+
+    A resumed run adds to the results of the earlier run. A crash that is
+    added again for the same build, e.g. analyzed deeper after a budgeted
+    run, replaces its earlier result; in a JSON lines file the earlier
+    record stays behind but drops out of the indices.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.strings = {}
+        self.num_crashes = 0
+        self.index = {'crash': {}, 'line': {}, 'cluster': {}}
+        # (name, build) -> (crash id, offset, cluster, line keys) of JSON lines records
+        self.records = {}
+        if os.path.splitext(path)[1] in ('.db', '.sqlite'):
+            import sqlite3
+            if os.path.exists(path) and not resume:
+                os.remove(path)
+            exists = os.path.exists(path)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            if exists:
+                self.strings = dict((value, sid) for (sid, value)
+                                    in self.db.execute("SELECT id, value FROM strings"))
+                self.num_crashes = self.db.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM crashes").fetchone()[0]
+            else:
+                self.db.executescript(self.SQL_Schema)
+            self.file = None
+        else:
+            self.db = None
+            if resume and os.path.exists(path):
+                self.load()
+                self.file = open(path, 'r+')
+                self.file.seek(0, os.SEEK_END)
+            else:
+                self.file = open(path, 'w')
+
+    SQL_Schema = """
+        CREATE TABLE strings (id INTEGER PRIMARY KEY, value TEXT);
+        CREATE TABLE crashes (id INTEGER PRIMARY KEY, name TEXT, parent TEXT, build TEXT,
+                              cluster TEXT, slice_linecount INTEGER, dice_linecount INTEGER,
+                              shrink_percent REAL, granularity TEXT, partial INTEGER,
+                              parents_analyzed INTEGER, flaky INTEGER, crash_rate REAL,
+                              coverage_stability REAL);
+        CREATE TABLE nodes (crash INTEGER, file INTEGER, function INTEGER, line INTEGER,
+                            col INTEGER, count INTEGER, hits INTEGER, hit_delta INTEGER);
+        CREATE INDEX crashes_by_name ON crashes (name);
+        CREATE INDEX crashes_by_cluster ON crashes (cluster);
+        CREATE INDEX nodes_by_line ON nodes (file, line);
+        CREATE INDEX nodes_by_crash ON nodes (crash);
+        """
+
+    # Per-crash JSON keys stored as is, see dd_stats, write_dd_result
+    Markers = ['granularity', 'partial', 'parents-analyzed', 'flaky', 'crash-rate', 'coverage-stability']
+
+    @staticmethod
+    def split_node(spec):
+        """file:function:line:col, function names may contain '::'. Function
+        and file granularity nodes get line and column 0"""
+        fp, _, rest = spec.partition(':')
+        parts = rest.rsplit(':', 2)
+        if len(parts) == 3 and parts[1].isdigit() and parts[2].isdigit():
+            return fp, parts[0], int(parts[1]), int(parts[2])
+        return fp, rest, 0, 0
+
+    @staticmethod
+    def cluster(stats):
+        lines = sorted(node['line'] for node in stats['diff-node-spec'])
+        return hashlib.sha1('\n'.join(lines)).hexdigest()[:16]
+
+    def intern(self, value):
+        if value not in self.strings:
+            sid = len(self.strings)
+            self.strings[value] = sid
+            if self.db:
+                self.db.execute("INSERT INTO strings VALUES (?, ?)", (sid, value))
+            else:
+                self.write_line({'string': [sid, value]})
+        return self.strings[value]
+
+    def load(self):
+        """Replay the records of an earlier run and cut off its index line
+        (or a torn last line), which close writes anew"""
+
+        end = 0
+        with open(self.path) as f:
+            offset = 0
+            for line in iter(f.readline, ''):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if 'string' in record:
+                    sid, value = record['string']
+                    self.strings[value] = sid
+                elif 'crash' in record:
+                    self.index_record(record, offset)
+                    self.num_crashes = max(self.num_crashes, record['crash'] + 1)
+                else:
+                    break
+                offset += len(line)
+                end = offset
+        with open(self.path, 'r+') as f:
+            f.truncate(end)
+
+    def index_record(self, record, offset):
+        cid, name, cluster = record['crash'], record['name'], record['cluster']
+        lines = ['{}:{}'.format(node[0], node[2]) for node in record['nodes']]
+        old = self.records.pop((name, record['build']), None)
+        if old:
+            old_cid, old_offset, old_cluster, old_lines = old
+            self.index['crash'][name].remove(old_offset)
+            self.index['cluster'][old_cluster].remove(old_cid)
+            for line in old_lines:
+                if old_cid in self.index['line'][line]:
+                    self.index['line'][line].remove(old_cid)
+        self.records[(name, record['build'])] = (cid, offset, cluster, lines)
+        self.index['crash'].setdefault(name, []).append(offset)
+        self.index['cluster'].setdefault(cluster, []).append(cid)
+        for line in lines:
+            self.index['line'].setdefault(line, []).append(cid)
+
+    def write_line(self, record):
+        offset = self.file.tell()
+        self.file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        return offset
+
+    def add(self, stats, build=None):
+        with self.lock:
+            cid = self.num_crashes
+            self.num_crashes += 1
+            cluster = self.cluster(stats)
+            nodes = []
+            for node in stats['diff-node-spec']:
+                fp, func, line, col = self.split_node(node['line'])
+                nodes.append([self.intern(fp), self.intern(func), line, col, node['count']])
+                if 'hits' in node:
+                    nodes[-1].extend([node['hits'], node['hit-delta']])
+
+            if self.db:
+                self.db.execute("DELETE FROM nodes WHERE crash IN "
+                                "(SELECT id FROM crashes WHERE name = ? AND build IS ?)",
+                                (stats['crashing-input'], build))
+                self.db.execute("DELETE FROM crashes WHERE name = ? AND build IS ?", (stats['crashing-input'], build))
+                self.db.execute("INSERT INTO crashes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                [cid, stats['crashing-input'], stats.get('parent-input'), build, cluster,
+                                 stats['slice-linecount'], stats['dice-linecount'], stats['shrink-percent']]
+                                + [stats.get(key) for key in self.Markers])
+                self.db.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                    [[cid] + node + [None] * (7 - len(node)) for node in nodes])
+                self.db.commit()
+                return
+
+            record = {'crash': cid, 'name': stats['crashing-input'], 'build': build, 'cluster': cluster,
+                      'slice-linecount': stats['slice-linecount'],
+                      'dice-linecount': stats['dice-linecount'],
+                      'shrink-percent': stats['shrink-percent'], 'nodes': nodes}
+            if 'parent-input' in stats:
+                record['parent'] = stats['parent-input']
+            for key in self.Markers:
+                if key in stats:
+                    record[key] = stats[key]
+            self.index_record(record, self.write_line(record))
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.db:
+                self.db.close()
+                self.db = None
+            elif self.file:
+                ### Crashes map to the byte offsets of their records, lines
+                ### (string id of the file:line) and clusters to crash ids
+                self.write_line({'index': self.index})
+                self.file.close()
+                self.file = None
@@ -0,0 +1,142 @@
+#
+#  File: aflsancov/symbolize.py
+#
+#  Purpose: ELF build-ids and instrumentation point tables
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import json
+import struct
+import threading
+
+
+def elf_build_id(path):
+    """Return the GNU build-id of an ELF binary as hex, None if it has none"""
+
+    with open(path, 'rb') as f:
+        ident = f.read(16)
+        if ident[:4] != b'\x7fELF':
+            return None
+        is64 = ident[4:5] == b'\x02'
+        endian = '<' if ident[5:6] == b'\x01' else '>'
+
+        if is64:
+            f.seek(0x28)
+            e_shoff, = struct.unpack(endian + 'Q', f.read(8))
+            f.seek(0x3a)
+        else:
+            f.seek(0x20)
+            e_shoff, = struct.unpack(endian + 'I', f.read(4))
+            f.seek(0x2e)
+        e_shentsize, e_shnum = struct.unpack(endian + 'HH', f.read(4))
+
+        for idx in range(e_shnum):
+            f.seek(e_shoff + idx * e_shentsize)
+            if is64:
+                _, sh_type, _, _, sh_offset, sh_size = struct.unpack(endian + 'IIQQQQ', f.read(40))
+            else:
+                _, sh_type, _, _, sh_offset, sh_size = struct.unpack(endian + 'IIIIII', f.read(24))
+            # SHT_NOTE
+            if sh_type != 7:
+                continue
+            f.seek(sh_offset)
+            notes = f.read(sh_size)
+            pos = 0
+            while pos + 12 <= len(notes):
+                namesz, descsz, ntype = struct.unpack(endian + 'III', notes[pos:pos + 12])
+                pos += 12
+                name = notes[pos:pos + namesz]
+                pos += (namesz + 3) & ~3
+                desc = notes[pos:pos + descsz]
+                pos += (descsz + 3) & ~3
+                # NT_GNU_BUILD_ID
+                if ntype == 3 and name.rstrip(b'\x00') == b'GNU':
+                    return ''.join('%02x' % c for c in bytearray(desc))
+
+    return None
+
+
+class PCTable:
+    """Instrumentation point table of a coverage instrumented binary
+
+    Maps every coverage PC to its symbolized (file, function, line, column)
+    frames. File and function names are interned, so the table stays compact
+    and positive/zero coverage become in-process lookups.
+    """
+
+    def __init__(self, build_id, files=None, functions=None, pcs=None):
+        self.build_id = build_id
+        self.files = files or []
+        self.functions = functions or []
+        # pc -> ((file_idx, func_idx, line, col), ...)
+        self.pcs = pcs or {}
+        self.file_idx = dict((name, idx) for idx, name in enumerate(self.files))
+        self.func_idx = dict((name, idx) for idx, name in enumerate(self.functions))
+        self.frame_cache = {}
+        self.lock = threading.Lock()
+
+    def intern_frame(self, fp, func, ln, col):
+        if fp not in self.file_idx:
+            self.file_idx[fp] = len(self.files)
+            self.files.append(fp)
+        if func not in self.func_idx:
+            self.func_idx[func] = len(self.functions)
+            self.functions.append(func)
+        return (self.file_idx[fp], self.func_idx[func], int(ln), int(col))
+
+    def add(self, pc, frames):
+        self.pcs[pc] = tuple(self.intern_frame(*frame) for frame in frames)
+
+    def frames(self, pc):
+        ### Same (filepath, function, line, col) string tuples as linecov_report
+        if pc not in self.frame_cache:
+            self.frame_cache[pc] = [(self.files[fi], self.functions[fu], str(ln), str(col))
+                                    for (fi, fu, ln, col) in self.pcs[pc]]
+        return self.frame_cache[pc]
+
+    def lookup(self, pcs):
+        report = set()
+        for pc in pcs:
+            if pc in self.pcs:
+                report.update(self.frames(pc))
+        return report
+
+    def zero(self, covered):
+        return self.lookup(pc for pc in self.pcs if pc not in covered)
+
+    def missing(self, pcs):
+        return [pc for pc in pcs if pc not in self.pcs]
+
+    def save(self, path):
+        table = {'build-id': self.build_id, 'files': self.files, 'functions': self.functions,
+                 'pcs': [[pc, [list(frame) for frame in frames]]
+                         for pc, frames in sorted(self.pcs.items())]}
+        ### Concurrent local workers may index the same binary
+        tmp = '{}.{}.{}.tmp'.format(path, os.getpid(), threading.current_thread().ident)
+        with open(tmp, 'w') as f:
+            json.dump(table, f, separators=(',', ':'))
+        os.rename(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            table = json.load(f)
+        pcs = dict((pc, tuple(tuple(frame) for frame in frames)) for pc, frames in table['pcs'])
+        return cls(table['build-id'], table['files'], table['functions'], pcs)
@@ -0,0 +1,25 @@
+#
+#  File: aflsancov/tests/__init__.py
+#
+#  Purpose: Unit tests of the aflsancov modules that need no clang, sancov or fuzzing data
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+"""Run with python -m unittest discover aflsancov from the top level dir.
+End to end tests against sanitizer builds live in tests/test-afl-sancov.py"""
@@ -0,0 +1,103 @@
+#
+#  File: aflsancov/tests/test_bitsets.py
+#
+#  Purpose: Tests of the memory-mapped bitset store
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import sys
+import unittest
+import tempfile
+from shutil import rmtree
+
+try:
+    import subprocess32 as subprocess
+except ImportError:
+    import subprocess
+
+from aflsancov import bitsets
+from aflsancov.bitsets import BitsetStore
+
+
+class TestBitsetStore(unittest.TestCase):
+
+    covered = {'id:000000': [0x10, 0x20], 'id:000001': [0x20, 0x30, 0x40], 'id:000002': [0x20, 0x50]}
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.store_dir = os.path.join(self.tmp, 'bitsets')
+        store = BitsetStore(self.store_dir, [0x10, 0x20, 0x30, 0x40, 0x50])
+        for key in sorted(self.covered):
+            store.add(key, self.covered[key])
+        store.close()
+
+    def tearDown(self):
+        rmtree(self.tmp)
+
+    def queries(self):
+        store = BitsetStore(self.store_dir)
+        store.Chunk_Bytes = 16
+        return (store.covered(store.union()), store.covered(store.intersection()),
+                store.covered(store.union(['id:000000', 'id:000002'])), store.covered(store.difference('id:000001')),
+                store.popcounts(), store.popcount(store.union()))
+
+    def test_queries(self):
+        expected = ([0x10, 0x20, 0x30, 0x40, 0x50], [0x20], [0x10, 0x20, 0x50], [0x30, 0x40], [2, 3, 2], 5)
+        self.assertEqual(self.queries(), expected)
+
+        numpy = bitsets.numpy
+        bitsets.numpy = None
+        try:
+            self.assertEqual(self.queries(), expected, 'Long integer fallback differs from numpy')
+        finally:
+            bitsets.numpy = numpy
+
+    def test_build_mismatch(self):
+        path = os.path.join(self.tmp, 'bitsets-build')
+        BitsetStore(path, [0x10, 0x20], 'build-a').close()
+        self.assertRaises(ValueError, BitsetStore, path, [0x10, 0x30], 'build-b')
+        store = BitsetStore(path, [0x10, 0x20], 'build-a')
+        self.assertEqual(store.points, [0x10, 0x20])
+        store.close()
+
+    def test_bounded_memory(self):
+        ### 64MB of bitsets scanned by a process that may not map 16MB more
+        path = os.path.join(self.tmp, 'bitsets-large')
+        store = BitsetStore(path, range(8192))
+        for row in range(65536):
+            store.add('id:%06d' % row, [row % 8192, row * 7 % 8192])
+        store.close()
+        scan = """if True:
+            import resource, sys
+            sys.path.insert(0, %r)
+            from aflsancov.bitsets import BitsetStore
+            store = BitsetStore(%r)
+            store.Chunk_Bytes = 1 << 20
+            with open('/proc/self/status') as f:
+                vm_size = int(dict(line.split(':', 1) for line in f)['VmSize'].split()[0]) * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (vm_size + (16 << 20), vm_size + (16 << 20)))
+            print store.popcount(store.union()), sum(store.popcounts())
+        """ % (os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), path)
+        out = subprocess.check_output([sys.executable, '-c', scan])
+        self.assertEqual(out.split(), ['8192', str(65536 * 2 - 16)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+#
+#  File: aflsancov/tests/test_budget.py
+#
+#  Purpose: Tests of run budgets, their resume state and crash priorities
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import unittest
+import tempfile
+from shutil import rmtree
+
+from aflsancov.budget import Budget, BudgetState, prioritize
+
+
+class TestBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.tmp, 'budget-state.json')
+
+    def tearDown(self):
+        rmtree(self.tmp)
+
+    def test_exec_budgets(self):
+        budget = Budget(execs=5, crash_execs=2)
+        budget.begin_crash()
+        budget.charge(2)
+        self.assertTrue(budget.crash_exhausted())
+        self.assertFalse(budget.exhausted())
+        budget.begin_crash()
+        self.assertFalse(budget.crash_exhausted())
+        budget.charge(3)
+        self.assertTrue(budget.exhausted())
+        self.assertFalse(Budget().limited())
+
+    def test_state_roundtrip(self):
+        state = BudgetState(self.state_path)
+        state.done('c1')
+        state.done('c2', 1)
+        state.skipped('c3')
+        state.skipped('c1')
+        state.save()
+
+        loaded = BudgetState(self.state_path)
+        loaded.load()
+        self.assertEqual((loaded.complete, loaded.partial, loaded.pending), ({'c1'}, {'c2': 1}, {'c3'}))
+
+    def test_priorities(self):
+        crashes = ['id:000000,sig:06,a', 'id:000001,sig:11,b', 'id:000002,sig:06,c', 'id:000003,sig:06,d']
+        self.assertEqual(prioritize(crashes, 'signal')[0], 'id:000001,sig:11,b')
+        clusters = {'id:000000,sig:06,a': 'p1', 'id:000001,sig:11,b': 'p2', 'id:000002,sig:06,c': 'p1',
+                    'id:000003,sig:06,d': 'p3'}
+        self.assertEqual(prioritize(crashes, 'cluster', clusters.get),
+                         ['id:000000,sig:06,a', 'id:000001,sig:11,b', 'id:000003,sig:06,d', 'id:000002,sig:06,c'])
+
+
+if __name__ == "__main__":
+    unittest.main()
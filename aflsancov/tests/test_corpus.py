@@ -0,0 +1,58 @@
+#
+#  File: aflsancov/tests/test_corpus.py
+#
+#  Purpose: Tests of the lineage scheduler
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import unittest
+
+from aflsancov.corpus import LineageScheduler
+
+
+class TestLineageScheduler(unittest.TestCase):
+
+    lineages = {'c1': ['q3', 'q1', 'q0'],
+                'c2': ['q2', 'q0'],
+                'c3': ['q4', 'q1', 'q0'],
+                'c4': ['q3', 'q1', 'q0']}
+
+    def test_shared_ancestors_are_adjacent(self):
+        scheduler = LineageScheduler(sorted(self.lineages), self.lineages)
+        order = scheduler.order()
+        self.assertEqual(order[-1], 'c2', 'Crash with disjoint lineage should not split the q1 subtree')
+        self.assertEqual(abs(order.index('c1') - order.index('c4')), 1,
+                         'Crashes with identical lineage should be adjacent')
+
+    def test_release_after_last_dependent(self):
+        scheduler = LineageScheduler(sorted(self.lineages), self.lineages)
+        released = []
+        for crash in scheduler.order():
+            released.append(set(scheduler.release(crash)))
+        self.assertEqual(released, [set(), {'q3'}, {'q4', 'q1'}, {'q2', 'q0'}])
+        self.assertFalse(scheduler.refcount)
+
+    def test_name_order(self):
+        scheduler = LineageScheduler(['b', 'a'])
+        self.assertEqual(scheduler.order(), ['b', 'a'])
+        self.assertEqual(scheduler.release('a'), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
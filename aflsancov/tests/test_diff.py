@@ -0,0 +1,54 @@
+#
+#  File: aflsancov/tests/test_diff.py
+#
+#  Purpose: Tests of dice and its coarse granularities
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import unittest
+
+from aflsancov.diff import coarsen, dice, dd_stats
+from aflsancov.results import ResultsStore
+
+
+class TestDice(unittest.TestCase):
+
+    crash = {('/src/a.c', 'main', '25', '3'), ('/src/a.c', 'main', '9', '1'), ('/src/a.c', 'bug', '7', '2'),
+             ('/src/b.c', 'parse', '3', '1')}
+    parent = {('/src/a.c', 'main', '25', '3'), ('/src/a.c', 'bug', '8', '2'), ('/src/c.c', 'init', '1', '1')}
+
+    def test_granularities(self):
+        self.assertEqual(dice(self.crash, self.parent),
+                         [('/src/a.c', 'bug', '7', '2'), ('/src/a.c', 'main', '9', '1'),
+                          ('/src/b.c', 'parse', '3', '1')])
+        self.assertEqual(dice(self.crash, self.parent, 'function'), [('/src/b.c', 'parse')])
+        self.assertEqual(dice(self.crash, self.parent, 'file'), [('/src/b.c',)])
+
+    def test_coarse_stats(self):
+        stats = dd_stats('crash', dice(self.crash, self.parent, 'function'),
+                         len(coarsen(self.parent, 'function')), 'parent', 'function')
+        self.assertEqual(stats['diff-node-spec'], [{'line': '/src/b.c:parse', 'count': 1}])
+        self.assertEqual(stats['slice-linecount'], 3)
+        self.assertEqual(stats['granularity'], 'function')
+        self.assertEqual(ResultsStore.split_node('/src/b.c:parse'), ('/src/b.c', 'parse', 0, 0))
+        self.assertEqual(ResultsStore.split_node('/src/b.c:ns::f:3:1'), ('/src/b.c', 'ns::f', 3, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
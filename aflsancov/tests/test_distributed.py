@@ -0,0 +1,64 @@
+#
+#  File: aflsancov/tests/test_distributed.py
+#
+#  Purpose: Tests of the coordinator's lease dir
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import unittest
+import tempfile
+from shutil import rmtree
+
+from aflsancov.distributed import LeaseDir
+
+
+class TestLeaseDir(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.lease = LeaseDir(self.tmp + '/lease')
+        self.lease.reset()
+        self.tasks = self.lease.publish(['/crashes/a', '/crashes/b'])
+
+    def tearDown(self):
+        rmtree(self.tmp)
+
+    def test_claim_is_exclusive(self):
+        self.assertEqual(self.tasks, ['0.task', '1.task'])
+        self.assertEqual(self.lease.claim('w1'), ('0.task', '/crashes/a'))
+        self.assertEqual(self.lease.claim('w2'), ('1.task', '/crashes/b'))
+        self.assertEqual(self.lease.claim('w3'), None)
+        self.assertFalse(self.lease.idle())
+        self.assertTrue(self.lease.complete('0.task', 'w1'))
+        self.assertTrue(self.lease.complete('1.task', 'w2'))
+        self.assertTrue(self.lease.idle())
+        self.assertEqual(self.lease.done(), [('0.task', 'w1'), ('1.task', 'w2')])
+
+    def test_dead_worker_is_reassigned(self):
+        task, _ = self.lease.claim('dead')
+        self.assertEqual(self.lease.reclaim(3600), [], 'Fresh lease must not be reassigned')
+        self.assertEqual(self.lease.reclaim(-1), [(task, 'dead')])
+        self.assertEqual(self.lease.claim('alive'), (task, '/crashes/a'))
+        self.assertFalse(self.lease.complete(task, 'dead'), 'Reclaimed lease must not complete')
+        self.assertTrue(self.lease.complete(task, 'alive'))
+        self.assertEqual(self.lease.done(), [(task, 'alive')])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+#
+#  File: aflsancov/tests/test_hitcounts.py
+#
+#  Purpose: Tests of hit count spectra
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import unittest
+
+from aflsancov import hitcounts
+from aflsancov.hitcounts import HitMap
+from aflsancov.symbolize import PCTable
+
+
+class TestHitMap(unittest.TestCase):
+
+    src = '/src/afl-sancov/tests/test-sancov.c'
+
+    def diff(self):
+        table = PCTable('deadbeef')
+        table.add(0x10, [(self.src, 'main', '15', '2')])
+        table.add(0x20, [(self.src, 'main', '20', '7')])
+        table.add(0x30, [(self.src, 'bug', '7', '2'), (self.src, 'main', '25', '3')])
+        hit_map = HitMap(table)
+
+        crash = hit_map.line_hits(b'\x01\x09\x02')
+        parents = [hit_map.line_hits(b'\x01\x02'), hit_map.line_hits(b'\x01\x09\x01')]
+        return hit_map.covered(crash), [(line[2], count, hits, delta) for (line, count, hits, delta)
+                                        in hit_map.diff(crash, parents)]
+
+    def test_diff(self):
+        # Line 20 runs more often than in the first parent only
+        expected = (4, [('7', 2, 2, 3), ('25', 2, 2, 3), ('20', 1, 9, 7)])
+        self.assertEqual(self.diff(), expected)
+
+        numpy = hitcounts.numpy
+        hitcounts.numpy = None
+        try:
+            self.assertEqual(self.diff(), expected, 'Array fallback differs from numpy')
+        finally:
+            hitcounts.numpy = numpy
+
+
+if __name__ == "__main__":
+    unittest.main()
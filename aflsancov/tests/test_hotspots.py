@@ -0,0 +1,129 @@
+#
+#  File: aflsancov/tests/test_hotspots.py
+#
+#  Purpose: Tests of the cross-crash hotspot aggregation
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import json
+import unittest
+import tempfile
+from shutil import rmtree
+
+from aflsancov.hotspots import HotspotAggregator
+
+
+class TestHotspotAggregator(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'hotspots.json')
+
+    def tearDown(self):
+        rmtree(self.tmp)
+
+    def stats(self, name, lines, shrink):
+        return {'crashing-input': name, 'shrink-percent': shrink,
+                'diff-node-spec': [{'line': line, 'count': 1} for line in lines]}
+
+    def report(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def test_checkpoint_and_resume(self):
+        hotspots = HotspotAggregator(self.path, checkpoint_every=2)
+        hotspots.add(self.stats('c1', ['a.c:f:1:1', 'a.c:f:2:1'], 50.0))
+        self.assertFalse(os.path.exists(self.path))
+        hotspots.add(self.stats('c2', ['a.c:f:2:1', 'b.c:g:3:1'], 95.0))
+        self.assertTrue(os.path.exists(self.path), 'No checkpoint after 2 crashes')
+
+        resumed = HotspotAggregator(self.path)
+        resumed.add(self.stats('c2', ['a.c:f:2:1', 'b.c:g:3:1'], 95.0))
+        resumed.add(self.stats('c3', ['a.c:f:1:1', 'a.c:f:2:1'], 100.0))
+        resumed.close()
+
+        report = self.report()
+        self.assertEqual(report['crashes'], 3)
+        self.assertEqual(report['hotspots'][0], {'line': 'a.c:f:2:1', 'crashes': 3, 'count': 3, 'share': 1.0,
+                                                 'partial': 0})
+        self.assertEqual(report['cooccurring'][0], {'lines': ['a.c:f:1:1', 'a.c:f:2:1'], 'crashes': 2})
+        self.assertEqual(report['shrink-histogram'], [0, 0, 0, 0, 0, 1, 0, 0, 0, 2])
+
+    def test_replace_partial_crash(self):
+        hotspots = HotspotAggregator(self.path)
+        hotspots.add(self.stats('c1', ['a.c:f:1:1', 'a.c:f:2:1'], 50.0))
+        hotspots.close()
+
+        resumed = HotspotAggregator(self.path)
+        resumed.add(self.stats('c1', ['a.c:f:2:1', 'b.c:g:3:1'], 95.0))
+        resumed.close()
+
+        report = self.report()
+        self.assertEqual(report['crashes'], 1)
+        self.assertEqual([hotspot['line'] for hotspot in report['hotspots']], ['a.c:f:2:1', 'b.c:g:3:1'])
+        self.assertEqual(report['cooccurring'], [{'lines': ['a.c:f:2:1', 'b.c:g:3:1'], 'crashes': 1}])
+        self.assertEqual(report['shrink-histogram'], [0, 0, 0, 0, 0, 0, 0, 0, 0, 1])
+
+    def test_partial_crashes(self):
+        hotspots = HotspotAggregator(self.path)
+        hotspots.add(self.stats('c1', ['a.c:f:1:1', 'a.c:f:2:1'], 50.0))
+        partial = self.stats('c2', ['a.c:f:2:1'], 50.0)
+        partial.update({'partial': True, 'parents-analyzed': 1})
+        hotspots.add(partial)
+        hotspots.close()
+
+        report = self.report()
+        self.assertEqual(report['partial-crashes'], 1)
+        self.assertEqual([(hotspot['line'], hotspot['crashes'], hotspot['partial']) for hotspot in report['hotspots']],
+                         [('a.c:f:2:1', 2, 1), ('a.c:f:1:1', 1, 0)])
+
+        # Analyzed in full by a resumed run
+        resumed = HotspotAggregator(self.path)
+        resumed.add(self.stats('c2', ['a.c:f:2:1'], 50.0))
+        resumed.close()
+        report = self.report()
+        self.assertEqual(report['partial-crashes'], 0)
+        self.assertEqual(report['hotspots'][0]['partial'], 0)
+
+    def test_flaky_crashes(self):
+        hotspots = HotspotAggregator(self.path)
+        hotspots.add(self.stats('c1', ['a.c:f:1:1'], 50.0))
+        flaky = self.stats('c2', ['b.c:g:3:1'], 95.0)
+        flaky.update({'flaky': True, 'crash-rate': 0.5, 'coverage-stability': 1.0})
+        hotspots.add(flaky, 'bin-asan')
+        hotspots.close()
+
+        report = self.report()
+        self.assertEqual(report['crashes'], 1)
+        self.assertEqual([hotspot['line'] for hotspot in report['hotspots']], ['a.c:f:1:1'])
+        self.assertEqual(report['hotspots'][0]['share'], 1.0)
+        self.assertEqual(report['flaky-crashes'], ['bin-asan/c2'])
+        self.assertEqual(report['shrink-histogram'], [0, 0, 0, 0, 0, 1, 0, 0, 0, 0])
+
+        # Reproduced reliably on a later run, the crash counts
+        resumed = HotspotAggregator(self.path)
+        resumed.add(self.stats('c2', ['b.c:g:3:1'], 95.0), 'bin-asan')
+        resumed.close()
+        report = self.report()
+        self.assertEqual((report['crashes'], report['flaky-crashes']), (2, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+#
+#  File: aflsancov/tests/test_metrics.py
+#
+#  Purpose: Tests of the live metrics and their exporter
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import socket
+import unittest
+import tempfile
+from shutil import rmtree
+
+from aflsancov.budget import Budget
+from aflsancov.metrics import Metrics, MetricsExporter
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.stats_path = os.path.join(self.tmp, 'afl-sancov-stats')
+
+    def tearDown(self):
+        rmtree(self.tmp)
+
+    def test_snapshot(self):
+        budget = Budget()
+        stats = Metrics(budget)
+        stats.add_crashes(4)
+        stats.crash_done()
+        budget.charge(3)
+        with stats.stage('execute'):
+            pass
+        stats.cache('coverage', True)
+        stats.cache('coverage', False)
+        stats.cache('symbolizer', 3, 4)
+
+        snapshot = stats.snapshot()
+        self.assertEqual((snapshot['crashes_total'], snapshot['crashes_done'], snapshot['execs_done']), (4, 1, 3))
+        self.assertTrue(snapshot['eta_secs'] >= 0)
+        self.assertTrue('execute_mean_ms' in snapshot)
+        self.assertEqual((snapshot['coverage_cache_hit_rate'], snapshot['symbolizer_cache_hit_rate']), (0.5, 0.75))
+        self.assertTrue("\nafl_sancov_crashes_done 1\n" in stats.prometheus_text())
+
+    def test_queue_depths(self):
+        stats = Metrics(Budget())
+        depths = lambda: {'execute': 3, 'decode': 1}
+        stats.watch_queues(depths)
+        stats.watch_queues(depths)
+        snapshot = stats.snapshot()
+        self.assertEqual((snapshot['execute_queue_depth'], snapshot['decode_queue_depth']), (6, 2))
+        stats.unwatch_queues(depths)
+        stats.unwatch_queues(depths)
+        self.assertFalse('execute_queue_depth' in stats.snapshot())
+
+    def test_exporter(self):
+        stats = Metrics(Budget())
+        exporter = MetricsExporter(stats, self.stats_path, 0.01, self.stats_path + '.prom')
+        exporter.start()
+        stats.add_crashes(2)
+        exporter.close()
+        with open(self.stats_path) as f:
+            self.assertTrue('crashes_total   : 2\n' in f.read())
+        with open(self.stats_path + '.prom') as f:
+            self.assertTrue('afl_sancov_crashes_total 2\n' in f.read())
+
+    def test_port_in_use(self):
+        # A taken port leaves the files refreshed
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(1)
+        stats = Metrics(Budget())
+        exporter = MetricsExporter(stats, self.stats_path, 0.01, port=sock.getsockname()[1])
+        try:
+            self.assertRaises(socket.error, exporter.start)
+            stats.add_crashes(2)
+            exporter.close()
+        finally:
+            sock.close()
+        with open(self.stats_path) as f:
+            self.assertTrue('crashes_total   : 2\n' in f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+#
+#  File: aflsancov/tests/test_pipeline.py
+#
+#  Purpose: Tests of the staged pipeline
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import time
+import unittest
+
+from aflsancov.pipeline import StagedPipeline
+
+
+class TestStagedPipeline(unittest.TestCase):
+
+    def test_results_in_input_order(self):
+        def slow_odd(item):
+            if item % 2:
+                time.sleep(0.01)
+            return item * 10
+
+        out = []
+        pipeline = StagedPipeline([('execute', slow_odd, 4), ('diff', lambda item: item + 1, 2)],
+                                  lambda item, error: out.append((item, error)), queue_size=2)
+        pipeline.run(range(20))
+        self.assertEqual(out, [(i * 10 + 1, None) for i in range(20)])
+
+    def test_depths(self):
+        depths = []
+
+        def sink(item, error):
+            depths.append(pipeline.depths())
+
+        pipeline = StagedPipeline([('execute', lambda item: item, 1), ('diff', lambda item: item, 1)], sink)
+        self.assertEqual(pipeline.depths(), {})
+        pipeline.run(range(5))
+        self.assertEqual(list(depths[0].keys()), ['execute', 'diff', 'sink'])
+        self.assertTrue(all(0 <= depth <= 8 for item in depths for depth in item.values()))
+
+    def test_failed_item_skips_later_stages(self):
+        def fail_on_three(item):
+            if item == 3:
+                raise ValueError('boom')
+            return item
+
+        out = []
+        pipeline = StagedPipeline([('decode', fail_on_three, 2), ('symbolize', lambda item: item * 2, 1)],
+                                  lambda item, error: out.append((item, error)))
+        pipeline.run(range(5))
+        self.assertEqual([item for (item, error) in out if not error], [0, 2, 4, 8])
+        self.assertEqual(out[3], (3, 'decode stage: boom'))
+
+    def test_failing_sink(self):
+        def sink(item, error):
+            if item == 2:
+                raise IOError('disk full')
+            out.append(item)
+
+        # More items than fit in flight, the feeder must not block on them
+        out = []
+        pipeline = StagedPipeline([('execute', lambda item: item, 2), ('diff', lambda item: item, 1)], sink,
+                                  queue_size=1)
+        self.assertRaises(IOError, pipeline.run, range(50))
+        self.assertEqual(out, [0, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+#
+#  File: aflsancov/tests/test_queuecov.py
+#
+#  Purpose: Tests of the streaming queue coverage
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import unittest
+import tempfile
+from shutil import rmtree
+
+from aflsancov.queuecov import QueueCoverage, cycle_lookup
+
+
+class TestQueueCoverage(unittest.TestCase):
+
+    frames = {1: [('a.c', 'main', '3', '1')], 2: [('a.c', 'main', '4', '1'), ('a.c', 'f', '9', '2')],
+              3: [('a.c', 'main', '4', '7')], 4: [('b.c', 'g', '1', '1')]}
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.tmp, 'queue-cov-state.json')
+        self.delta_path = os.path.join(self.tmp, 'id-delta-cov')
+
+    def tearDown(self):
+        rmtree(self.tmp)
+
+    def symbolize(self, pcs):
+        return set(frame for pc in pcs for frame in self.frames[pc])
+
+    def test_delta_and_resume(self):
+        with open(self.delta_path, 'w') as f:
+            f.write("# header\n")
+        qcov = QueueCoverage(self.state_path, self.delta_path)
+        qcov.open()
+        self.assertTrue(qcov.first_seen('digest-a'))
+        self.assertEqual(qcov.add('S0', 'queue/id:000000,orig:a', 0, [1, 2], self.symbolize), 3)
+        self.assertEqual(qcov.add('S0', 'queue/id:000001,src:000000', 1, [1, 2, 3], self.symbolize), 0)
+        qcov.save()
+        ### Written after the checkpoint, dropped on resume
+        qcov.add('S1', 'queue/id:000000,orig:b', 1, [4], self.symbolize)
+        qcov.delta.close()
+
+        resumed = QueueCoverage(self.state_path, self.delta_path)
+        resumed.load()
+        self.assertTrue(resumed.done('S0', 1))
+        self.assertFalse(resumed.done('S1', 0))
+        ### sync: copies of inputs done before the resume stay deduplicated
+        self.assertFalse(resumed.first_seen('digest-a'))
+        resumed.open()
+        self.assertEqual(resumed.add('S1', 'queue/id:000000,orig:b', 1, [4], self.symbolize), 1)
+        resumed.close()
+
+        with open(self.delta_path) as f:
+            delta = f.read().splitlines()
+        self.assertEqual(delta, ['# header',
+                                 'id:000000,orig:a, 0, a.c, function, f',
+                                 'id:000000,orig:a, 0, a.c, line, 9',
+                                 'id:000000,orig:a, 0, a.c, function, main',
+                                 'id:000000,orig:a, 0, a.c, line, 3',
+                                 'id:000000,orig:a, 0, a.c, line, 4',
+                                 'id:000000,orig:b, 1, b.c, function, g',
+                                 'id:000000,orig:b, 1, b.c, line, 1'])
+
+    def test_cycle_lookup(self):
+        plot_data = os.path.join(self.tmp, 'plot_data')
+        with open(plot_data, 'w') as f:
+            f.write("# unix_time, cycles_done, cur_path, paths_total\n"
+                    "1461609340, 0, 0, 1\n"
+                    "1461609345, 3, 1, 4\n")
+        cycle = cycle_lookup(plot_data)
+        self.assertEqual((cycle(0), cycle(1461609340), cycle(1461609346)), (0, 0, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,288 @@
+#
+#  File: aflsancov/tests/test_reporter.py
+#
+#  Purpose: Tests of target execution in the reporter, with shell commands standing in for the target
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import json
+import unittest
+import tempfile
+import threading
+from shutil import rmtree
+
+from aflsancov import repro
+from aflsancov.covstore import CoverageStore, FunctionTable
+from aflsancov.reporter import AFLSancovReporter
+from aflsancov.results import SancovStash
+
+
+class TestInputModes(unittest.TestCase):
+
+    commands = {'file': "cat 'AFL_FILE' > {out}", 'stdin': 'cat > {out}', 'tmpfs': 'cat AFL_FILE > {out}',
+                'argv': 'cp AFL_FILE {out}'}
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.input_fname = os.path.join(self.scratch, 'id:000000,src:000001 $(touch pwned)')
+        with open(self.input_fname, 'w') as f:
+            f.write('pwn')
+
+    def tearDown(self):
+        rmtree(self.scratch)
+
+    def reporter(self, mode, cmd):
+        reporter = AFLSancovReporter(['--input-mode', mode, '-e', cmd, '--bin-path', './test-sancov'])
+        reporter.cov_paths['scratch_dir'] = self.scratch
+        reporter.setup_parsing()
+        return reporter
+
+    def test_delivery(self):
+        out = os.path.join(self.scratch, 'out')
+        for mode, cmd in self.commands.items():
+            reporter = self.reporter(mode, cmd.format(out=out))
+            self.assertEqual(reporter.collector.run_target(self.input_fname), 0)
+            with open(out) as f:
+                self.assertEqual(f.read(), 'pwn', 'Input not delivered in {} mode'.format(mode))
+            os.remove(out)
+        self.assertFalse(os.path.exists(os.path.join(self.scratch, 'pwned')))
+
+    def test_file_mode_verbatim(self):
+        # Commands written for the legacy substitution quote AFL_FILE themselves
+        input_fname = os.path.join(self.scratch, 'id:000002,src:000001 copy')
+        with open(input_fname, 'w') as f:
+            f.write('pwn')
+        out = os.path.join(self.scratch, 'out')
+        for cmd in ["cat 'AFL_FILE' > {out}", 'cat "AFL_FILE" > {out}']:
+            reporter = self.reporter('file', cmd.format(out=out))
+            self.assertEqual(reporter.collector.run_target(input_fname), 0)
+            with open(out) as f:
+                self.assertEqual(f.read(), 'pwn', 'Input not delivered with {}'.format(cmd))
+            os.remove(out)
+
+    def test_argv_validation(self):
+        def validates(cmd):
+            reporter = AFLSancovReporter(['--input-mode', 'argv', '-e', cmd, '-d', self.scratch,
+                                          '--crash-dir', self.scratch, '--bin-path', '/bin/true',
+                                          '--sancov-path', '/bin/true', '--pysancov-path', '/bin/true',
+                                          '--llvm-sym-path', '/bin/true'])
+            return reporter.validate_args()
+        self.assertTrue(validates("./test-sancov -i 'AFL_FILE'"))
+        self.assertFalse(validates("./test-sancov -i 'AFL_FILE"))
+
+    def test_inputs_read_once(self):
+        reporter = self.reporter('stdin', 'cat > /dev/null')
+        reporter.corpus.add(self.input_fname)
+        os.remove(self.input_fname)
+        self.assertEqual(reporter.corpus.read(self.input_fname), 'pwn')
+        self.assertEqual(reporter.collector.run_target(self.input_fname), 0)
+
+    def test_crash_verdict(self):
+        for mode, cmd in [('stdin', 'kill -SEGV $$'), ('argv', "bash -c 'kill -SEGV $$'"), ('file', 'true')]:
+            crashes = mode != 'file'
+            self.assertEqual(self.reporter(mode, cmd).does_dry_run_throw_error(self.input_fname), crashes)
+
+
+class TestDeltaDiff(unittest.TestCase):
+
+    ### Shell stand-ins for the target and the sancov tools: input files
+    ### hold the PCs they cover, PC 0x3 crashes
+    tools = {'sancov': 'cat "$4"',
+             'pysancov': 'if [ "$1" = print ]; then cat "$2"; else cat > /dev/null; echo 0x4; fi',
+             'llvm-symbolizer': "while read pc; do printf 'f%s\\n/src/a.c:%d:1\\n\\n' $pc $pc; done",
+             'test-sancov': 'true'}
+
+    coverage_cmd = 'cat AFL_FILE > ${UBSAN_OPTIONS##*coverage_dir=}/test-sancov.$$.sancov; ' \
+                   'grep -q 0x3 AFL_FILE && kill -SEGV $$; true'
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        for name, script in self.tools.items():
+            path = os.path.join(self.tmp, name)
+            with open(path, 'w') as f:
+                f.write('#!/bin/sh\n' + script + '\n')
+            os.chmod(path, 0755)
+        self.afl_dir = os.path.join(self.tmp, 'afl-out')
+        self.crash_dir = os.path.join(self.tmp, 'unique')
+        os.makedirs(self.afl_dir + '/S0/queue')
+        os.mkdir(self.crash_dir)
+        with open(self.afl_dir + '/S0/queue/id:000000,orig:seed', 'w') as f:
+            f.write('0x1\n0x2\n')
+        with open(self.crash_dir + '/S0:id:000000,sig:11,src:000000', 'w') as f:
+            f.write('0x1\n0x2\n0x3\n')
+
+    def tearDown(self):
+        rmtree(self.tmp)
+
+    def reporter(self, *options):
+        return AFLSancovReporter(['-q', '-d', self.afl_dir, '--crash-dir', self.crash_dir, '-e', self.coverage_cmd,
+                                  '--bin-path', os.path.join(self.tmp, 'test-sancov'),
+                                  '--sancov-path', os.path.join(self.tmp, 'sancov'),
+                                  '--pysancov-path', os.path.join(self.tmp, 'pysancov'),
+                                  '--llvm-sym-path', os.path.join(self.tmp, 'llvm-symbolizer')] + list(options))
+
+    def check_result(self):
+        with open(self.afl_dir + '/sancov/delta-diff/S0:id:000000,sig:11,src:000000.json') as f:
+            result = json.load(f)
+        self.assertEqual(result['parent-input'], 'id:000000,orig:seed')
+        self.assertEqual(result['diff-node-spec'], [{'count': 1, 'line': '/src/a.c:f0x3:3:1'}])
+
+    def test_process_crash(self):
+        # The default mode, one target run and sancov decode per input
+        self.assertEqual(self.reporter().run(), 0)
+        self.check_result()
+
+    def test_coordinator_continue(self):
+        leases = os.path.join(self.tmp, 'leases')
+        options = ['--coordinate', leases, '--local-workers', '1', '--poll-interval', '0.1', '--exec-budget', '100']
+        self.assertEqual(self.reporter(*options).run(), 0)
+        self.check_result()
+
+        # A continued run keeps the coverage cache and publishes no finished crash
+        self.assertEqual(self.reporter(*(options + ['--continue'])).run(), 0)
+        self.assertEqual(os.listdir(os.path.join(leases, 'done')), [])
+        with open(self.afl_dir + '/sancov/budget-state.json') as f:
+            self.assertEqual(json.load(f)['complete'], ['S0:id:000000,sig:11,src:000000'])
+
+    def test_build_distributed(self):
+        reporter = self.reporter('--worker', os.path.join(self.tmp, 'leases'),
+                                 '--build', os.path.join(self.tmp, 'test-sancov'), self.coverage_cmd, 'asan')
+        self.assertFalse(reporter.validate_args())
+
+
+class TestReproducibility(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.crash_fname = os.path.join(self.scratch, 'id:000000,sig:11,src:000001')
+        with open(self.crash_fname, 'w') as f:
+            f.write('pwn')
+        # Verdicts are cached by the binary's content
+        self.bin_path = os.path.join(self.scratch, 'test-sancov')
+        with open(self.bin_path, 'w') as f:
+            f.write('binary')
+
+    def tearDown(self):
+        rmtree(self.scratch)
+
+    def reporter(self, cmd):
+        reporter = AFLSancovReporter(['--repro-runs', '4', '--input-mode', 'stdin', '-e', cmd,
+                                      '--bin-path', self.bin_path, '--cache-dir', self.scratch])
+        reporter.args.jobs = 2
+        reporter.rerun_slots = threading.BoundedSemaphore(reporter.args.jobs)
+        reporter.cov_paths['scratch_dir'] = self.scratch
+        reporter.cov_paths['log_file'] = os.devnull
+        reporter.setup_parsing()
+        return reporter
+
+    def test_verdict(self):
+        verdict = repro.repro_verdict([-11, 0, 134, 1], [[1, 2, 3], [1, 2], None, [1, 2, 4]])
+        self.assertEqual(verdict, {'runs': 4, 'crashes': 2, 'crash-rate': 0.5, 'coverage-stability': 0.5})
+        self.assertTrue(repro.flaky(verdict))
+        self.assertFalse(repro.flaky(repro.repro_verdict([-6, -6], [None, None])))
+
+    def test_cached_verdicts(self):
+        reporter = self.reporter('kill -SEGV $$')
+        self.assertTrue(reporter.dry_run_crash(self.crash_fname))
+        self.assertEqual(reporter.crash_repro[os.path.basename(self.crash_fname)]['crash-rate'], 1.0)
+
+        # A later run of the same build takes the verdict from the cache
+        reporter = self.reporter('true')
+        verdict = reporter.reproduce(self.crash_fname)
+        self.assertEqual((verdict['runs'], verdict['crashes']), (4, 4))
+
+        # More runs than cached verify again
+        reporter.args.repro_runs = 5
+        self.assertEqual(reporter.reproduce(self.crash_fname)['crashes'], 0)
+
+    def test_coverage_run_crashes(self):
+        # A flaky crash is run for coverage until it crashes
+        marker = os.path.join(self.scratch, 'ran')
+        reporter = self.reporter('test -f {} && kill -SEGV $$; touch {}'.format(marker, marker))
+        reporter.crash_coverage(self.crash_fname, self.scratch)
+        self.assertEqual(reporter.budget.used, 2)
+
+        reporter = self.reporter('true')
+        self.assertEqual(reporter.crash_coverage(self.crash_fname, self.scratch), None)
+        self.assertEqual(reporter.budget.used, 4)
+
+    def test_same_basename_runs(self):
+        # Queue files of two sessions share a basename, the stash must not
+        # remove the second run's sancov file
+        reporter = self.reporter('cat > {}/test-sancov.$$.sancov'.format(self.scratch))
+        reporter.stash = SancovStash()
+        sancov_files = []
+        for session in ['a', 'b']:
+            os.mkdir(os.path.join(self.scratch, session))
+            qfile = os.path.join(self.scratch, session, 'id:000000,orig:seed')
+            with open(qfile, 'w') as f:
+                f.write(session)
+            sancov_files.append(reporter.collector.execute_for_coverage(qfile, self.scratch))
+            with open(sancov_files[-1]) as f:
+                self.assertEqual(f.read(), session)
+            reporter.stash_sancov(sancov_files[-1])
+        self.assertNotEqual(sancov_files[0], sancov_files[1])
+        self.assertEqual(reporter.stash.close(), [])
+
+
+class TestCoverageStore(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch = tempfile.mkdtemp()
+        self.inputs = []
+        for name in ['id:000000,orig:seed', 'id:000001,src:000000']:
+            self.inputs.append(os.path.join(self.scratch, name))
+            with open(self.inputs[-1], 'w') as f:
+                f.write(name)
+
+    def tearDown(self):
+        rmtree(self.scratch)
+
+    def test_unstored_logged(self):
+        reporter = AFLSancovReporter(['-q', '--bin-path', './test-sancov'])
+        reporter.cov_paths['log_file'] = os.path.join(self.scratch, 'log')
+        reporter.setup_parsing()
+        table = FunctionTable('build', [(0x1000, 0x10, 'main', 'fingerprint')])
+        reporter.coverage_store = CoverageStore(os.path.join(self.scratch, 'store'), table, lambda build_id: None)
+
+        reporter.store_pcs(self.inputs[0], [0x1004])
+        self.assertEqual(reporter.stored_pcs(self.inputs[0]), [0x1004])
+        self.assertFalse(os.path.exists(reporter.cov_paths['log_file']))
+
+        # A PC outside every function leaves the input to be executed again
+        reporter.store_pcs(self.inputs[1], [0x1004, 0x2000])
+        self.assertEqual(reporter.stored_pcs(self.inputs[1]), None)
+        with open(reporter.cov_paths['log_file']) as f:
+            self.assertTrue('Coverage of id:000001,src:000000 not stored' in f.read())
+
+
+class TestLocalWorkers(unittest.TestCase):
+
+    def test_worker_argv(self):
+        reporter = AFLSancovReporter(['-d', 'afl-out', '-e', 'cat AFL_FILE | ./test-sancov', '--coordinate', 'leases',
+                                      '--local-workers', '2', '--metrics-port=9100', '--metrics-textfile', 'm.prom',
+                                      '--time-budget', '60', '--bin-path', './test-sancov'])
+        self.assertEqual(reporter.worker_argv(),
+                         ['-d', 'afl-out', '-e', 'cat AFL_FILE | ./test-sancov', '--time-budget', '60',
+                          '--bin-path', './test-sancov', '--worker', 'leases'])
+
+
+if __name__ == "__main__":
+    unittest.main()
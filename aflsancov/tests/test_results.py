@@ -0,0 +1,192 @@
+#
+#  File: aflsancov/tests/test_results.py
+#
+#  Purpose: Tests of the sancov stash and the consolidated results store
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import json
+import sqlite3
+import tarfile
+import unittest
+import tempfile
+from shutil import rmtree
+
+from aflsancov.results import ResultsStore, SancovStash
+
+
+class TestSancovStash(unittest.TestCase):
+
+    def setUp(self):
+        self.stash_dir = tempfile.mkdtemp()
+        self.files = []
+        for name in ['a.sancov', 'b.sancov']:
+            fname = self.stash_dir + '/' + name
+            with open(fname, 'w') as f:
+                f.write(name)
+            self.files.append(fname)
+
+    def tearDown(self):
+        rmtree(self.stash_dir)
+
+    def test_archive(self):
+        archive = self.stash_dir + '/sancov-files.tar.gz'
+        stash = SancovStash(archive)
+        for fname in self.files:
+            stash.add(fname)
+        self.assertEqual(stash.close(), [])
+        self.assertEqual(os.listdir(self.stash_dir), ['sancov-files.tar.gz'])
+        tar = tarfile.open(archive)
+        self.assertEqual(sorted(tar.getnames()), ['a.sancov', 'b.sancov'])
+        self.assertEqual(tar.extractfile('b.sancov').read(), 'b.sancov')
+        tar.close()
+
+    def test_resumed_archive(self):
+        archive = self.stash_dir + '/sancov-files.tar.gz'
+        stash = SancovStash(archive)
+        stash.add(self.files[0])
+        stash.close()
+        stash = SancovStash(archive, resume=True)
+        stash.add(self.files[1])
+        self.assertEqual(stash.close(), [])
+        tar = tarfile.open(archive)
+        self.assertEqual(sorted(tar.getnames()), ['a.sancov', 'b.sancov'])
+        self.assertEqual(tar.extractfile('a.sancov').read(), 'a.sancov')
+        tar.close()
+
+    def test_discard(self):
+        stash = SancovStash()
+        for fname in self.files + [self.stash_dir + '/missing.sancov']:
+            stash.add(fname)
+        self.assertEqual(len(stash.close()), 1)
+        self.assertEqual(os.listdir(self.stash_dir), [])
+
+
+class TestResultsStore(unittest.TestCase):
+
+    stats = [{'crashing-input': 'id:000000,sig:06', 'parent-input': 'id:000003', 'slice-linecount': 4,
+              'dice-linecount': 2, 'shrink-percent': 50.0,
+              'diff-node-spec': [{'line': '/src/a.cc:ns::f:10:3', 'count': 2},
+                                 {'line': '/src/a.cc:main:25:1', 'count': 1}]},
+             {'crashing-input': 'id:000001,sig:11', 'slice-linecount': 4,
+              'dice-linecount': 2, 'shrink-percent': 50.0,
+              'diff-node-spec': [{'line': '/src/a.cc:main:25:1', 'count': 1},
+                                 {'line': '/src/a.cc:ns::f:10:3', 'count': 1}]}]
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.jsonl = os.path.join(self.tmp, 'results.jsonl')
+        self.db = os.path.join(self.tmp, 'results.db')
+
+    def tearDown(self):
+        rmtree(self.tmp)
+
+    def fill(self, path, stats=None, resume=False):
+        store = ResultsStore(path, resume)
+        for crash in stats or self.stats:
+            store.add(crash, 'bin-asan')
+        store.close()
+
+    def deeper(self):
+        ### The first crash analyzed again with another dice
+        stats = dict(self.stats[0])
+        stats['diff-node-spec'] = [{'line': '/src/b.cc:g:7:1', 'count': 1}]
+        return stats
+
+    def marked(self):
+        ### A flaky crash cut short by the budget, diffed on hit counts
+        stats = dict(self.stats[1], granularity='line', partial=True, flaky=True)
+        stats.update({'parents-analyzed': 1, 'crash-rate': 0.5, 'coverage-stability': 0.75,
+                      'diff-node-spec': [{'line': '/src/a.cc:main:25:1', 'count': 1, 'hits': 9, 'hit-delta': 7}]})
+        return stats
+
+    def test_jsonl(self):
+        self.fill(self.jsonl)
+        with open(self.jsonl) as f:
+            lines = f.readlines()
+        self.assertEqual([json.loads(line)['string'] for line in lines[:3]],
+                         [[0, '/src/a.cc'], [1, 'ns::f'], [2, 'main']])
+        index = json.loads(lines[-1])['index']
+        self.assertEqual(index['line'], {'0:10': [0, 1], '0:25': [0, 1]})
+        self.assertEqual(len(index['cluster']), 1, 'Same dice lines must share a cluster')
+        with open(self.jsonl) as f:
+            f.seek(index['crash']['id:000001,sig:11'][0])
+            crash = json.loads(f.readline())
+        self.assertEqual(crash['nodes'], [[0, 2, 25, 1, 1], [0, 1, 10, 3, 1]])
+        self.assertFalse('parent' in crash)
+
+    def test_jsonl_resume(self):
+        self.fill(self.jsonl, self.stats[:1])
+        self.fill(self.jsonl, self.stats[1:] + [self.deeper()], resume=True)
+        with open(self.jsonl) as f:
+            lines = f.readlines()
+        self.assertEqual(sum(1 for line in lines if 'index' in json.loads(line)), 1)
+        index = json.loads(lines[-1])['index']
+        self.assertEqual(index['line'], {'0:10': [1], '0:25': [1], '3:7': [2]})
+        self.assertEqual(len(index['crash']['id:000000,sig:06']), 1)
+        with open(self.jsonl) as f:
+            f.seek(index['crash']['id:000000,sig:06'][0])
+            self.assertEqual(json.loads(f.readline())['crash'], 2)
+
+    def test_jsonl_markers(self):
+        self.fill(self.jsonl, [self.stats[0], self.marked()])
+        with open(self.jsonl) as f:
+            records = [json.loads(line) for line in f]
+        crashes = dict((record['name'], record) for record in records if 'crash' in record)
+        marked = crashes['id:000001,sig:11']
+        self.assertEqual([marked[key] for key in ResultsStore.Markers], ['line', True, 1, True, 0.5, 0.75])
+        self.assertEqual(marked['nodes'], [[0, 2, 25, 1, 1, 9, 7]])
+        self.assertFalse(any(key in crashes['id:000000,sig:06'] for key in ResultsStore.Markers))
+
+    def test_sqlite(self):
+        self.fill(self.db)
+        db = sqlite3.connect(self.db)
+        rows = db.execute("SELECT crashes.name, nodes.count FROM nodes "
+                          "JOIN crashes ON crashes.id = nodes.crash "
+                          "JOIN strings ON strings.id = nodes.function "
+                          "WHERE strings.value = 'ns::f' ORDER BY crashes.id").fetchall()
+        self.assertEqual(rows, [('id:000000,sig:06', 2), ('id:000001,sig:11', 1)])
+        db.close()
+
+    def test_sqlite_resume(self):
+        self.fill(self.db, self.stats[:1])
+        self.fill(self.db, self.stats[1:] + [self.deeper()], resume=True)
+        db = sqlite3.connect(self.db)
+        rows = db.execute("SELECT crashes.id, crashes.name, strings.value FROM nodes "
+                          "JOIN crashes ON crashes.id = nodes.crash "
+                          "JOIN strings ON strings.id = nodes.function ORDER BY crashes.id").fetchall()
+        self.assertEqual(rows, [(1, 'id:000001,sig:11', 'main'), (1, 'id:000001,sig:11', 'ns::f'),
+                                (2, 'id:000000,sig:06', 'g')])
+        db.close()
+
+    def test_sqlite_markers(self):
+        self.fill(self.db, [self.stats[0], self.marked()])
+        db = sqlite3.connect(self.db)
+        rows = db.execute("SELECT name, granularity, partial, parents_analyzed, flaky, crash_rate, "
+                          "coverage_stability FROM crashes ORDER BY id").fetchall()
+        self.assertEqual(rows, [('id:000000,sig:06', None, None, None, None, None, None),
+                                ('id:000001,sig:11', 'line', 1, 1, 1, 0.5, 0.75)])
+        rows = db.execute("SELECT crash, count, hits, hit_delta FROM nodes ORDER BY crash, line").fetchall()
+        self.assertEqual(rows, [(0, 2, None, None), (0, 1, None, None), (1, 1, 9, 7)])
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
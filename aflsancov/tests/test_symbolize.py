@@ -0,0 +1,69 @@
+#
+#  File: aflsancov/tests/test_symbolize.py
+#
+#  Purpose: Tests of the instrumentation point table
+#
+#  License (GNU General Public License):
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software
+#  Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02111-1301,
+#  USA
+#
+
+import os
+import unittest
+import tempfile
+from shutil import rmtree
+
+from aflsancov.symbolize import elf_build_id, PCTable
+
+
+class TestPCTable(unittest.TestCase):
+
+    src = '/src/afl-sancov/tests/test-sancov.c'
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.tmp)
+
+    def build_table(self):
+        table = PCTable('deadbeef')
+        table.add(0x10, [(self.src, 'main', '15', '2')])
+        table.add(0x20, [(self.src, 'main', '25', '3')])
+        table.add(0x30, [(self.src, 'bug', '7', '2'), (self.src, 'main', '25', '3')])
+        return table
+
+    def test_lookup_and_complement(self):
+        table = self.build_table()
+        self.assertEqual(table.lookup([0x10, 0x40]), {(self.src, 'main', '15', '2')})
+        self.assertEqual(table.zero({0x10}), {(self.src, 'main', '25', '3'), (self.src, 'bug', '7', '2')})
+        self.assertEqual(table.missing([0x10, 0x40]), [0x40])
+        self.assertEqual(table.files, [self.src], 'File names should be interned')
+
+    def test_save_load(self):
+        table = self.build_table()
+        path = os.path.join(self.tmp, 'pc-table.json')
+        table.save(path)
+        loaded = PCTable.load(path)
+        self.assertEqual(loaded.build_id, 'deadbeef')
+        self.assertEqual(loaded.lookup([0x10, 0x20, 0x30]), table.lookup([0x10, 0x20, 0x30]))
+
+    def test_build_id_of_non_elf(self):
+        self.assertEqual(elf_build_id(__file__), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
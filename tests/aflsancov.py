@@ -1 +0,0 @@
-../afl-sancov.py
\ No newline at end of file
@@ -24,9 +24,13 @@
 #
 
 from aflsancov import *
+from aflsancov import CorpusIndex, CoverageStore, DwarfSymbolizer, FunctionTable, ShowmapPrefilter
 import unittest
 import os
+from shutil import rmtree
 import json
+from aflsancov import prefilter
+import re
 try:
     import subprocess32 as subprocess
 except ImportError:
@@ -274,5 +278,234 @@ class TestAflSanCov(unittest.TestCase):
         # Checks incorrect llvm-sym path
         self.assertTrue(reporter.run())
 
+    def test_ddnum_ubsan_pipeline(self):
+        args = ['-d', './afl-out', '-e', 'cat AFL_FILE | ./test-sancov-ubsan',
+                '--bin-path={}/test-sancov-ubsan'.format(os.getcwd()),
+                '--sancov-path=/usr/bin/sancov-3.8', '--llvm-sym-path=/usr/bin/llvm-symbolizer-3.8',
+                '--pysancov-path=/usr/local/bin/pysancov', '--overwrite', '--dd-num=3',
+                '--crash-dir={}/unique'.format(os.getcwd()), '--pipeline=execute=2,symbolize=2']
+        reporter = AFLSancovReporter(args)
+        self.assertFalse(reporter.run())
+        self.assertTrue(self.compare_json(self.dd_file1, self.expects_ddnum_ubsan_file1),
+                        "Delta-diff file {} does not match".format(self.dd_filename1))
+        self.assertTrue(self.compare_json(self.dd_file2, self.expects_ddnum_ubsan_file2),
+                        "Delta-diff file {} does not match".format(self.dd_filename2))
+
+    def test_validate_build(self):
+        args = ['-d', './afl-out', '-e', 'cat AFL_FILE | ./test-sancov-ubsan',
+                '--bin-path={}/test-sancov-ubsan'.format(os.getcwd()),
+                '--sancov-path=/usr/bin/sancov-3.8', '--llvm-sym-path=/usr/bin/llvm-symbolizer-3.8',
+                '--pysancov-path=/usr/local/bin/pysancov', '--crash-dir={}/unique'.format(os.getcwd()),
+                '--overwrite', '--build', '{}/test-sancov-asan'.format(os.getcwd()),
+                'cat FILE | ./test-sancov-asan', 'asan']
+        reporter = AFLSancovReporter(args)
+        # Checks incorrect build cov cmd
+        self.assertTrue(reporter.run())
+        args[-2] = 'cat AFL_FILE | ./test-sancov-asan'
+        args[-1] = 'msan'
+        reporter = AFLSancovReporter(args)
+        # Checks unsupported build sanitizer
+        self.assertTrue(reporter.run())
+
+    def test_ddmode_fanout(self):
+        args = ['-d', './afl-out', '-e', 'cat AFL_FILE | ./test-sancov-ubsan',
+                '--bin-path={}/test-sancov-ubsan'.format(os.getcwd()),
+                '--sancov-path=/usr/bin/sancov-3.8', '--llvm-sym-path=/usr/bin/llvm-symbolizer-3.8',
+                '--pysancov-path=/usr/local/bin/pysancov', '--crash-dir={}/unique'.format(os.getcwd()),
+                '--overwrite', '--build', '{}/test-sancov-asan'.format(os.getcwd()),
+                'cat AFL_FILE | ./test-sancov-asan', 'asan']
+        reporter = AFLSancovReporter(args)
+        self.assertFalse(reporter.run())
+        asan_dd_dir = self.sancov_dir + '/builds/test-sancov-asan-asan/delta-diff'
+        self.assertTrue(self.compare_json(self.dd_file1, self.expects_ddmode_ubsan_file1),
+                        "Delta-diff file {} does not match".format(self.dd_filename1))
+        self.assertTrue(self.compare_json(asan_dd_dir + self.dd_filename1, self.expects_ddmode_asan_file1),
+                        "Delta-diff file {} does not match for asan build".format(self.dd_filename1))
+        self.assertTrue(self.compare_json(asan_dd_dir + self.dd_filename2, self.expects_ddmode_asan_file2),
+                        "Delta-diff file {} does not match for asan build".format(self.dd_filename2))
+
+    def test_ddmode_coordinator_local_workers(self):
+        lease_dir = self.top_out_dir + '/lease'
+        args = ['-d', './afl-out', '-e', 'cat AFL_FILE | ./test-sancov-ubsan',
+                '--bin-path={}/test-sancov-ubsan'.format(os.getcwd()),
+                '--sancov-path=/usr/bin/sancov-3.8', '--llvm-sym-path=/usr/bin/llvm-symbolizer-3.8',
+                '--pysancov-path=/usr/local/bin/pysancov', '--crash-dir={}/unique'.format(os.getcwd()),
+                '--overwrite', '--coordinate', lease_dir, '--local-workers=2', '--poll-interval=0.2']
+        reporter = AFLSancovReporter(args)
+        self.assertFalse(reporter.run())
+        self.assertTrue(self.compare_json(self.dd_file1, self.expects_ddmode_ubsan_file1),
+                        "Delta-diff file {} does not match".format(self.dd_filename1))
+        self.assertTrue(self.compare_json(self.dd_file2, self.expects_ddmode_ubsan_file2),
+                        "Delta-diff file {} does not match".format(self.dd_filename2))
+        self.assertTrue(os.listdir(self.sancov_dir + '/cov-cache'), "No coverage cache merged from workers")
+        rmtree(lease_dir)
+
+    def test_api_session(self):
+        with Session('{}/test-sancov-ubsan'.format(os.getcwd()), 'cat AFL_FILE | ./test-sancov-ubsan',
+                     sanitizer='ubsan', sancov_path='/usr/bin/sancov-3.8',
+                     llvm_sym_path='/usr/bin/llvm-symbolizer-3.8',
+                     pysancov_path='/usr/local/bin/pysancov') as session:
+            crash = session.coverage('./unique' + self.dd_filename1[:-len('.json')])
+            parent = session.coverage('./afl-out/SESSION000/queue/id:000003,src:000001,op:havoc,rep:4,+cov')
+            result = session.dice(crash, parent)
+
+        with open(self.expects_ddmode_ubsan_file1) as f:
+            expected = json.load(f)
+        for key in ['crashing-input', 'parent-input', 'dice-linecount', 'slice-linecount']:
+            self.assertEqual(result[key], expected[key], '{} did not match'.format(key))
+        self.assertTrue(self.expected_line_substring in result["diff-node-spec"][0]["line"],
+                        'Dice line did not match')
+
+    def test_api_session_without_coverage(self):
+        with Session('./test-sancov-ubsan', 'cat AFL_FILE | ./test-sancov-ubsan') as session:
+            self.assertTrue(session.reporter.cov_paths['tmp_out'].startswith(session.scratch))
+            crash = Coverage('crash', set([('/src/a.c', 'main', '25', '3')]))
+            parent = Coverage('parent', set([('/src/a.c', 'main', '20', '7')]))
+            self.assertRaises(ValueError, session.dice, None, parent)
+            self.assertRaises(ValueError, session.dice, crash, None)
+            self.assertRaises(ValueError, session.dice, crash, [parent, None])
+            self.assertEqual(session.dice(crash, parent)['dice-linecount'], 1)
+
+class TestCorpusIndex(unittest.TestCase):
+
+    queue0 = './afl-out/SESSION000/queue'
+    queue1 = './afl-out/SESSION001/queue'
+
+    def test_sync_import_is_deduplicated(self):
+        index = CorpusIndex()
+        for qdir in [self.queue0, self.queue1]:
+            for qfile in AFLSancovReporter.import_test_cases(qdir):
+                index.add(qfile)
+
+        synced = self.queue1 + '/id:000003,sync:SESSION000,src:000003,+cov'
+        origin = self.queue0 + '/id:000003,src:000001,op:havoc,rep:4,+cov'
+        self.assertTrue(index.identical(synced, origin), 'Synced input not identified as duplicate')
+        self.assertEqual(index.canonical(synced), os.path.abspath(origin),
+                         'Canonical path should be the first indexed session')
+        # Both orig:hello seeds and the sync'ed input collapse
+        self.assertEqual(len(index.path_to_digest), 8)
+        self.assertEqual(len(index.unique_paths()), 6)
+
+class TestDwarfSymbolizer(unittest.TestCase):
+
+    binaries = {'./test-sancov-dwarf4': ['-O0', '-gdwarf-4'], './test-sancov-dwarf5': ['-O2', '-gdwarf-5']}
+
+    def setUp(self):
+        for binary, flags in self.binaries.items():
+            subprocess.check_call(['gcc', '-g'] + flags + ['test-sancov.c', '-o', binary])
+
+    def tearDown(self):
+        for binary in self.binaries:
+            if os.path.exists(binary):
+                os.remove(binary)
+
+    def llvm_symbolize(self, binary, pcs):
+        proc = subprocess.Popen(['llvm-symbolizer', '--obj=' + binary], stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE)
+        out, _ = proc.communicate(''.join('0x%x\n' % pc for pc in pcs))
+        return [[(fp, func, ln, col) for (func, fp, ln, col) in re.findall(AFLSancovReporter.line_cov_regex, block)]
+                for block in out.rstrip('\n').split('\n\n')]
+
+    def test_matches_llvm_symbolizer(self):
+        for binary in self.binaries:
+            symbolizer = DwarfSymbolizer(binary)
+            pcs = range(symbolizer.rows[0][0], symbolizer.rows[-1][0])
+            self.assertEqual(symbolizer.symbolize(pcs), self.llvm_symbolize(binary, pcs))
+
+    def test_reporter_engine(self):
+        reporter = AFLSancovReporter(['--symbolizer', 'dwarf', '--bin-path', './test-sancov-dwarf4'])
+        reporter.setup_parsing()
+        symbolizer = DwarfSymbolizer('./test-sancov-dwarf4')
+        pcs = [row[0] for row in symbolizer.rows if not row[4]]
+        self.assertEqual(reporter.collector.symbolize_pcs(pcs), symbolizer.symbolize(pcs))
+        self.assertTrue(('main', '25') in [(func, ln) for frames in reporter.collector.symbolize_pcs(pcs)
+                                           for (fp, func, ln, col) in frames])
+
+class TestCoverageStore(unittest.TestCase):
+
+    store_dir = './covstore'
+
+    def setUp(self):
+        with open('test-sancov.c') as f:
+            source = f.read()
+        builds = {'nightly-1': source,
+                  'nightly-2': '/* Moved down */\n\n' + source,
+                  'nightly-3': source.replace('puts("works!");', 'puts("works!"); puts("again");')}
+        for build, code in builds.items():
+            os.makedirs(os.path.join(self.store_dir, build))
+            with open(os.path.join(self.store_dir, build, 'test-sancov.c'), 'w') as f:
+                f.write(code)
+            subprocess.check_call(['gcc', '-g', '-O2', os.path.join(self.store_dir, build, 'test-sancov.c'),
+                                   '-o', os.path.join(self.store_dir, build, 'test-sancov')])
+        self.tables = dict((build, FunctionTable.from_binary(os.path.join(self.store_dir, build, 'test-sancov'),
+                                                             build)) for build in builds)
+
+    def tearDown(self):
+        if os.path.isdir(self.store_dir):
+            rmtree(self.store_dir)
+
+    def test_function_diff(self):
+        self.assertEqual(self.tables['nightly-2'].changed_since(self.tables['nightly-1']), set())
+        self.assertEqual(self.tables['nightly-3'].changed_since(self.tables['nightly-1']), set(['main']))
+
+    def test_rebuild(self):
+        path = os.path.join(self.store_dir, 'coverage')
+        old = self.tables['nightly-1']
+        store = CoverageStore(path, old, lambda build_id: None)
+        self.assertTrue(store.put('main', [old.address('main', 0), old.address('main', 4)]))
+        self.assertTrue(store.put('bug', [old.address('bug', 0)]))
+        self.assertFalse(store.put('nowhere', [0]))
+        self.assertEqual(store.reconcile(), (2, 0))
+
+        new = self.tables['nightly-3']
+        store = CoverageStore(path, new, lambda build_id: self.tables.get(build_id))
+        self.assertEqual(store.reconcile(), (1, 1))
+        self.assertIsNone(store.reconcile())
+        self.assertEqual(store.get('bug'), [new.address('bug', 0)])
+        self.assertIsNone(store.get('main'))
+
+class TestShowmapPrefilter(unittest.TestCase):
+
+    queue = './afl-out/SESSION000/queue/'
+
+    def test_trace(self):
+        ### Fake afl-showmap: one tuple per input byte, exits 2 on 'crash'
+        cmd = "od -An -tu1 -v AFL_FILE | tr -s ' ' '\\n' | grep . | sed 's/$/:1/' > SHOWMAP_FILE; " \
+              "grep -q crash AFL_FILE && exit 2; exit 0"
+        showmap = ShowmapPrefilter(cmd, '.')
+        trace = showmap.trace(self.queue + 'id:000003,src:000001,op:havoc,rep:4,+cov')
+        self.assertEqual(trace, (0, frozenset(['112:1', '119:1'])))
+        showmap.trace(self.queue + 'id:000003,src:000001,op:havoc,rep:4,+cov')
+        self.assertEqual(showmap.runs, 1)
+
+    def test_trace_quotes_path(self):
+        scratch = './showmap-scratch'
+        os.mkdir(scratch)
+        try:
+            input_fname = os.path.join(scratch, 'id:000000,src:000001 $(touch pwned)')
+            with open(input_fname, 'w') as f:
+                f.write('p')
+            trace = ShowmapPrefilter("od -An -tu1 -v AFL_FILE | tr -d ' ' > SHOWMAP_FILE", scratch).trace(input_fname)
+            self.assertEqual(trace, (0, frozenset(['112'])))
+            self.assertFalse(os.path.exists(os.path.join(scratch, 'pwned')))
+        finally:
+            rmtree(scratch)
+
+    def test_afl_state(self):
+        self.assertEqual(prefilter.afl_state(self.queue + 'id:000000,orig:hello'), {'redundant_edges'})
+        self.assertEqual(prefilter.afl_state(self.queue + 'id:000001,src:000000,op:flip4,pos:0,+cov'), set())
+
+    def test_rank(self):
+        showmap = ShowmapPrefilter('true', '.')
+        crash = prefilter.Trace(2, frozenset(['1:1', '2:1', '3:1']))
+        candidates = [('p1', prefilter.Trace(0, frozenset(['1:1'])), set()),
+                      ('p2', prefilter.Trace(2, frozenset(['1:1', '2:1'])), set()),
+                      ('p3', prefilter.Trace(0, frozenset(['1:1', '2:1'])), set(['redundant_edges'])),
+                      ('p4', prefilter.Trace(0, frozenset(['1:1', '2:1', '4:1'])), set()),
+                      ('p5', prefilter.Trace(0, frozenset(['1:1', '2:1'])), set(['variable_behavior'])),
+                      ('p6', prefilter.Trace(0, crash.tuples), set()),
+                      ('p7', None, set())]
+        self.assertEqual(showmap.rank(crash, candidates), ['p3', 'p1', 'p4'])
+
 if __name__ == "__main__":
     unittest.main()